@@ -0,0 +1,398 @@
+"""
+Local stand-in for the Foreman API v2
+
+Serves generated hosts, hostgroups, subnets, domains and a few more resource
+types from memory with Foreman's pagination, search (name == "x",
+id IN (...) and <field> == "x" terms), thin listings, CRUD and host power
+requests. Every request is delayed by latency seconds plus up to jitter
+seconds and every resource carries padding bytes of extra payload, so the
+client can be measured against a slow server or large resources.
+
+    server = FakeForeman(counts={'hosts': 10000}, latency=0.005)
+    server.start()
+    foreman = Foreman('127.0.0.1', server.port, 'admin', 'secret', ssl=False)
+    ...
+    server.stop()
+
+FakeForemanProcess runs the server in a child process instead, so the
+server neither competes with the measured client for the GIL nor shows up
+in its memory use.
+"""
+
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlparse
+
+import requests
+
+FAKE_FOREMAN_COUNTS = {
+    'architectures': 3,
+    'domains': 20,
+    'environments': 10,
+    'hostgroups': 200,
+    'hosts': 5000,
+    'operatingsystems': 10,
+    'subnets': 100,
+}
+FAKE_FOREMAN_MAX_PER_PAGE = 1000
+FAKE_FOREMAN_TIMESTAMP = '2016-01-01 00:00:00 UTC'
+# Path returning (GET) or resetting (DELETE) the counters of a server
+FAKE_FOREMAN_COUNTERS = '/fake/counters'
+
+_IN = re.compile(r'^id IN \(([\d, ]*)\)$')
+# Values are quoted strings or bare values, e.g. name == "web" or id == 5
+_EQUALS = re.compile(r'^(\w+) == (?:"(.*)"|([^\s"]+))$')
+
+
+def _format_bare(value):
+    """Return a value as written unquoted in a search, e.g. true or 5"""
+    if isinstance(value, bool) or value is None:
+        return json.dumps(value)
+    return str(value)
+
+
+def _generate(resource_type, resource_id, counts):
+    """Return a generated resource of a type, hosts look like Foreman's"""
+    resource = {'id': resource_id,
+                'name': '{0}{1:05d}'.format(resource_type.rstrip('s'), resource_id),
+                'created_at': FAKE_FOREMAN_TIMESTAMP,
+                'updated_at': FAKE_FOREMAN_TIMESTAMP}
+    if resource_type == 'hosts':
+        hostgroup_id = resource_id % (counts.get('hostgroups') or 1) + 1
+        domain_id = resource_id % (counts.get('domains') or 1) + 1
+        subnet_id = resource_id % (counts.get('subnets') or 1) + 1
+        resource.update({
+            'name': 'host{0:05d}.domain{1:05d}.example.com'.format(resource_id, domain_id),
+            'ip': '10.{0}.{1}.{2}'.format(resource_id // 65536 % 256, resource_id // 256 % 256, resource_id % 256),
+            'mac': '52:54:00:{0:02x}:{1:02x}:{2:02x}'.format(resource_id // 65536 % 256,
+                                                            resource_id // 256 % 256, resource_id % 256),
+            'hostgroup_id': hostgroup_id,
+            'hostgroup_name': 'hostgroup{0:05d}'.format(hostgroup_id),
+            'domain_id': domain_id,
+            'domain_name': 'domain{0:05d}'.format(domain_id),
+            'subnet_id': subnet_id,
+            'subnet_name': 'subnet{0:05d}'.format(subnet_id),
+            'architecture_id': 1,
+            'architecture_name': 'x86_64',
+            'operatingsystem_id': 1,
+            'operatingsystem_name': 'CentOS 7.2',
+            'environment_id': 1,
+            'environment_name': 'production',
+            'managed': True,
+            'build': False,
+            'enabled': True,
+            'comment': None,
+            'global_status': 0,
+            'global_status_label': 'OK',
+            'last_report': FAKE_FOREMAN_TIMESTAMP,
+            'model_name': 'KVM',
+            'certname': resource['name'],
+        })
+    elif resource_type == 'hostgroups':
+        resource.update({'title': resource['name'], 'parent_id': None, 'ancestry': None,
+                         'domain_id': resource_id % (counts.get('domains') or 1) + 1,
+                         'subnet_id': resource_id % (counts.get('subnets') or 1) + 1})
+    elif resource_type == 'subnets':
+        resource.update({'network': '10.{0}.{1}.0'.format(resource_id // 256, resource_id % 256),
+                         'mask': '255.255.255.0', 'gateway': None, 'vlanid': resource_id % 4096,
+                         'ipam': 'DHCP', 'boot_mode': 'DHCP'})
+    return resource
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeForeman(object):
+    """FakeForeman Class
+
+    Resources live in memory and can be changed through the API. connections
+    and requests count the TCP connections accepted and HTTP requests served
+    since the start or the last reset().
+    """
+
+    def __init__(self, counts=None, latency=0.0, jitter=0.0, padding=0, host='127.0.0.1', port=0, seed=0):
+        """Init
+
+        Args:
+          counts (dict): Resource type to number of resources, missing
+              types default to FAKE_FOREMAN_COUNTS
+          latency (float): Seconds every request is delayed
+          jitter (float): Up to so many seconds added to latency at random
+          padding (int): Bytes of extra payload per resource
+          host (str): Address to listen on
+          port (int): Port to listen on, any free port by default
+          seed (int): Seed of the jitter
+        """
+        self.counts = dict(FAKE_FOREMAN_COUNTS, **(counts or {}))
+        self.latency = latency
+        self.jitter = jitter
+        self.padding = padding
+        self.resources = {}
+        self.connections = 0
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        for resource_type, count in self.counts.items():
+            self.resources[resource_type] = dict((resource_id, self._pad(_generate(resource_type, resource_id,
+                                                                                   self.counts)))
+                                                 for resource_id in range(1, count + 1))
+        self._next_ids = dict((resource_type, count + 1) for resource_type, count in self.counts.items())
+        self._server = _Server((host, port), self._get_handler())
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def _pad(self, resource):
+        if self.padding:
+            resource['description'] = 'x' * self.padding
+        return resource
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def reset(self):
+        """Reset the connection and request counters"""
+        with self._lock:
+            self.connections = 0
+            self.requests = 0
+
+    def _delay(self):
+        delay = self.latency
+        if self.jitter:
+            with self._lock:
+                delay += self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+    def _get_all(self, resource_type):
+        # Ids only grow, so insertion order is id order
+        with self._lock:
+            return list(self.resources.get(resource_type, {}).values())
+
+    def _find(self, resource_type, resource_id):
+        if resource_id.isdigit():
+            with self._lock:
+                return self.resources.get(resource_type, {}).get(int(resource_id))
+        for resource in self._get_all(resource_type):
+            if resource['name'] == resource_id:
+                return resource
+        return None
+
+    def _search(self, resource_type, search):
+        if not search:
+            return self._get_all(resource_type)
+        match = _IN.match(search)
+        if match:
+            ids = set(int(resource_id) for resource_id in match.group(1).split(',') if resource_id.strip())
+            return [resource for resource in self._get_all(resource_type) if resource['id'] in ids]
+        match = _EQUALS.match(search)
+        if match:
+            key, quoted, bare = match.groups()
+            if quoted is not None:
+                return [resource for resource in self._get_all(resource_type) if str(resource.get(key)) == quoted]
+            return [resource for resource in self._get_all(resource_type)
+                    if _format_bare(resource.get(key)) == bare]
+        return []
+
+    def list(self, resource_type, query):
+        """Return a page of resources as Foreman does"""
+        search = query.get('search')
+        results = self._search(resource_type, search)
+        page = int(query.get('page', 1))
+        per_page = min(int(query.get('per_page', 20)), FAKE_FOREMAN_MAX_PER_PAGE)
+        page_results = results[(page - 1) * per_page:page * per_page]
+        if query.get('thin') == 'true':
+            page_results = [{'id': resource['id'], 'name': resource['name']} for resource in page_results]
+        return {'total': len(self.resources.get(resource_type, {})),
+                'subtotal': len(results),
+                'page': page,
+                'per_page': per_page,
+                'search': search,
+                'sort': {'by': None, 'order': None},
+                'results': page_results}
+
+    def create(self, resource_type, data):
+        with self._lock:
+            resource_id = self._next_ids.get(resource_type, 1)
+            self._next_ids[resource_type] = resource_id + 1
+            resource = dict(data, id=resource_id, created_at=FAKE_FOREMAN_TIMESTAMP,
+                            updated_at=FAKE_FOREMAN_TIMESTAMP)
+            self.resources.setdefault(resource_type, {})[resource_id] = resource
+        return resource
+
+    def _get_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately, with Nagle every
+            # response would wait for the client's delayed ACK
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def setup(self):
+                BaseHTTPRequestHandler.setup(self)
+                self.counted = False
+
+            def _send(self, status_code, document):
+                body = json.dumps(document).encode('utf-8')
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _not_found(self):
+                self._send(404, {'error': {'message': 'Resource not found'}})
+
+            def _read_body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if not length:
+                    return {}
+                return json.loads(self.rfile.read(length).decode('utf-8'))
+
+            def _handle(self):
+                url = urlparse(self.path)
+                if url.path == FAKE_FOREMAN_COUNTERS:
+                    # Control endpoint, neither delayed nor counted
+                    self._read_body()
+                    if self.command == 'DELETE':
+                        fake.reset()
+                    return self._send(200, {'connections': fake.connections, 'requests': fake.requests})
+                with fake._lock:
+                    fake.requests += 1
+                    if not self.counted:
+                        fake.connections += 1
+                        self.counted = True
+                query = dict((key, values[0]) for key, values in parse_qs(url.query).items())
+                data = self._read_body()
+                parts = [part for part in url.path.split('/') if part][2:]
+                fake._delay()
+                if not parts:
+                    return self._not_found()
+                resource_type = parts[0]
+                if self.command == 'POST' and len(parts) == 1:
+                    # Foreman expects {<resource>: {...}}
+                    values = [value for value in data.values() if isinstance(value, dict)]
+                    return self._send(201, fake.create(resource_type, values[0] if values else data))
+                if self.command == 'GET' and len(parts) == 1:
+                    return self._send(200, fake.list(resource_type, query))
+                resource = fake._find(resource_type, parts[1])
+                if resource is None:
+                    return self._not_found()
+                if len(parts) == 3 and parts[2] == 'power' and self.command == 'PUT':
+                    return self._send(200, {'power': 'on' if data.get('power_action') == 'state' else True})
+                if len(parts) == 3 and self.command == 'GET':
+                    results = [{'id': 1, 'name': 'location', 'value': 'dc1'}]
+                    return self._send(200, {'total': 1, 'subtotal': 1, 'page': 1, 'per_page': 20, 'search': None,
+                                            'results': results})
+                if self.command == 'GET':
+                    return self._send(200, resource)
+                if self.command == 'PUT':
+                    values = [value for value in data.values() if isinstance(value, dict)]
+                    with fake._lock:
+                        resource.update(values[0] if values else data)
+                    return self._send(200, resource)
+                if self.command == 'DELETE':
+                    with fake._lock:
+                        fake.resources[resource_type].pop(resource['id'], None)
+                    return self._send(200, resource)
+                return self._not_found()
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        return Handler
+
+
+def _serve(kwargs, ports):
+    server = FakeForeman(**kwargs)
+    ports.put(server.port)
+    server.serve_forever()
+
+
+class FakeForemanProcess(object):
+    """FakeForemanProcess Class
+
+    A FakeForeman served by a child process. Takes the arguments of
+    FakeForeman, counters are read and reset through FAKE_FOREMAN_COUNTERS.
+    """
+
+    def __init__(self, **kwargs):
+        self.counts = dict(FAKE_FOREMAN_COUNTS, **(kwargs.get('counts') or {}))
+        self._kwargs = kwargs
+        self._process = None
+        self.port = None
+
+    def start(self):
+        ports = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=_serve, args=(self._kwargs, ports))
+        self._process.daemon = True
+        self._process.start()
+        self.port = ports.get(timeout=60)
+        return self
+
+    def stop(self):
+        self._process.terminate()
+        self._process.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _request_counters(self, method):
+        response = requests.request(method, 'http://127.0.0.1:{0}{1}'.format(self.port, FAKE_FOREMAN_COUNTERS))
+        response.raise_for_status()
+        return response.json()
+
+    def get_counters(self):
+        """Return the number of connections and requests served"""
+        return self._request_counters('GET')
+
+    def reset(self):
+        self._request_counters('DELETE')
+
+    @property
+    def connections(self):
+        return self.get_counters()['connections']
+
+    @property
+    def requests(self):
+        return self.get_counters()['requests']
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark the Foreman client against a local fake Foreman
+
+Every scenario runs against benchmarks.fake_foreman with a fresh Foreman
+instance and reports throughput, request latency percentiles, the peak of
+memory allocated by Python (tracemalloc) and the number of connections and
+requests the server saw. Results are compared with a baseline file, a
+scenario slower, hungrier or using more connections than the baseline
+allows fails the run.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks -l 0.002 -s get_resources,crud
+    python -m benchmarks.run_benchmarks -u    # write a new baseline
+"""
+import getopt
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fake_foreman import FakeForemanProcess
+from foreman.batch import run_concurrently
+from foreman.foreman import Foreman, HOSTGROUP, HOSTGROUPS, HOSTS
+from foreman.stats import RequestObserver, percentile
+
+BENCHMARK_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# Relative change of a metric tolerated before it counts as regression
+BENCHMARK_TOLERANCE = 0.25
+# Metrics compared with the baseline and if higher values are better
+BENCHMARK_METRICS = {
+    'ops_per_second': True,
+    'p99_ms': False,
+    'peak_memory_kib': False,
+    'connections': False,
+}
+
+
+class LatencyRecorder(RequestObserver):
+    """Keep the latency of every request"""
+
+    def __init__(self):
+        self.latencies = []
+
+    def after_request(self, event):
+        if event.latency is not None:
+            self.latencies.append(event.latency)
+
+
+def bench_get_resources(foreman, server, options):
+    return len(foreman.get_resources(resource_type=HOSTS))
+
+
+def bench_get_resources_workers(foreman, server, options):
+    return len(foreman.get_resources(resource_type=HOSTS, workers=options['workers']))
+
+
+def bench_get_resources_thin(foreman, server, options):
+    return len(foreman.get_resources(resource_type=HOSTS, fields=['id', 'name'], workers=options['workers']))
+
+
+def bench_search_resource(foreman, server, options):
+    domains = server.counts.get('domains') or 1
+    names = ['host{0:05d}.domain{1:05d}.example.com'.format(host_id, host_id % domains + 1)
+             for host_id in range(1, options['operations'] + 1)]
+    report = run_concurrently(lambda name: foreman.search_resource(resource_type=HOSTS, data={'name': name}),
+                              names, workers=options['workers'], keep_results=False)
+    return len(names) - len(report.failed)
+
+
+def bench_crud(foreman, server, options):
+    def crud(index):
+        name = 'bench{0:05d}'.format(index)
+        hostgroup = foreman.create_resource(resource_type=HOSTGROUPS, resource=HOSTGROUP, data={'name': name})
+        foreman.get_resource(resource_type=HOSTGROUPS, resource_id=hostgroup['id'])
+        foreman.update_resource(resource_type=HOSTGROUPS, resource_id=hostgroup['id'],
+                                data={HOSTGROUP: {'description': name}})
+        foreman.delete_resource(resource_type=HOSTGROUPS, resource_id=hostgroup['id'])
+
+    report = run_concurrently(crud, range(options['operations']), workers=options['workers'], keep_results=False)
+    return options['operations'] - len(report.failed)
+
+
+def bench_power(foreman, server, options):
+    report = run_concurrently(lambda host_id: foreman.set_host_power(host_id=host_id, action='start'),
+                              range(1, options['operations'] + 1), workers=options['workers'], keep_results=False)
+    return options['operations'] - len(report.failed)
+
+
+BENCHMARKS = (
+    ('get_resources', bench_get_resources),
+    ('get_resources_workers', bench_get_resources_workers),
+    ('get_resources_thin', bench_get_resources_thin),
+    ('search_resource', bench_search_resource),
+    ('crud', bench_crud),
+    ('power', bench_power),
+)
+
+
+def _get_foreman(server, options, observers=None):
+    return Foreman('127.0.0.1', server.port, 'admin', 'secret', ssl=False, max_workers=options['workers'],
+                   observers=observers)
+
+
+def run_benchmark(func, server, options):
+    """Run a scenario once and return its timings
+
+    Args:
+      func (callable): Scenario called with foreman, server and options,
+          returning the number of operations done
+      server (FakeForemanProcess): Server to run against
+      options (dict): workers and operations
+    Returns:
+      dict
+    """
+    recorder = LatencyRecorder()
+    with _get_foreman(server, options, observers=[recorder]) as foreman:
+        server.reset()
+        started = time.time()
+        operations = func(foreman, server, options)
+        seconds = time.time() - started
+    counters = server.get_counters()
+    latencies = sorted(recorder.latencies)
+    return {'operations': operations,
+            'seconds': round(seconds, 4),
+            'ops_per_second': round(operations / seconds, 1) if seconds else None,
+            'requests': counters['requests'],
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+            'p90_ms': round(percentile(latencies, 90) * 1000, 3) if latencies else None,
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+            'connections': counters['connections']}
+
+
+def measure_memory(func, server, options):
+    """Run a scenario once under tracemalloc
+
+    Tracing slows Python down, so memory is measured in a run of its own.
+
+    Returns:
+      int: Peak of memory allocated during the scenario in KiB
+    """
+    with _get_foreman(server, options) as foreman:
+        tracemalloc.start()
+        try:
+            func(foreman, server, options)
+            return tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            tracemalloc.stop()
+
+
+def compare(results, baseline, tolerance=BENCHMARK_TOLERANCE):
+    """Return the regressions of results against a baseline
+
+    Args:
+      results (dict): Scenario name to metrics
+      baseline (dict): Scenario name to metrics
+      tolerance (float): Relative change tolerated
+    Returns:
+      list of str describing each regression
+    """
+    regressions = []
+    for name, metrics in sorted(results.items()):
+        for metric, higher_is_better in sorted(BENCHMARK_METRICS.items()):
+            expected = baseline.get(name, {}).get(metric)
+            value = metrics.get(metric)
+            if expected is None or value is None:
+                continue
+            if metric == 'connections':
+                # Connections do not vary between runs, any increase counts
+                regressed = value > expected
+            elif higher_is_better:
+                regressed = value < expected * (1 - tolerance)
+            else:
+                regressed = value > expected * (1 + tolerance)
+            if regressed:
+                regressions.append('{0}: {1} {2} (baseline {3})'.format(name, metric, value, expected))
+    return regressions
+
+
+def show_help():
+    """Print on screen how to use this script.
+    """
+    print('python -m benchmarks.run_benchmarks -s <scenario,scenario,...> -n <hosts> -o <operations> '
+          '-w <workers> -l <latency> -j <jitter> -P <padding> -r <repeat> -t <tolerance> -b <baseline> '
+          '[-u (update baseline)]')
+
+
+def main(argv):
+    """ Main
+
+    Run the benchmarks and compare them with the baseline
+    """
+    names = [name for name, _ in BENCHMARKS]
+    hosts = 5000
+    options = {'operations': 500, 'workers': 4}
+    latency = 0.0
+    jitter = 0.0
+    padding = 0
+    repeat = 3
+    tolerance = BENCHMARK_TOLERANCE
+    baseline_file = BENCHMARK_BASELINE
+    update = False
+
+    try:
+        opts, args = getopt.getopt(argv, "b:hj:l:n:o:P:r:s:t:uw:")
+    except getopt.GetoptError:
+        show_help()
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            show_help()
+            sys.exit()
+        elif opt == '-b':
+            baseline_file = arg
+        elif opt == '-j':
+            jitter = float(arg)
+        elif opt == '-l':
+            latency = float(arg)
+        elif opt == '-n':
+            hosts = int(arg)
+        elif opt == '-o':
+            options['operations'] = int(arg)
+        elif opt == '-P':
+            padding = int(arg)
+        elif opt == '-r':
+            repeat = int(arg)
+        elif opt == '-s':
+            names = arg.split(',')
+        elif opt == '-t':
+            tolerance = float(arg)
+        elif opt == '-u':
+            update = True
+        elif opt == '-w':
+            options['workers'] = int(arg)
+
+    benchmarks = dict(BENCHMARKS)
+    results = {}
+    with FakeForemanProcess(counts={HOSTS: hosts}, latency=latency, jitter=jitter, padding=padding) as server:
+        for name in names:
+            # The fastest run is the least disturbed by the machine
+            runs = [run_benchmark(benchmarks[name], server, options) for _ in range(repeat)]
+            results[name] = min(runs, key=lambda run: run['seconds'])
+            results[name]['peak_memory_kib'] = measure_memory(benchmarks[name], server, options)
+            print('{0:24} {ops_per_second:>10} ops/s  p50 {p50_ms} ms  p90 {p90_ms} ms  p99 {p99_ms} ms  '
+                  '{peak_memory_kib} KiB  {connections} connections  {requests} requests'.format(name,
+                                                                                            **results[name]))
+
+    settings = {'hosts': hosts, 'latency': latency, 'jitter': jitter, 'padding': padding}
+    settings.update(options)
+    if update:
+        with open(baseline_file, 'w') as f:
+            json.dump({'settings': settings, 'results': results}, f, indent=2, sort_keys=True)
+        print('Baseline written to {0}'.format(baseline_file))
+        return
+    if not os.path.exists(baseline_file):
+        print('No baseline {0}, run with -u to write one'.format(baseline_file))
+        return
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    if baseline.get('settings') != settings:
+        print('Baseline was taken with other settings, not comparing: {0}'.format(baseline.get('settings')))
+        return
+    regressions = compare(results, baseline['results'], tolerance=tolerance)
+    for regression in regressions:
+        print('Regression {0}'.format(regression))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,620 @@
+"""
+asyncio client for the Foreman API
+
+AsyncForeman offers the same methods as Foreman but every call returns an
+awaitable. Requests are sent with aiohttp over one pooled client session so
+many calls can be in flight from a single event loop.
+"""
+
+import asyncio
+import collections
+import itertools
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from foreman.foreman import (Foreman, ForemanError, ForemanTimeoutError, FOREMAN_API_VERSION,
+                             FOREMAN_CONNECT_TIMEOUT, FOREMAN_MAX_WORKERS, FOREMAN_PAGE_SIZE,
+                             FOREMAN_POOL_CONNECTIONS, FOREMAN_POOL_MAXSIZE, FOREMAN_READ_TIMEOUT,
+                             FOREMAN_THIN_FIELDS, COMPUTE_ATTRIBUTES, HOST, HOSTGROUP, HOSTGROUPS, HOSTS,
+                             PARAMETERS, get_projection, json_loads, _clock, _get_deadline)
+from foreman.batch import BatchReport, BatchResult
+from foreman.cache import ResponseCache
+from foreman.ratelimit import Permit, TokenBucket
+from foreman.coalesce import CoalesceTimeout, SingleFlight, _Flight
+from foreman.records import RecordTable, get_record_class
+from foreman.search import search_query
+from foreman.stats import RequestEvent
+
+# Seconds between attempts to get a free in-flight slot of a rate limiter,
+# its semaphores are shared with threads and can not be awaited
+FOREMAN_LIMITER_POLL_INTERVAL = 0.005
+
+
+class _AsyncResponse(object):
+    """Response of aiohttp reduced to what Foreman._handle_request needs
+    """
+
+    def __init__(self, url, status_code, content, headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class AsyncSingleFlight(SingleFlight):
+    """SingleFlight for coroutines of one event loop"""
+
+    async def do(self, key, func, timeout=None):
+        """Await func() once for all concurrent callers of key
+
+        See foreman.coalesce.SingleFlight.do.
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.shared += 1
+            try:
+                await asyncio.wait_for(flight.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                raise CoalesceTimeout(key)
+            return self._get_result(flight)
+        flight = self._flights[key] = _Flight(asyncio.Event())
+        try:
+            flight.result = await func()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            del self._flights[key]
+            flight.event.set()
+        return flight.result
+
+
+class AsyncForeman(Foreman):
+    """AsyncForeman Class
+
+    Communicate with Foreman via API v2 from asyncio code.
+
+    All resource methods of Foreman (get_host, search_domain,
+    set_host_power, ...) are available and return coroutines.
+    URL building and error handling are shared with Foreman. Bulk methods
+    (batch, set_hosts_power, ...) run their requests as tasks of the event
+    loop instead of threads.
+    """
+
+    def __init__(self, hostname, port, username, password, ssl=True,
+                 session=None, connector=None, limit=FOREMAN_POOL_MAXSIZE * FOREMAN_POOL_CONNECTIONS,
+                 limit_per_host=FOREMAN_POOL_MAXSIZE, keep_alive=True, max_workers=FOREMAN_MAX_WORKERS,
+                 cache=None, retry=None, rate_limiter=None, observers=None,
+                 connect_timeout=FOREMAN_CONNECT_TIMEOUT, read_timeout=FOREMAN_READ_TIMEOUT,
+                 json_decoder=json_loads, coalesce=False):
+        """Init
+
+        The aiohttp session is created lazily on the first request so the
+        client can be constructed outside of a running event loop.
+
+        Args:
+          hostname (str): Foreman host
+          port (int): Foreman port
+          username (str): API user
+          password (str): API password
+          ssl (bool): Use https instead of http
+          session (aiohttp.ClientSession): Session to use instead of creating
+              one. A passed in session is not closed by close().
+          connector (aiohttp.BaseConnector): Transport to use for the
+              session created by AsyncForeman
+          limit (int): Maximum number of open connections
+          limit_per_host (int): Maximum number of open connections per host
+          keep_alive (bool): Keep connections open between requests
+          max_workers (int): Upper limit of concurrent requests a single
+              call may issue
+          cache (foreman.cache.ResponseCache): Cache for get_resource and
+              search_resource results, may be shared with Foreman instances
+          retry (foreman.retry.RetryPolicy): Policy to retry failed requests
+          rate_limiter (foreman.ratelimit.RateLimiter): Limiter every request
+              has to pass, may be shared with Foreman instances and threads
+          observers (list): foreman.stats.RequestObserver objects told about
+              every request
+          connect_timeout (float): Seconds to wait for a connection
+          read_timeout (float): Seconds to wait for data from Foreman
+          json_decoder (callable): Function decoding a response body from
+              bytes
+          coalesce (bool): Send identical GET requests issued concurrently
+              by several tasks only once and share the result
+        """
+        if aiohttp is None:
+            raise ImportError('AsyncForeman requires aiohttp, install python-foreman[async]')
+        self.hostname = hostname
+        self.port = port
+        self.url_scheme = ("http", "https")[ssl]
+        self.url = "{0}://{1}:{2}/api/{3}".format(
+            self.url_scheme,
+            self.hostname,
+            self.port,
+            FOREMAN_API_VERSION,
+        )
+        self.max_workers = max_workers
+        self.cache = cache
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.observers = list(observers or [])
+        self.timeout = (connect_timeout, read_timeout)
+        self.json_decoder = json_decoder
+        self.single_flight = AsyncSingleFlight() if coalesce else None
+        self._auth = aiohttp.BasicAuth(username, password)
+        self._owns_session = session is None
+        self._connector = connector
+        self._connector_args = {'limit': limit,
+                                'limit_per_host': limit_per_host,
+                                'force_close': not keep_alive,
+                                'ssl': False}
+        self.session = session
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """Close all pooled connections
+
+        A session passed in by the caller is left open.
+        """
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _get_session(self):
+        if self.session is None:
+            connector = self._connector or aiohttp.TCPConnector(**self._connector_args)
+            self.session = aiohttp.ClientSession(connector=connector, auth=self._auth)
+        return self.session
+
+    def _get_client_timeout(self, url, timeout=None, deadline=None):
+        timeout = self._get_timeout(url, timeout=timeout, deadline=deadline)
+        total = None if deadline is None else deadline - _clock()
+        if isinstance(timeout, tuple):
+            return aiohttp.ClientTimeout(total=total, sock_connect=timeout[0], sock_read=timeout[1])
+        return aiohttp.ClientTimeout(total=timeout)
+
+    async def _send(self, method, url, params=None, data=None, headers=None, timeout=None, deadline=None):
+        """Send a request through the pooled session
+
+        Failed requests are retried as the retry policy allows, observers
+        are told about the request as by Foreman._send.
+
+        Args:
+          method (str): HTTP verb
+          url (str): Full URL to request
+          params (dict): Query parameters
+          data (str): Request body
+          headers (dict): Additional request headers
+          timeout (float or tuple): Timeout or (connect, read) timeouts of
+              each attempt
+          deadline (float): Clock time all attempts have to end
+        Returns:
+          _AsyncResponse
+        Raises:
+          ForemanTimeoutError: On timeouts or if the deadline passed
+        """
+        kwargs = {'headers': headers, 'data': data}
+        if params:
+            kwargs['params'] = dict((key, str(value)) for key, value in params.items())
+        event = RequestEvent(method=method,
+                             url=url,
+                             resource_type=self._get_resource_type(url),
+                             url_template=self._get_url_template(url),
+                             request_bytes=len(data or ''))
+        for observer in self.observers:
+            observer.before_request(event)
+        start = _clock()
+        try:
+            resp = await self._send_attempts(method, url, event=event, start=start,
+                                             timeout=timeout, deadline=deadline, **kwargs)
+        except asyncio.TimeoutError as e:
+            event.error = ForemanTimeoutError(url=url, status_code=None, message=str(e) or 'Timeout')
+            raise event.error
+        except Exception as e:
+            event.error = e
+            raise
+        else:
+            event.status_code = resp.status_code
+            event.response_bytes = len(resp.content)
+        finally:
+            event.latency = _clock() - start
+            for observer in self.observers:
+                observer.after_request(event)
+        return resp
+
+    async def _acquire(self, method, resource_type):
+        """Wait until the rate limiter lets a request pass
+
+        Like RateLimiter.acquire, but waits without blocking the event loop.
+
+        Returns:
+          foreman.ratelimit.Permit
+        """
+        start = _clock()
+        semaphores = []
+        try:
+            for limit in self.rate_limiter.get_limits(method, resource_type=resource_type):
+                if limit.semaphore is not None:
+                    while not limit.semaphore.acquire(False):
+                        await asyncio.sleep(FOREMAN_LIMITER_POLL_INTERVAL)
+                    semaphores.append(limit.semaphore)
+                if limit.bucket is not None:
+                    await asyncio.sleep(limit.bucket.reserve())
+        except BaseException:
+            Permit(semaphores=semaphores, waited=0.0).release()
+            raise
+        return self.rate_limiter.get_permit(semaphores=semaphores, waited=_clock() - start)
+
+    async def _send_attempts(self, method, url, event, start, timeout=None, deadline=None, **kwargs):
+        while True:
+            permit = None
+            if self.rate_limiter is not None:
+                permit = await self._acquire(method, resource_type=event.resource_type)
+                event.throttled += permit.waited
+            try:
+                client_timeout = self._get_client_timeout(url, timeout=timeout, deadline=deadline)
+                async with self._get_session().request(method, url, timeout=client_timeout, **kwargs) as resp:
+                    content = await resp.read()
+                    delay = None
+                    if self.retry is not None:
+                        delay = self.retry.get_delay(method, attempt=event.retries, elapsed=_clock() - start,
+                                                     status_code=resp.status,
+                                                     retry_after=resp.headers.get('Retry-After'), url=url)
+                    if delay is None or (deadline is not None and _clock() + delay >= deadline):
+                        return _AsyncResponse(url=str(resp.url), status_code=resp.status, content=content,
+                                              headers=resp.headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if self.retry is None:
+                    raise
+                delay = self.retry.get_delay(method, attempt=event.retries, elapsed=_clock() - start, exception=e,
+                                             url=url)
+                if delay is None or (deadline is not None and _clock() + delay >= deadline):
+                    raise
+            finally:
+                if permit is not None:
+                    permit.release()
+            await asyncio.sleep(delay)
+            event.retries += 1
+
+    async def _request(self, method, url, **kwargs):
+        """Send a request and return the parsed response
+
+        Args:
+          method (str): HTTP verb
+          url (str): Full URL to request
+          kwargs: Additional arguments passed to _send
+        Returns:
+          Dict
+        """
+        resp = await self._send(method, url, **kwargs)
+        return self._handle_request(resp)
+
+    async def _coalesce(self, url, data, deadline, func):
+        if self.single_flight is None:
+            return await func()
+        key = ResponseCache.key(url=url, data=data)
+        try:
+            return await self.single_flight.do(key, func,
+                                               timeout=None if deadline is None else max(0.0, deadline - _clock()))
+        except CoalesceTimeout:
+            raise ForemanTimeoutError(url=url, status_code=None, message='Deadline exceeded')
+
+    async def _get_cached_request(self, resource_type, url, data=None, timeout=None, deadline=None):
+        """Execute a GET request, answered from the cache if possible
+
+        See Foreman._get_cached_request.
+        """
+        if self.cache is None:
+            return await self._get_request(url=url, data=data, timeout=timeout, deadline=deadline)
+        key = self.cache.key(url=url, data=data)
+        entry = self.cache.get_entry(key)
+        if entry is not None and entry.is_fresh() and not self.cache.revalidate:
+            self.cache.count_hit()
+            return entry.get_value()
+        return await self._coalesce(url=url, data=data, deadline=deadline,
+                                    func=lambda: self._fetch_cached_request(resource_type=resource_type, key=key,
+                                                                            entry=entry, url=url, data=data,
+                                                                            timeout=timeout, deadline=deadline))
+
+    async def _fetch_cached_request(self, resource_type, key, entry, url, data=None, timeout=None, deadline=None):
+        headers = {}
+        if entry is not None:
+            headers = entry.get_conditional_headers()
+        resp = await self._send('GET', url=url, params=data, headers=headers, timeout=timeout, deadline=deadline)
+        result = self._handle_request(resp, cache_entry=entry)
+        if resp.status_code == 304:
+            self.cache.renew(entry)
+        else:
+            self.cache.count_miss()
+            self.cache.set(key, resource_type=resource_type, value=result,
+                           etag=resp.headers.get('ETag'),
+                           last_modified=resp.headers.get('Last-Modified'))
+        return result
+
+    async def create_resource(self, resource_type, resource, data,
+                              resource_id=None, component=None, additional_data=None, timeout=None, deadline=None):
+        """ Create a resource by executing a post request to Foreman
+
+        See Foreman.create_resource.
+        """
+        url = self._get_resource_url(resource_type=resource_type,
+                                     resource_id=resource_id,
+                                     component=component)
+        resource_data = dict(additional_data or {})
+        resource_data[resource] = data
+        result = await self._post_request(url=url, data=resource_data,
+                                          timeout=timeout, deadline=_get_deadline(deadline))
+        self._invalidate_cache(resource_type=resource_type, resource_id=resource_id, component=component)
+        return result
+
+    async def update_resource(self, resource_type, resource_id, data, component=None, component_id=None,
+                              timeout=None, deadline=None):
+        url = self._get_resource_url(resource_type=resource_type, resource_id=resource_id,
+                                     component=component, component_id=component_id)
+        result = await self._put_request(url=url, data=data, timeout=timeout, deadline=_get_deadline(deadline))
+        self._invalidate_cache(resource_type=resource_type, resource_id=resource_id, component=component,
+                               result=result)
+        return result
+
+    async def delete_resource(self, resource_type, resource_id, component=None, component_id=None,
+                              timeout=None, deadline=None):
+        url = self._get_resource_url(resource_type=resource_type, resource_id=resource_id,
+                                     component=component, component_id=component_id)
+        result = await self._delete_request(url=url, timeout=timeout, deadline=_get_deadline(deadline))
+        self._invalidate_cache(resource_type=resource_type, resource_id=resource_id, component=component,
+                               result=result)
+        return result
+
+    async def _prefetch_pages(self, url, data, pages, workers, ordered=True, resource_type=None,
+                              timeout=None, deadline=None):
+        """Request pages concurrently and yield their results
+
+        At most workers requests are in flight and at most twice as many pages
+        are held in memory at any time, as by Foreman._prefetch_pages.
+
+        Args:
+          url (str): URL of the listing
+          data (dict): Paging and search parameters
+          pages (iterable): Page numbers to request
+          workers (int): Number of concurrent requests
+          ordered (bool): Yield pages in page order instead of completion
+              order
+          resource_type (str): Answer the requests from the cache using the
+              TTL of this resource type
+          timeout (float or tuple): Timeout or (connect, read) timeouts
+          deadline (float): Clock time all requests have to end
+        Returns:
+          async generator of list
+        """
+        semaphore = asyncio.Semaphore(workers)
+
+        async def get_page(page):
+            async with semaphore:
+                return await self._get_page(url=url, data=data, page=page, resource_type=resource_type,
+                                            timeout=timeout, deadline=deadline)
+
+        pages = iter(pages)
+        pending = collections.deque(asyncio.ensure_future(get_page(page))
+                                    for page in itertools.islice(pages, workers * 2))
+        try:
+            while pending:
+                if ordered:
+                    task = pending.popleft()
+                else:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    task = done.pop()
+                    pending.remove(task)
+                request_result = await task
+                for page in itertools.islice(pages, 1):
+                    pending.append(asyncio.ensure_future(get_page(page)))
+                yield request_result.get('results') or []
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def iter_resources(self, resource_type, resource_id=None, component=None,
+                             search=None, page_size=FOREMAN_PAGE_SIZE, workers=None, ordered=True,
+                             cache=False, timeout=None, deadline=None, fields=None, records=False):
+        """ Iterate over all resources of the defined resource type
+
+        See Foreman.iter_resources.
+
+        Returns:
+           async generator of dict
+        """
+        deadline = _get_deadline(deadline)
+        project = get_projection(fields, record_class=get_record_class(resource_type) if records else None)
+        url = self._get_resource_url(resource_type=resource_type,
+                                     resource_id=resource_id,
+                                     component=component)
+        data = {'per_page': page_size}
+        if search:
+            data['search'] = search_query(search)
+        if fields and FOREMAN_THIN_FIELDS.issuperset(fields):
+            data['thin'] = 'true'
+        cache_type = resource_type if cache else None
+        request_result = await self._get_page(url=url, data=data, page=1, resource_type=cache_type,
+                                              timeout=timeout, deadline=deadline)
+        results = request_result.get('results')
+        if not isinstance(results, list):
+            if results:
+                yield project(results)
+            return
+        for result in results:
+            yield project(result)
+        per_page = int(request_result.get('per_page') or page_size)
+        subtotal = request_result.get('subtotal', request_result.get('total'))
+        if not results or subtotal is None:
+            return
+        pages = range(2, -(-int(subtotal) // per_page) + 1)
+        workers = min(workers or 1, self.max_workers, len(pages)) or 1
+        async for results in self._prefetch_pages(url=url, data=data, pages=pages,
+                                                  workers=workers, ordered=ordered,
+                                                  resource_type=cache_type,
+                                                  timeout=timeout, deadline=deadline):
+            if not results:
+                return
+            for result in results:
+                yield project(result)
+
+    async def get_resources(self, resource_type, resource_id=None, component=None,
+                            search=None, page_size=FOREMAN_PAGE_SIZE, workers=None, ordered=True,
+                            cache=False, timeout=None, deadline=None, fields=None, lazy=False,
+                            records=False, columnar=False):
+        """ Return a list of all resources of the defined resource type
+
+        See Foreman.get_resources. With lazy set the awaited result is an
+        async generator.
+
+        Returns:
+           list of dict or Record, RecordTable
+        """
+        resources = self.iter_resources(resource_type=resource_type,
+                                        resource_id=resource_id,
+                                        component=component,
+                                        search=search,
+                                        page_size=page_size,
+                                        workers=workers,
+                                        ordered=ordered,
+                                        cache=cache,
+                                        timeout=timeout,
+                                        deadline=deadline,
+                                        fields=fields,
+                                        records=records and not columnar)
+        if columnar:
+            table = RecordTable()
+            async for resource in resources:
+                table.append(resource)
+            return table
+        if lazy:
+            return resources
+        return [resource async for resource in resources]
+
+    async def search_one(self, resource_type, query, timeout=None, deadline=None):
+        url = self._get_resource_url(resource_type=resource_type)
+        request_result = await self._get_cached_request(resource_type=resource_type, url=url,
+                                                        data={'search': search_query(query), 'per_page': 2},
+                                                        timeout=timeout, deadline=_get_deadline(deadline))
+        return self._get_search_one_result(url=url, request_result=request_result)
+
+    async def search_resource(self, resource_type, data, timeout=None, deadline=None, fields=None,
+                              records=False):
+        results = [resource async for resource in self.iter_search(resource_type=resource_type, query=data,
+                                                                   cache=True, timeout=timeout,
+                                                                   deadline=deadline, fields=fields,
+                                                                   records=records)]
+        if len(results) == 1:
+            return results[0]
+        return results
+
+    async def get_compute_attribute(self, compute_resource_id, compute_profile_id):
+        compute_resource = await self.get_compute_resource(id=compute_resource_id)
+        compute_attributes = compute_resource.get(COMPUTE_ATTRIBUTES)
+
+        return [item for item in compute_attributes if item.get('compute_profile_id') == compute_profile_id]
+
+    async def get_host_parameters(self, host_id):
+        parameters = await self.get_resource(resource_type=HOSTS, resource_id=host_id, component=PARAMETERS)
+        if parameters and 'results' in parameters:
+            return parameters.get('results')
+        return None
+
+    async def get_hostgroup_parameters(self, hostgroup_id):
+        parameters = await self.get_resource(resource_type=HOSTGROUPS, resource_id=hostgroup_id,
+                                             component=PARAMETERS)
+        if parameters and 'results' in parameters:
+            return parameters.get('results')
+        return None
+
+    async def _run_concurrently(self, func, items, workers=None, rate=None, stop_on_error=False):
+        """Await func for every item with bounded concurrency
+
+        See foreman.batch.run_concurrently.
+
+        Args:
+          func (callable): Coroutine function called with one item
+          items (iterable or async iterable): Items to process
+          workers (int): Number of concurrent calls, capped by max_workers
+          rate (float): Maximum number of calls started per second
+          stop_on_error (bool): Do not start further calls after the first
+              error
+        Returns:
+          BatchReport
+        """
+        if hasattr(items, '__aiter__'):
+            items = [item async for item in items]
+        semaphore = asyncio.Semaphore(min(workers or self.max_workers, self.max_workers))
+        bucket = TokenBucket(rate=rate, burst=1) if rate else None
+        stopped = []
+
+        async def call(item):
+            async with semaphore:
+                if stopped:
+                    return None
+                if bucket is not None:
+                    await asyncio.sleep(bucket.reserve())
+                try:
+                    return BatchResult(item=item, result=await func(item))
+                except (ForemanError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if stop_on_error:
+                        stopped.append(item)
+                    return BatchResult(item=item, error=e)
+
+        results = await asyncio.gather(*[call(item) for item in items])
+        return BatchReport([result for result in results if result is not None], stopped=bool(stopped))
+
+    async def batch(self, operations, workers=None, rate=None, stop_on_error=False):
+        """ Execute many create, update and delete operations concurrently
+
+        See Foreman.batch.
+
+        Returns:
+           foreman.batch.BatchReport with one result per operation
+        """
+        return await self._run_concurrently(func=lambda operation: operation.execute(self),
+                                            items=operations, workers=workers, rate=rate,
+                                            stop_on_error=stop_on_error)
+
+    async def _get_host_ids(self, host_ids=None, search=None):
+        if host_ids is not None:
+            return host_ids
+        query = search_query(search) if search is not None else ''
+        if not query.strip():
+            # An empty search matches every host
+            raise ValueError('host_ids or a non-empty search is required')
+        return [host.get('id') async for host in self.iter_resources(resource_type=HOSTS, search=query)]
+
+    async def set_hosts_power(self, action, host_ids=None, search=None, workers=None, rate=None,
+                              stop_on_error=False):
+        """ Execute a power action on many hosts concurrently
+
+        See Foreman.set_hosts_power.
+
+        Returns:
+           foreman.batch.BatchReport with one result per host id
+        """
+        host_ids = await self._get_host_ids(host_ids=host_ids, search=search)
+        return await self._run_concurrently(func=lambda host_id: self.set_host_power(host_id=host_id, action=action),
+                                            items=host_ids, workers=workers, rate=rate,
+                                            stop_on_error=stop_on_error)
+
+    def _check_resolver(self, resolver):
+        if resolver is not None:
+            # ReferenceResolver sends blocking requests
+            raise TypeError('AsyncForeman does not take a resolver, resolve the data with a '
+                            'ReferenceResolver of a Foreman before')
+
+    async def create_host(self, data, resolver=None):
+        self._check_resolver(resolver)
+        return await self.create_resource(resource_type=HOSTS, resource=HOST, data=data)
+
+    async def create_hostgroup(self, data, resolver=None):
+        self._check_resolver(resolver)
+        return await self.create_resource(resource_type=HOSTGROUPS, resource=HOSTGROUP, data=data)
@@ -0,0 +1,220 @@
+"""
+Run many Foreman requests concurrently and collect their outcomes
+"""
+
+import itertools
+
+import concurrent.futures
+
+from foreman.ratelimit import TokenBucket
+
+
+class BatchOperation(object):
+    """A create, update or delete request of a batch
+
+    Use the create, update and delete class methods to build operations.
+    """
+    __slots__ = ('action', 'resource_type', 'resource_id', 'data', 'resource',
+                 'component', 'component_id', 'additional_data')
+
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+    def __init__(self, action, resource_type, resource_id=None, data=None, resource=None,
+                 component=None, component_id=None, additional_data=None):
+        if action not in (self.CREATE, self.UPDATE, self.DELETE):
+            raise ValueError('Unknown batch action {0}'.format(action))
+        self.action = action
+        self.resource_type = resource_type
+        self.resource_id = resource_id
+        self.data = data
+        self.resource = resource
+        self.component = component
+        self.component_id = component_id
+        self.additional_data = additional_data
+
+    @classmethod
+    def create(cls, resource_type, resource, data, resource_id=None, component=None, additional_data=None):
+        """See Foreman.create_resource"""
+        return cls(action=cls.CREATE, resource_type=resource_type, resource=resource, data=data,
+                   resource_id=resource_id, component=component, additional_data=additional_data)
+
+    @classmethod
+    def update(cls, resource_type, resource_id, data, component=None, component_id=None):
+        """See Foreman.update_resource"""
+        return cls(action=cls.UPDATE, resource_type=resource_type, resource_id=resource_id, data=data,
+                   component=component, component_id=component_id)
+
+    @classmethod
+    def delete(cls, resource_type, resource_id, component=None, component_id=None):
+        """See Foreman.delete_resource"""
+        return cls(action=cls.DELETE, resource_type=resource_type, resource_id=resource_id,
+                   component=component, component_id=component_id)
+
+    def execute(self, foreman):
+        """Send the operation to Foreman
+
+        Args:
+          foreman (Foreman): Client to use
+        Returns:
+          dict
+        """
+        if self.action == self.CREATE:
+            return foreman.create_resource(resource_type=self.resource_type,
+                                           resource=self.resource,
+                                           data=self.data,
+                                           resource_id=self.resource_id,
+                                           component=self.component,
+                                           additional_data=self.additional_data)
+        if self.action == self.UPDATE:
+            return foreman.update_resource(resource_type=self.resource_type,
+                                           resource_id=self.resource_id,
+                                           data=self.data,
+                                           component=self.component,
+                                           component_id=self.component_id)
+        return foreman.delete_resource(resource_type=self.resource_type,
+                                       resource_id=self.resource_id,
+                                       component=self.component,
+                                       component_id=self.component_id)
+
+    def __repr__(self):
+        path = [self.resource_type, self.resource_id, self.component, self.component_id]
+        return 'BatchOperation({0} {1})'.format(self.action, '/'.join(str(part) for part in path if part))
+
+
+class BatchResult(object):
+    """Outcome of one item of a batch
+    """
+    __slots__ = ('item', 'result', 'error')
+
+    def __init__(self, item, result=None, error=None):
+        self.item = item
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return 'BatchResult(item={0!r}, result={1!r})'.format(self.item, self.result)
+        return 'BatchResult(item={0!r}, error={1!r})'.format(self.item, self.error)
+
+
+class BatchReport(object):
+    """BatchReport Class
+
+    Results of all items of a batch in input order.
+    """
+
+    def __init__(self, results, stopped=False):
+        """Init
+
+        Args:
+          results (list): BatchResult of every executed item
+          stopped (bool): Execution stopped on the first error, remaining
+              items were not executed
+        """
+        self.results = results
+        self.stopped = stopped
+
+    @property
+    def succeeded(self):
+        return [result for result in self.results if result.ok]
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def ok(self):
+        return not self.stopped and all(result.ok for result in self.results)
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+    def to_dict(self):
+        """Return the report as dict of item to result or error message
+
+        Returns:
+          dict
+        """
+        report = {}
+        for result in self.results:
+            if result.ok:
+                report[result.item] = {'result': result.result}
+            else:
+                report[result.item] = {'error': getattr(result.error, 'message', None) or str(result.error)}
+        return report
+
+
+def run_concurrently(func, items, workers=1, rate=None, stop_on_error=False, errors=(Exception,),
+                     keep_results=True):
+    """Call func for every item with bounded concurrency
+
+    Items are consumed lazily, at most twice as many as workers are pending
+    at any time.
+
+    Args:
+      func (callable): Function called with one item
+      items (iterable): Items to process
+      workers (int): Number of concurrent calls
+      rate (float): Maximum number of calls started per second
+      stop_on_error (bool): Do not start further calls after the first error
+      errors (tuple): Exception types recorded as item errors, others are
+          raised
+      keep_results (bool): Keep the results of successful items in the
+          report, only failures are kept otherwise so memory use does not
+          grow with the number of items
+    Returns:
+      BatchReport
+    """
+    bucket = TokenBucket(rate=rate, burst=1) if rate else None
+
+    def call(item):
+        if bucket is not None:
+            bucket.acquire()
+        return func(item)
+
+    def record(index, item, future):
+        try:
+            result = future.result()
+            if keep_results:
+                results.append((index, BatchResult(item=item, result=result)))
+        except errors as e:
+            results.append((index, BatchResult(item=item, error=e)))
+            return False
+        return True
+
+    workers = max(workers or 1, 1)
+    items = enumerate(items)
+    results = []
+    pending = {}
+    stopped = False
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(count):
+            for index, item in itertools.islice(items, count):
+                pending[executor.submit(call, item)] = (index, item)
+
+        submit(workers * 2)
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                index, item = pending.pop(future)
+                if not record(index, item, future) and stop_on_error:
+                    stopped = True
+            if stopped:
+                for future in pending:
+                    future.cancel()
+                for future, (index, item) in pending.items():
+                    if not future.cancelled():
+                        record(index, item, future)
+                break
+            submit(len(done))
+    results.sort(key=lambda result: result[0])
+    return BatchReport(results=[result for _, result in results], stopped=stopped)
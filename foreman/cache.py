@@ -0,0 +1,235 @@
+"""
+Response cache for Foreman lookups
+"""
+
+import collections
+import copy
+import threading
+import time
+
+FOREMAN_CACHE_TTL = 300
+FOREMAN_CACHE_MAXSIZE = 1024
+
+
+class CacheEntry(object):
+    """A cached response, the time it expires and its validators
+    """
+    __slots__ = ('resource_type', 'url', 'value', 'expires', 'etag', 'last_modified')
+
+    def __init__(self, resource_type, url, value, expires, etag=None, last_modified=None):
+        self.resource_type = resource_type
+        self.url = url
+        self.value = value
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def is_fresh(self):
+        return self.expires > time.time()
+
+    def can_revalidate(self):
+        return bool(self.etag or self.last_modified)
+
+    def get_conditional_headers(self):
+        """Return the headers to revalidate the entry with a conditional GET
+
+        Returns:
+          dict
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def get_value(self):
+        return copy.deepcopy(self.value)
+
+
+class ResponseCache(object):
+    """ResponseCache Class
+
+    Thread safe LRU cache of parsed GET responses keyed by URL and query
+    parameters. Values are copied on the way in and out so callers can
+    modify the returned data.
+
+    Expired responses carrying an ETag or Last-Modified validator are kept
+    and revalidated with a conditional GET; a 304 answer renews them without
+    transferring the body again.
+    """
+
+    def __init__(self, ttl=FOREMAN_CACHE_TTL, ttls=None, maxsize=FOREMAN_CACHE_MAXSIZE,
+                 revalidate=False):
+        """Init
+
+        Args:
+          ttl (int): Seconds a response stays valid
+          ttls (dict): TTL per resource type (e.g. {'hosts': 30}), a TTL of
+              0 only keeps responses which can be revalidated
+          maxsize (int): Maximum number of cached responses
+          revalidate (bool): Revalidate responses on every lookup instead of
+              trusting them until they expire
+        """
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.maxsize = maxsize
+        self.revalidate = revalidate
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url, data=None):
+        """Create the cache key of a request
+
+        Args:
+          url (str): Request URL
+          data (dict): Query parameters
+        Returns:
+          tuple
+        """
+        if not data:
+            return url, ()
+        return url, tuple(sorted((key, str(value)) for key, value in data.items()))
+
+    def get_ttl(self, resource_type):
+        return self.ttls.get(resource_type, self.ttl)
+
+    def get(self, key):
+        """Return a copy of the cached value or None if missing or expired
+
+        Args:
+          key (tuple): Cache key
+        Returns:
+          Dict
+        """
+        entry = self.get_entry(key)
+        if entry is None or not entry.is_fresh():
+            self.count_miss()
+            return None
+        self.count_hit()
+        return entry.get_value()
+
+    def count_hit(self):
+        """Count a lookup answered from the cache"""
+        with self._lock:
+            self.hits += 1
+
+    def count_miss(self):
+        """Count a lookup which had to be sent to Foreman"""
+        with self._lock:
+            self.misses += 1
+
+    def get_entry(self, key):
+        """Return the cache entry of a key, even if expired
+
+        Expired entries without validators are dropped.
+
+        Args:
+          key (tuple): Cache key
+        Returns:
+          CacheEntry
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            if not entry.is_fresh() and not entry.can_revalidate():
+                return None
+            self._entries[key] = entry
+        return entry
+
+    def set(self, key, resource_type, value, etag=None, last_modified=None):
+        """Cache a value
+
+        Args:
+          key (tuple): Cache key
+          resource_type (str): Resource type the value belongs to
+          value (dict): Value to cache
+          etag (str): ETag header of the response
+          last_modified (str): Last-Modified header of the response
+        """
+        ttl = self.get_ttl(resource_type)
+        if not ttl and not (etag or last_modified):
+            return
+        entry = CacheEntry(resource_type=resource_type,
+                           url=key[0],
+                           value=copy.deepcopy(value),
+                           expires=time.time() + ttl,
+                           etag=etag,
+                           last_modified=last_modified)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def renew(self, entry):
+        """Extend the lifetime of an entry confirmed by a 304 response
+
+        The lookup is counted as hit.
+
+        Args:
+          entry (CacheEntry): Revalidated entry
+        """
+        with self._lock:
+            entry.expires = time.time() + self.get_ttl(entry.resource_type)
+            self.revalidations += 1
+            self.hits += 1
+
+    def invalidate(self, url=None, prefix=None, resource_ids=None):
+        """Drop cached values
+
+        A resource may be cached under its id and its name (hosts/5 and
+        hosts/web01.example.com). With resource_ids the responses of a
+        resource are dropped under every identifier its cached responses
+        are found by: url/<id>, url/<name> whose cached value has one of the
+        ids, and all URLs below them. Components only cached under an
+        identifier whose resource itself is not cached are not found.
+
+        Args:
+          url (str): Drop all values requested from exactly this URL
+          prefix (str): Drop all values requested from this URL and all URLs
+              below it
+          resource_ids (list): Identifiers of resources below url to drop
+        """
+        with self._lock:
+            if url is None and prefix is None:
+                self._entries.clear()
+                return
+            prefixes = set([prefix]) if prefix else set()
+            if url is not None and resource_ids:
+                ids = set(str(resource_id) for resource_id in resource_ids)
+                for (entry_url, _), entry in self._entries.items():
+                    if not entry_url.startswith(url + '/'):
+                        continue
+                    path = entry_url[len(url) + 1:]
+                    identifier = path.split('/', 1)[0]
+                    if path == identifier and isinstance(entry.value, dict) and str(entry.value.get('id')) in ids:
+                        prefixes.add(url + '/' + identifier)
+                prefixes.update(url + '/' + resource_id for resource_id in ids)
+            for key in list(self._entries):
+                entry_url = key[0]
+                if entry_url == url or any(entry_url == below or entry_url.startswith(below + '/')
+                                           for below in prefixes):
+                    del self._entries[key]
+
+    def clear(self):
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return hit and miss counters
+
+        Returns:
+          dict
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'size': len(self._entries)}
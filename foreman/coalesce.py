@@ -0,0 +1,82 @@
+"""
+Coalescing of identical concurrent requests
+
+While a request is in flight, callers asking for the same key wait for it
+instead of sending their own and all get its result. The asyncio variant
+AsyncSingleFlight lives in foreman.aio, this module is imported on Python 2.
+"""
+
+import copy
+import threading
+
+
+class CoalesceTimeout(Exception):
+    """A caller waiting for a request in flight timed out"""
+
+
+class _Flight(object):
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self, event):
+        self.event = event
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """SingleFlight Class
+
+    Thread safe: the first caller of a key runs the function, callers of the
+    same key arriving before it returned wait and get a deep copy of the
+    result or the same exception.
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, timeout=None):
+        """Run func once for all concurrent callers of key
+
+        Args:
+          key: Hashable request key
+          func (callable): Function sending the request
+          timeout (float): Seconds a waiting caller waits at most
+        Returns:
+          Result of func
+        Raises:
+          CoalesceTimeout: If a waiting caller timed out
+          Exception raised by func
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(threading.Event())
+            else:
+                self.shared += 1
+        if not leader:
+            if not flight.event.wait(timeout):
+                raise CoalesceTimeout(key)
+            return self._get_result(flight)
+        try:
+            flight.result = func()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+        return flight.result
+
+    @staticmethod
+    def _get_result(flight):
+        if flight.error is not None:
+            raise flight.error
+        return copy.deepcopy(flight.result)
+
+    def __len__(self):
+        return len(self._flights)
+
@@ -0,0 +1,350 @@
+"""
+Compare the resources of two Foreman instances, snapshots or exports
+
+Both sides of a resource type are spooled into a temporary SQLite database
+on disk and read back sorted by natural key (title, login or name, see
+foreman.reconcile.get_natural_key), then compared in a single merge-join
+pass. Only one page of each side is held in memory, so instances with tens
+of thousands of resources can be compared. Foreman's own ordering is not
+used as it depends on the collation of its database.
+
+Ids and timestamps differ between instances and are ignored, as are
+<reference>_id and <reference>_ids keys as long as ignore_ids is set; the
+<reference>_name keys Foreman returns next to them are compared instead.
+
+Listings lack fields like the template of config templates or the
+parameters of hostgroups. Resources of FOREMAN_DIFF_FULL_TYPES are fetched
+one by one from a Foreman, exports contain them as well. Snapshots only
+hold listings, a Foreman compared to a snapshot is compared by its listing.
+"""
+
+import itertools
+import json
+import os
+import sqlite3
+import threading
+
+from foreman.batch import run_concurrently
+from foreman.export import get_file_name, read_manifest, read_ndjson
+from foreman.foreman import ForemanError, FOREMAN_PAGE_SIZE, COMMON_PARAMETERS, CONFIG_TEMPLATES, HOSTGROUPS, SUBNETS
+from foreman.reconcile import get_natural_key
+from foreman.search import string_types
+from foreman.snapshot import Snapshot
+
+FOREMAN_DIFF_TYPES = (COMMON_PARAMETERS, CONFIG_TEMPLATES, HOSTGROUPS, SUBNETS)
+# Resource types whose show responses contain fields listings lack
+FOREMAN_DIFF_FULL_TYPES = frozenset([CONFIG_TEMPLATES, HOSTGROUPS, SUBNETS])
+FOREMAN_DIFF_IGNORED_KEYS = frozenset(['id', 'created_at', 'updated_at'])
+
+ADDED = 'added'
+REMOVED = 'removed'
+CHANGED = 'changed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    side INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS spool_key ON spool (side, key, seq);
+"""
+
+_OLD = 0
+_NEW = 1
+
+
+def normalize(value, ignored_keys=FOREMAN_DIFF_IGNORED_KEYS, ignore_ids=True):
+    """Return a resource without the keys ignored when comparing
+
+    Nested resources are normalized too and lists of them sorted, so
+    associations listed in a different order compare equal.
+
+    Args:
+      value: Resource or value of a resource
+      ignored_keys (iterable): Keys to drop
+      ignore_ids (bool): Drop <reference>_id and <reference>_ids keys
+    Returns:
+      Normalized value
+    """
+    if isinstance(value, dict):
+        return dict((key, normalize(item, ignored_keys, ignore_ids)) for key, item in value.items()
+                    if key not in ignored_keys and not (ignore_ids and key.endswith(('_id', '_ids'))))
+    if isinstance(value, list) and any(isinstance(item, dict) for item in value):
+        items = [normalize(item, ignored_keys, ignore_ids) for item in value]
+        return sorted(items, key=lambda item: json.dumps(item, sort_keys=True))
+    return value
+
+
+def diff_fields(old, new):
+    """Return the fields which differ between two normalized resources
+
+    Args:
+      old (dict): Resource
+      new (dict): Resource
+    Returns:
+      dict of field to (old value, new value), None for a missing field
+    """
+    return dict((key, (old.get(key), new.get(key))) for key in sorted(set(old) | set(new))
+                if old.get(key) != new.get(key))
+
+
+def merge_join(old, new):
+    """Pair the items of two iterables sorted by key
+
+    Items with the same key are paired in order, an item without a partner
+    is paired with None.
+
+    Args:
+      old (iterable): (key, item) tuples sorted by key
+      new (iterable): (key, item) tuples sorted by key
+    Returns:
+      generator of (key, old item, new item)
+    """
+    old, new = iter(old), iter(new)
+    old_entry, new_entry = next(old, None), next(new, None)
+    while old_entry is not None or new_entry is not None:
+        if new_entry is None or (old_entry is not None and old_entry[0] < new_entry[0]):
+            yield old_entry[0], old_entry[1], None
+            old_entry = next(old, None)
+        elif old_entry is None or new_entry[0] < old_entry[0]:
+            yield new_entry[0], None, new_entry[1]
+            new_entry = next(new, None)
+        else:
+            yield old_entry[0], old_entry[1], new_entry[1]
+            old_entry, new_entry = next(old, None), next(new, None)
+
+
+class ResourceChange(object):
+    """ResourceChange Class
+
+    A resource only on the new side (added), only on the old side (removed)
+    or on both with different fields (changed).
+    """
+
+    def __init__(self, action, resource_type, key, fields=None, resource=None):
+        self.action = action
+        self.resource_type = resource_type
+        self.key = key
+        # Field to (old value, new value) for changed resources
+        self.fields = fields or {}
+        # Normalized resource for added and removed resources
+        self.resource = resource
+
+    def to_dict(self):
+        change = {'action': self.action, 'resource_type': self.resource_type, 'key': self.key}
+        if self.action == CHANGED:
+            change['fields'] = dict((key, {'old': old, 'new': new}) for key, (old, new) in self.fields.items())
+        else:
+            change['resource'] = self.resource
+        return change
+
+    def __repr__(self):
+        return '<ResourceChange {0} {1} {2!r}>'.format(self.action, self.resource_type, self.key)
+
+
+class ChangeSet(object):
+    """ChangeSet Class
+
+    Changes and the number of added, removed, changed and unchanged
+    resources per resource type.
+    """
+
+    def __init__(self):
+        self.changes = []
+        self.summary = {}
+
+    def get_counts(self, resource_type):
+        return self.summary.setdefault(resource_type, {ADDED: 0, REMOVED: 0, CHANGED: 0, 'unchanged': 0})
+
+    def count(self, resource_type, action):
+        self.get_counts(resource_type)[action] += 1
+
+    def add(self, change):
+        self.changes.append(change)
+        self.count(change.resource_type, change.action)
+
+    def get_changes(self, resource_type=None, action=None):
+        return [change for change in self.changes
+                if (resource_type is None or change.resource_type == resource_type) and
+                (action is None or change.action == action)]
+
+    @property
+    def added(self):
+        return self.get_changes(action=ADDED)
+
+    @property
+    def removed(self):
+        return self.get_changes(action=REMOVED)
+
+    @property
+    def changed(self):
+        return self.get_changes(action=CHANGED)
+
+    def __iter__(self):
+        return iter(self.changes)
+
+    def __len__(self):
+        return len(self.changes)
+
+    def __bool__(self):
+        return bool(self.changes)
+
+    __nonzero__ = __bool__
+
+    def to_dict(self):
+        return {'summary': self.summary,
+                'changes': [change.to_dict() for change in self.changes]}
+
+
+class Differ(object):
+    """Differ Class
+
+    with Foreman('staging.example.com', 443, 'admin', 'p4ssw0rd') as staging, \\
+            Foreman('foreman.example.com', 443, 'admin', 'p4ssw0rd') as production:
+        changes = Differ(production, staging).diff()
+
+    A side is a Foreman, a Snapshot or the directory of an export. Changes
+    are reported from the old side to the new side: added resources exist
+    only on the new side.
+    """
+
+    def __init__(self, old, new, ignored_keys=FOREMAN_DIFF_IGNORED_KEYS, ignore_ids=True,
+                 page_size=FOREMAN_PAGE_SIZE, workers=None, path='', full_types=FOREMAN_DIFF_FULL_TYPES):
+        """Init
+
+        Args:
+          old (Foreman, Snapshot or str): Old side
+          new (Foreman, Snapshot or str): New side
+          ignored_keys (iterable): Keys not compared
+          ignore_ids (bool): Do not compare <reference>_id and
+              <reference>_ids keys
+          page_size (int): Number of resources to request per page
+          workers (int): Number of pages to request concurrently from a
+              Foreman
+          path (str): SQLite file to spool resources to, a temporary file
+              removed when closed by default
+          full_types (set): Resource types compared by the show responses
+              of a Foreman instead of its listing
+        """
+        self.old = old
+        self.new = new
+        self.ignored_keys = frozenset(ignored_keys)
+        self.ignore_ids = ignore_ids
+        self.page_size = page_size
+        self.workers = workers
+        self.full_types = frozenset(full_types)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def _iter_full(self, source, resource_type, resources, workers):
+        """Fetch the show responses of listed resources, a page at a time"""
+        def get_resource(resource):
+            try:
+                return source.get_resource(resource_type=resource_type, resource_id=resource['id'])
+            except ForemanError as e:
+                # Deleted since the listing
+                if e.status_code != 404:
+                    raise
+                return None
+
+        while True:
+            page = list(itertools.islice(resources, self.page_size))
+            if not page:
+                return
+            report = run_concurrently(get_resource, page, workers=workers or source.max_workers,
+                                      errors=(ForemanError,))
+            for result in report.failed:
+                raise result.error
+            for result in report.results:
+                if result.result is not None:
+                    yield result.result
+
+    def _iter_source(self, source, resource_type, full=True):
+        if isinstance(source, Snapshot):
+            return source.iter_resources(resource_type=resource_type)
+        if isinstance(source, string_types):
+            if get_file_name(resource_type) not in read_manifest(source)['files']:
+                return iter(())
+            return read_ndjson(os.path.join(source, get_file_name(resource_type)))
+        workers = min(self.workers, source.max_workers) if self.workers else None
+        resources = source.iter_resources(resource_type=resource_type, page_size=self.page_size, workers=workers)
+        if full and resource_type in self.full_types:
+            return self._iter_full(source, resource_type, resources, workers)
+        return resources
+
+    def _spool(self, side, resource_type):
+        full = not isinstance(self.old, Snapshot) and not isinstance(self.new, Snapshot)
+        resources = self._iter_source(self.old if side == _OLD else self.new, resource_type, full=full)
+        rows = ((side, str(get_natural_key(resource_type, resource) or resource.get('id')), seq,
+                 json.dumps(normalize(resource, self.ignored_keys, self.ignore_ids), sort_keys=True))
+                for seq, resource in enumerate(resources))
+        while True:
+            chunk = list(itertools.islice(rows, self.page_size))
+            if not chunk:
+                return
+            with self._lock, self._db:
+                self._db.executemany('INSERT INTO spool (side, key, seq, data) VALUES (?, ?, ?, ?)', chunk)
+
+    def _iter_spool(self, side):
+        with self._lock:
+            cursor = self._db.execute('SELECT key, data FROM spool WHERE side = ? ORDER BY key, seq', (side,))
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(self.page_size)
+            if not rows:
+                return
+            for key, data in rows:
+                yield key, data
+
+    def iter_diff(self, resource_type, changeset=None):
+        """Compare the resources of a type
+
+        Args:
+          resource_type (str): Resource type
+          changeset (ChangeSet): Change set to count unchanged resources in
+        Returns:
+          generator of ResourceChange
+        """
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM spool')
+        # Both sides are read at the same time, SQLite writes are serialized
+        report = run_concurrently(lambda side: self._spool(side, resource_type), (_OLD, _NEW), workers=2)
+        for result in report.failed:
+            raise result.error
+        for key, old, new in merge_join(self._iter_spool(_OLD), self._iter_spool(_NEW)):
+            if old is None:
+                yield ResourceChange(ADDED, resource_type, key, resource=json.loads(new))
+            elif new is None:
+                yield ResourceChange(REMOVED, resource_type, key, resource=json.loads(old))
+            elif old != new:
+                yield ResourceChange(CHANGED, resource_type, key, fields=diff_fields(json.loads(old), json.loads(new)))
+            elif changeset is not None:
+                changeset.count(resource_type, 'unchanged')
+
+    def diff(self, resource_types=FOREMAN_DIFF_TYPES):
+        """Compare several resource types
+
+        Args:
+          resource_types (list): Resource types to compare
+        Returns:
+          ChangeSet
+        """
+        changeset = ChangeSet()
+        for resource_type in resource_types:
+            changeset.get_counts(resource_type)
+            for change in self.iter_diff(resource_type, changeset=changeset):
+                changeset.add(change)
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM spool')
+        return changeset
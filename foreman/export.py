@@ -0,0 +1,359 @@
+"""
+Export all resources of a Foreman instance
+
+Every resource type is written to its own gzip compressed file with one
+JSON document per line (NDJSON), streamed page by page so memory use does
+not depend on the size of the instance. Listings lack fields of show
+responses (e.g. the template of config templates or the locations of
+resources), resources of FOREMAN_EXPORT_FULL_TYPES are fetched one by one
+with bounded concurrency and written as returned by show. Components of resources (e.g. host
+parameters) are written to files of their own, one line per component
+resource wrapped with the id and name of its parent:
+
+{"parent_id": 1, "parent_name": "web01.example.com", "resource": {...}}
+
+manifest.json lists every file with its resource type, number of
+resources and SHA-256 checksum.
+"""
+
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+
+import concurrent.futures
+import requests
+
+from foreman.batch import run_concurrently
+from foreman.foreman import (ForemanError, FOREMAN_MAX_WORKERS, FOREMAN_PAGE_SIZE, ARCHITECTURES,
+                             AUTH_SOURCE_LDAPS, COMMON_PARAMETERS, COMPUTE_PROFILES, COMPUTE_RESOURCES,
+                             CONFIG_TEMPLATES, DOMAINS, ENVIRONMENTS, EXTERNAL_USERGROUPS, FILTERS, HOSTGROUPS,
+                             HOSTS, IMAGES, LOCATIONS, MEDIA, OPERATINGSYSTEMS, ORGANIZATIONS,
+                             OS_DEFAULT_TEMPLATES, PARAMETERS, PARTITION_TABLES, PERMISSIONS, REALMS, ROLES,
+                             SETTINGS, SMART_PROXIES, SUBNETS, TEMPLATE_KINDS, USERGROUPS, USERS)
+
+FOREMAN_EXPORT_FORMAT = 1
+FOREMAN_EXPORT_MANIFEST = 'manifest.json'
+
+# Resource types which can be listed on their own
+FOREMAN_EXPORT_TYPES = (ARCHITECTURES, AUTH_SOURCE_LDAPS, COMMON_PARAMETERS, COMPUTE_PROFILES, COMPUTE_RESOURCES,
+                        CONFIG_TEMPLATES, DOMAINS, ENVIRONMENTS, FILTERS, HOSTGROUPS, HOSTS, LOCATIONS, MEDIA,
+                        OPERATINGSYSTEMS, ORGANIZATIONS, PARTITION_TABLES, PERMISSIONS, REALMS, ROLES, SETTINGS,
+                        SMART_PROXIES, SUBNETS, TEMPLATE_KINDS, USERGROUPS, USERS)
+
+# Resource types whose show responses contain fields listings lack, e.g.
+# template, layout or associated locations and organizations
+FOREMAN_EXPORT_FULL_TYPES = frozenset(FOREMAN_EXPORT_TYPES) - frozenset([COMMON_PARAMETERS, PERMISSIONS, SETTINGS,
+                                                                         TEMPLATE_KINDS])
+
+# Components listed per resource of a type
+FOREMAN_EXPORT_COMPONENTS = {
+    COMPUTE_RESOURCES: (IMAGES,),
+    DOMAINS: (PARAMETERS,),
+    HOSTGROUPS: (PARAMETERS,),
+    HOSTS: (PARAMETERS,),
+    OPERATINGSYSTEMS: (OS_DEFAULT_TEMPLATES, PARAMETERS),
+    SUBNETS: (PARAMETERS,),
+    USERGROUPS: (EXTERNAL_USERGROUPS,),
+}
+
+
+def get_file_name(resource_type, component=None):
+    """Return the name of the export file of a resource type or component
+
+    Args:
+      resource_type (str): Resource type
+      component (str): Component of the resource type
+    Returns:
+      str
+    """
+    if component:
+        return '{0}.{1}.ndjson.gz'.format(resource_type, component)
+    return '{0}.ndjson.gz'.format(resource_type)
+
+
+def read_manifest(directory):
+    """Return the manifest of an export
+
+    Args:
+      directory (str): Export directory
+    Returns:
+      dict
+    """
+    with open(os.path.join(directory, FOREMAN_EXPORT_MANIFEST)) as manifest:
+        return json.load(manifest)
+
+
+def read_ndjson(path):
+    """Iterate over the documents of a compressed NDJSON file
+
+    Args:
+      path (str): File to read
+    Returns:
+      generator of dict
+    """
+    with gzip.open(path, 'rb') as ndjson:
+        for line in ndjson:
+            if line.strip():
+                yield json.loads(line.decode('utf-8'))
+
+
+def get_checksum(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 checksum of a file as hex string"""
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+class _HashingWriter(io.RawIOBase):
+    """File wrapper computing the checksum and size of written bytes"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.checksum = hashlib.sha256()
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.checksum.update(data)
+        self.size += len(data)
+        return self.raw.write(data)
+
+    def flush(self):
+        self.raw.flush()
+
+
+class NDJSONWriter(object):
+    """NDJSONWriter Class
+
+    Write documents to a gzip compressed NDJSON file. The file is written
+    under a temporary name and renamed when closed without error.
+    """
+
+    def __init__(self, path, compresslevel=6):
+        """Init
+
+        Args:
+          path (str): File to write
+          compresslevel (int): gzip compression level
+        """
+        self.path = path
+        self.count = 0
+        self._file = open(path + '.tmp', 'wb')
+        self._hashing = _HashingWriter(self._file)
+        self._gzip = gzip.GzipFile(filename=os.path.basename(path)[:-3], mode='wb', fileobj=self._hashing,
+                                   compresslevel=compresslevel, mtime=0)
+        self._lock = threading.Lock()
+
+    def write(self, document):
+        line = json.dumps(document, sort_keys=True, separators=(',', ':')).encode('utf-8') + b'\n'
+        with self._lock:
+            self._gzip.write(line)
+            self.count += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(commit=exc_type is None)
+
+    def close(self, commit=True):
+        self._gzip.close()
+        self._file.close()
+        if commit:
+            os.rename(self.path + '.tmp', self.path)
+        else:
+            os.remove(self.path + '.tmp')
+
+    def get_info(self):
+        return {'count': self.count,
+                'bytes': self._hashing.size,
+                'sha256': self._hashing.checksum.hexdigest()}
+
+
+class Exporter(object):
+    """Exporter Class
+
+    exporter = Exporter(foreman, '/var/backups/foreman/2016-01-01', workers=4)
+    manifest = exporter.run()
+
+    Resource types are exported concurrently by workers threads, the full
+    resources and the components of one type by up to workers requests at a
+    time.
+    Resource types Foreman does not know (e.g. realms without the realm
+    feature) are listed as errors in the manifest, components which could
+    not be listed for some parents as errors of their file.
+    """
+
+    def __init__(self, foreman, directory, resource_types=FOREMAN_EXPORT_TYPES, components=None,
+                 workers=FOREMAN_MAX_WORKERS, page_size=FOREMAN_PAGE_SIZE, compresslevel=6,
+                 full_types=FOREMAN_EXPORT_FULL_TYPES):
+        """Init
+
+        Args:
+          foreman (Foreman): Foreman to export
+          directory (str): Directory to write to, created if missing
+          resource_types (list): Resource types to export
+          components (dict): Resource type to components to export, defaults
+              to FOREMAN_EXPORT_COMPONENTS
+          workers (int): Number of resource types exported concurrently and
+              number of concurrent component requests per type
+          page_size (int): Number of resources to request per page
+          compresslevel (int): gzip compression level
+          full_types (set): Resource types exported as returned by show
+        """
+        self.foreman = foreman
+        self.directory = directory
+        self.resource_types = list(resource_types)
+        self.components = FOREMAN_EXPORT_COMPONENTS if components is None else components
+        self.workers = max(workers or 1, 1)
+        self.page_size = page_size
+        self.compresslevel = compresslevel
+        self.full_types = frozenset(full_types)
+
+    def _get_writer(self, resource_type, component=None):
+        return NDJSONWriter(os.path.join(self.directory, get_file_name(resource_type, component)),
+                            compresslevel=self.compresslevel)
+
+    def _get_full_resource(self, resource_type, resource):
+        try:
+            return self.foreman.get_resource(resource_type=resource_type, resource_id=resource['id'])
+        except ForemanError as e:
+            # Resources deleted since the listing and resources Foreman
+            # can not show (organizations of Foreman 1.7) are kept as listed
+            if e.status_code != 404:
+                raise
+            return resource
+
+    def export_type(self, resource_type, parents=None):
+        """Export all resources of a type
+
+        Args:
+          resource_type (str): Resource type
+          parents (list): Extended by the id and name of every exported
+              resource, see export_component
+        Returns:
+          dict with count, bytes and sha256 of the file
+        """
+        def export_resource(resource):
+            if resource_type in self.full_types and 'id' in resource:
+                resource = self._get_full_resource(resource_type, resource)
+            writer.write(resource)
+            if parents is not None:
+                parents.append({'id': resource.get('id'), 'name': resource.get('name')})
+
+        with self._get_writer(resource_type) as writer:
+            resources = self.foreman.iter_resources(resource_type=resource_type, page_size=self.page_size)
+            report = run_concurrently(export_resource, resources, workers=self.workers,
+                                      errors=(ForemanError, requests.RequestException), keep_results=False)
+            for result in report.failed:
+                raise result.error
+        return writer.get_info()
+
+    def export_component(self, resource_type, component, parents=None):
+        """Export a component of all resources of a type
+
+        Parents whose component can not be listed are skipped and listed as
+        errors of the file.
+
+        Args:
+          resource_type (str): Resource type
+          component (str): Component, e.g. parameters
+          parents (list): id and name of the resources of the type as
+              collected by export_type, listed if None
+        Returns:
+          dict with count, bytes, sha256 and errors of the file
+        """
+        def export_parent(parent):
+            resources = self.foreman.iter_resources(resource_type=resource_type, resource_id=parent['id'],
+                                                    component=component, page_size=self.page_size)
+            for resource in resources:
+                writer.write({'parent_id': parent['id'],
+                              'parent_name': parent.get('name'),
+                              'resource': resource})
+
+        with self._get_writer(resource_type, component) as writer:
+            if parents is None:
+                parents = self.foreman.iter_resources(resource_type=resource_type, page_size=self.page_size,
+                                                      fields=['id', 'name'])
+            report = run_concurrently(export_parent, parents, workers=self.workers,
+                                      errors=(ForemanError, requests.RequestException), keep_results=False)
+        info = writer.get_info()
+        info['errors'] = [{'parent_id': result.item['id'],
+                           'parent_name': result.item.get('name'),
+                           'error': getattr(result.error, 'message', None) or str(result.error)}
+                          for result in report.failed]
+        return info
+
+    def _export(self, resource_type):
+        """Export a resource type and its components
+
+        Returns:
+          (files, errors), file name to info and file name to error
+        """
+        files = {}
+        errors = {}
+        components = self.components.get(resource_type, ())
+        parents = [] if components else None
+        for component in (None,) + tuple(components):
+            file_name = get_file_name(resource_type, component)
+            try:
+                if component is None:
+                    info = self.export_type(resource_type, parents=parents)
+                else:
+                    info = self.export_component(resource_type, component, parents=parents)
+            except (ForemanError, requests.RequestException) as e:
+                errors[file_name] = getattr(e, 'message', None) or str(e)
+                if component is None:
+                    # The parents are incomplete, components list them
+                    parents = None
+                continue
+            info.update({'resource_type': resource_type, 'component': component})
+            files[file_name] = info
+        return files, errors
+
+    def run(self):
+        """Export all resource types and write the manifest
+
+        Returns:
+          dict: The manifest
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        manifest = {'format': FOREMAN_EXPORT_FORMAT,
+                    'foreman': self.foreman.url,
+                    'started_at': datetime.datetime.utcnow().isoformat() + 'Z',
+                    'files': {},
+                    'errors': {}}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for files, errors in executor.map(self._export, self.resource_types):
+                manifest['files'].update(files)
+                manifest['errors'].update(errors)
+        manifest['finished_at'] = datetime.datetime.utcnow().isoformat() + 'Z'
+        with open(os.path.join(self.directory, FOREMAN_EXPORT_MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        return manifest
+
+
+def verify(directory):
+    """Compare the files of an export with the checksums of its manifest
+
+    Args:
+      directory (str): Export directory
+    Returns:
+      list of file names which are missing or do not match
+    """
+    manifest = read_manifest(directory)
+    invalid = []
+    for file_name, info in sorted(manifest['files'].items()):
+        path = os.path.join(directory, file_name)
+        if not os.path.exists(path) or get_checksum(path) != info['sha256']:
+            invalid.append(file_name)
+    return invalid
@@ -4,9 +4,28 @@ Created on 04.03.2015
 @author: tkrah
 """
 
+import collections
+import itertools
 import json
+import math
+import sys
+import time
 
+import concurrent.futures
 import requests
+import requests.adapters
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from foreman.batch import run_concurrently
+from foreman.cache import ResponseCache
+from foreman.coalesce import CoalesceTimeout, SingleFlight
+from foreman.records import RecordTable, get_record_class
+from foreman.search import SearchQuery, search_query
+from foreman.stats import RequestEvent
 
 # from requests.auth import HTTPBasicAuth
 try:
@@ -19,6 +38,16 @@ FOREMAN_REQUEST_HEADERS = {
     'accept': 'application/json'
 }
 FOREMAN_API_VERSION = 'v2'
+FOREMAN_POOL_CONNECTIONS = 10
+FOREMAN_POOL_MAXSIZE = 10
+FOREMAN_PAGE_SIZE = 500
+FOREMAN_MAX_WORKERS = 4
+FOREMAN_CONNECT_TIMEOUT = 10
+FOREMAN_READ_TIMEOUT = 300
+# json.loads accepts bytes from Python 3.6 on (and str is bytes on Python 2)
+_JSON_LOADS_BYTES = bytes is str or sys.version_info >= (3, 6)
+# Fields returned by listings requested with thin=true
+FOREMAN_THIN_FIELDS = frozenset(['id', 'name'])
 
 ARCHITECTURES = 'architectures'
 ARCHITECTURE = 'architecture'
@@ -81,6 +110,46 @@ USERGROUPS = 'usergroups'
 USERGROUP = 'usergroup'
 
 
+_clock = getattr(time, 'monotonic', time.time)
+
+
+def get_projection(fields, record_class=None):
+    """Return a function reducing a resource to the given keys
+
+    Args:
+      fields (list): Keys to keep, None keeps all keys
+      record_class (type): Return instances of this Record class instead of
+          dicts
+    Returns:
+      callable
+    """
+    if not fields:
+        return record_class or (lambda resource: resource)
+    fields = tuple(fields)
+    if record_class is not None:
+        return lambda resource: record_class(dict((key, resource[key]) for key in fields if key in resource))
+    return lambda resource: dict((key, resource[key]) for key in fields if key in resource)
+
+
+def json_loads(content):
+    """Decode a JSON document from bytes
+
+    orjson is used if installed, json of the standard library otherwise.
+
+    Args:
+      content (bytes): JSON document
+    Returns:
+      Decoded document
+    Raises:
+      ValueError: If content is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    if not _JSON_LOADS_BYTES and isinstance(content, bytes):
+        content = content.decode('utf-8')
+    return json.loads(content)
+
+
 class ForemanError(Exception):
     """ForemanError Class
 
@@ -94,6 +163,21 @@ class ForemanError(Exception):
         super(ForemanError, self).__init__()
 
 
+class ForemanTimeoutError(ForemanError):
+    """ForemanTimeoutError Class
+
+    Raised when Foreman did not answer within the timeout or a call exceeded
+    its deadline. status_code is None as no response was received.
+    """
+
+
+def _get_deadline(seconds):
+    """Return the clock time a call of the given duration has to end"""
+    if seconds is None:
+        return None
+    return _clock() + seconds
+
+
 class Foreman:
     """Foreman Class
 
@@ -101,8 +185,54 @@ class Foreman:
 
     """
 
-    def __init__(self, hostname, port, username, password, ssl=True):
+    def __init__(self, hostname, port, username, password, ssl=True,
+                 session=None, adapter=None, pool_connections=FOREMAN_POOL_CONNECTIONS,
+                 pool_maxsize=FOREMAN_POOL_MAXSIZE, pool_block=False, max_retries=0,
+                 keep_alive=True, max_workers=FOREMAN_MAX_WORKERS, cache=None, retry=None,
+                 rate_limiter=None, observers=None, connect_timeout=FOREMAN_CONNECT_TIMEOUT,
+                 read_timeout=FOREMAN_READ_TIMEOUT, json_decoder=json_loads, coalesce=False):
         """Init
+
+        All requests share one pooled session so connections to Foreman are
+        reused between API calls instead of doing a new TCP/TLS handshake
+        each time.
+
+        Args:
+          hostname (str): Foreman host
+          port (int): Foreman port
+          username (str): API user
+          password (str): API password
+          ssl (bool): Use https instead of http
+          session (requests.Session): Session to use instead of creating one.
+              A passed in session is not closed by close().
+          adapter (requests.adapters.BaseAdapter): Transport to mount for
+              http:// and https://. Overrides all pool_* and max_retries
+              arguments.
+          pool_connections (int): Number of per-host connection pools to
+              cache
+          pool_maxsize (int): Maximum number of connections kept per host
+          pool_block (bool): Block when all connections of a host pool are
+              in use instead of opening additional, non pooled connections
+          max_retries (int): Number of retries on connection failures
+          keep_alive (bool): Keep connections open between requests
+          max_workers (int): Upper limit of concurrent requests a single
+              call may issue, to cap the load on the Foreman server
+          cache (foreman.cache.ResponseCache): Cache for get_resource and
+              search_resource results. Writes through this instance
+              invalidate the cached responses of the written resource.
+          retry (foreman.retry.RetryPolicy): Policy to retry failed requests,
+              e.g. on 502/503 from an overloaded Foreman
+          rate_limiter (foreman.ratelimit.RateLimiter): Limiter every request
+              has to pass, may be shared with other Foreman instances
+          observers (list): foreman.stats.RequestObserver objects told about
+              every request, e.g. a foreman.stats.RequestStats collector
+          connect_timeout (float): Seconds to wait for a connection
+          read_timeout (float): Seconds to wait for data from Foreman
+          json_decoder (callable): Function decoding a response body from
+              bytes, must raise ValueError on invalid documents
+          coalesce (bool): Send identical GET requests (same URL and query)
+              issued concurrently by several threads only once and share
+              the result
         """
         self.__auth = (username, password)
         self.hostname = hostname
@@ -114,6 +244,50 @@ class Foreman:
             self.port,
             FOREMAN_API_VERSION,
         )
+        self.max_workers = max_workers
+        self.cache = cache
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.observers = list(observers or [])
+        self.timeout = (connect_timeout, read_timeout)
+        self.json_decoder = json_decoder
+        self.single_flight = SingleFlight() if coalesce else None
+        self._owns_session = session is None
+        self.session = session if session is not None else requests.Session()
+        self.session.auth = self.__auth
+        self.session.verify = False
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+        if adapter is None and self._owns_session:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections,
+                                                    pool_maxsize=pool_maxsize,
+                                                    max_retries=max_retries,
+                                                    pool_block=pool_block)
+        if adapter is not None:
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+
+    def add_observer(self, observer):
+        """Register an observer told about every request
+
+        Args:
+          observer (foreman.stats.RequestObserver): Observer to add
+        """
+        self.observers.append(observer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close all pooled connections
+
+        A session passed in by the caller is left open.
+        """
+        if self._owns_session:
+            self.session.close()
 
     def _get_resource_url(self, resource_type, resource_id=None, component=None, component_id=None):
         """Create API URL path
@@ -135,14 +309,49 @@ class Foreman:
                     url = url + '/' + str(component_id)
         return url
 
+    def _get_resource_type(self, url):
+        """Return the resource type of an API URL
+
+        Args:
+          url (str): URL created by _get_resource_url
+        Returns:
+          str
+        """
+        return url[len(self.url) + 1:].split('/', 1)[0].split('?', 1)[0]
+
+    def _get_url_template(self, url):
+        """Return an API URL with identifiers replaced by :id
+
+        e.g. hosts/:id/parameters/:id
+
+        Args:
+          url (str): URL created by _get_resource_url
+        Returns:
+          str
+        """
+        parts = url[len(self.url) + 1:].split('?', 1)[0].split('/')
+        for i in range(1, len(parts), 2):
+            parts[i] = ':id'
+        return '/'.join(parts)
+
     def _get_request_error_message(self, data):
-        request_json = data.json()
-        if 'error' in request_json:
-            request_error = data.json().get('error')
-        elif 'errors' in request_json:
-            request_error = data.json().get('errors')
+        """Return the error message of a decoded error response
 
-        if 'message' in request_error:
+        Args:
+          data (dict): Decoded response body
+        Returns:
+          str
+        """
+        request_error = data
+        if isinstance(data, dict):
+            if 'error' in data:
+                request_error = data.get('error')
+            elif 'errors' in data:
+                request_error = data.get('errors')
+
+        if not isinstance(request_error, dict):
+            error_message = str(request_error)
+        elif 'message' in request_error:
             error_message = request_error.get('message')
         elif 'full_messages' in request_error:
             error_message = ', '.join(request_error.get('full_messages'))
@@ -151,36 +360,256 @@ class Foreman:
 
         return error_message
 
-    def _handle_request(self, req):
+    def _handle_request(self, req, cache_entry=None):
+        """Return the decoded body of a response or raise its error
+
+        The body is decoded once, straight from bytes, with the decoder of
+        the Foreman instance.
+
+        Args:
+          req (requests.Response): Response to handle
+          cache_entry (foreman.cache.CacheEntry): Entry a conditional request
+              revalidated, returned on 304
+        Returns:
+          Dict
+        """
         if req.status_code in [200, 201]:
-            return json.loads(req.text)
+            if not req.content:
+                return None
+            return self.json_decoder(req.content)
+        elif req.status_code == 304 and cache_entry is not None:
+            return cache_entry.get_value()
         elif req.status_code == 404:
             error_message = 'Not found'
         else:
-            error_message = self._get_request_error_message(data=req)
+            try:
+                error_message = self._get_request_error_message(data=self.json_decoder(req.content))
+            except ValueError:
+                # e.g. an HTML error page of a proxy
+                error_message = req.content.decode('utf-8', 'replace') or str(req.status_code)
 
         raise ForemanError(url=req.url,
                            status_code=req.status_code,
                            message=error_message)
 
-    def _get_request(self, url, data=None):
+    def _get_timeout(self, url, timeout=None, deadline=None):
+        """Return the timeout of the next attempt of a request
+
+        Connect and read timeouts are shortened to the time left until the
+        deadline.
+
+        Args:
+          url (str): URL of the request
+          timeout (float or tuple): Timeout or (connect, read) timeouts,
+              defaults to the timeouts of the Foreman instance
+          deadline (float): Clock time the request has to end
+        Returns:
+          float or tuple
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if deadline is None:
+            return timeout
+        remaining = deadline - _clock()
+        if remaining <= 0:
+            raise ForemanTimeoutError(url=url, status_code=None, message='Deadline exceeded')
+        if isinstance(timeout, tuple):
+            return tuple(remaining if value is None else min(value, remaining) for value in timeout)
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def _send(self, method, url, timeout=None, deadline=None, **kwargs):
+        """Send a request through the pooled session
+
+        Failed requests are retried as the retry policy allows. Every
+        attempt has to pass the rate limiter. Observers are told about the
+        request before the first attempt and after the last one.
+
+        Args:
+          method (str): HTTP verb
+          url (str): Full URL to request
+          timeout (float or tuple): Timeout or (connect, read) timeouts of
+              each attempt
+          deadline (float): Clock time all attempts have to end
+          kwargs: Additional arguments passed to requests
+        Returns:
+          requests.Response
+        Raises:
+          ForemanTimeoutError: On timeouts or if the deadline passed
+        """
+        event = RequestEvent(method=method,
+                             url=url,
+                             resource_type=self._get_resource_type(url),
+                             url_template=self._get_url_template(url),
+                             request_bytes=len(kwargs.get('data') or ''))
+        for observer in self.observers:
+            observer.before_request(event)
+        start = _clock()
+        try:
+            req = self._send_attempts(method, url, event=event, start=start,
+                                      timeout=timeout, deadline=deadline, **kwargs)
+        except requests.Timeout as e:
+            event.error = ForemanTimeoutError(url=url, status_code=None, message=str(e))
+            raise event.error
+        except Exception as e:
+            event.error = e
+            raise
+        else:
+            event.status_code = req.status_code
+            event.response_bytes = len(req.content)
+        finally:
+            event.latency = _clock() - start
+            for observer in self.observers:
+                observer.after_request(event)
+        return req
+
+    def _send_attempts(self, method, url, event, start, timeout=None, deadline=None, **kwargs):
+        while True:
+            permit = None
+            if self.rate_limiter is not None:
+                permit = self.rate_limiter.acquire(method, resource_type=event.resource_type)
+                event.throttled += permit.waited
+            try:
+                req = self.session.request(method=method, url=url,
+                                           timeout=self._get_timeout(url, timeout=timeout, deadline=deadline),
+                                           **kwargs)
+            except requests.RequestException as e:
+                if self.retry is None:
+                    raise
+                delay = self.retry.get_delay(method, attempt=event.retries, elapsed=_clock() - start, exception=e,
+                                             url=url)
+                if delay is None or (deadline is not None and _clock() + delay >= deadline):
+                    raise
+            else:
+                if self.retry is None:
+                    return req
+                delay = self.retry.get_delay(method, attempt=event.retries, elapsed=_clock() - start,
+                                             status_code=req.status_code,
+                                             retry_after=req.headers.get('Retry-After'), url=url)
+                if delay is None or (deadline is not None and _clock() + delay >= deadline):
+                    return req
+                req.close()
+            finally:
+                if permit is not None:
+                    permit.release()
+            time.sleep(delay)
+            event.retries += 1
+
+    def _request(self, method, url, **kwargs):
+        """Send a request and return the parsed response
+
+        Args:
+          method (str): HTTP verb
+          url (str): Full URL to request
+          kwargs: Additional arguments passed to requests
+        Returns:
+          Dict
+        """
+        req = self._send(method, url=url, **kwargs)
+        return self._handle_request(req)
+
+    def _get_request(self, url, data=None, timeout=None, deadline=None):
         """Execute a GET request agains Foreman API
 
         Args:
           resource_type (str): Name of resource to get
           component (str): Name of resource components to get
           component_id (str): Name of resource component to get
+          data (dict): Query parameters, sent in the query string
+          timeout (float or tuple): Timeout or (connect, read) timeouts
+          deadline (float): Clock time the request has to end
+        Returns:
+          Dict
+        """
+        return self._coalesce(url=url, data=data, deadline=deadline,
+                              func=lambda: self._request('GET', url=url, params=data, timeout=timeout,
+                                                         deadline=deadline))
+
+    def _coalesce(self, url, data, deadline, func):
+        """Call func, or wait for the identical request already in flight
+
+        Args:
+          url (str): URL of the GET request
+          data (dict): Query parameters
+          deadline (float): Clock time the request has to end
+          func (callable): Function sending the request
+        Returns:
+          Dict
+        """
+        if self.single_flight is None:
+            return func()
+        key = ResponseCache.key(url=url, data=data)
+        try:
+            return self.single_flight.do(key, func,
+                                         timeout=None if deadline is None else max(0.0, deadline - _clock()))
+        except CoalesceTimeout:
+            raise ForemanTimeoutError(url=url, status_code=None, message='Deadline exceeded')
+
+    def _get_cached_request(self, resource_type, url, data=None, timeout=None, deadline=None):
+        """Execute a GET request, answered from the cache if possible
+
+        Expired cache entries with an ETag or Last-Modified validator are
+        revalidated with a conditional request.
+
+        Args:
+          resource_type (str): Resource type of the request, selects the TTL
+          url (str): URL to request
           data (dict): Dictionary to specify detailed data
+          timeout (float or tuple): Timeout or (connect, read) timeouts
+          deadline (float): Clock time the request has to end
         Returns:
           Dict
         """
-        req = requests.get(url=url,
-                           data=data,
-                           auth=self.__auth,
-                           verify=False)
-        return self._handle_request(req)
+        if self.cache is None:
+            return self._get_request(url=url, data=data, timeout=timeout, deadline=deadline)
+        key = self.cache.key(url=url, data=data)
+        entry = self.cache.get_entry(key)
+        if entry is not None and entry.is_fresh() and not self.cache.revalidate:
+            self.cache.count_hit()
+            return entry.get_value()
+        return self._coalesce(url=url, data=data, deadline=deadline,
+                              func=lambda: self._fetch_cached_request(resource_type=resource_type, key=key,
+                                                                      entry=entry, url=url, data=data,
+                                                                      timeout=timeout, deadline=deadline))
+
+    def _fetch_cached_request(self, resource_type, key, entry, url, data=None, timeout=None, deadline=None):
+        headers = {}
+        if entry is not None:
+            headers = entry.get_conditional_headers()
+        req = self._send('GET', url=url, params=data, headers=headers, timeout=timeout, deadline=deadline)
+        result = self._handle_request(req, cache_entry=entry)
+        if req.status_code == 304:
+            self.cache.renew(entry)
+        else:
+            self.cache.count_miss()
+            self.cache.set(key, resource_type=resource_type, value=result,
+                           etag=req.headers.get('ETag'),
+                           last_modified=req.headers.get('Last-Modified'))
+        return result
+
+    def _invalidate_cache(self, resource_type, resource_id=None, component=None, result=None):
+        """Drop cached responses affected by a write to a resource
+
+        Cached searches of the resource type and all cached responses of the
+        resource (including its components) are dropped, whether they were
+        requested by id or by name.
+
+        Args:
+          resource_type (str): Resource type written to
+          resource_id (str): Resource written to
+          component (str): Component of the resource written to
+          result (dict): Response of the write
+        """
+        if self.cache is None:
+            return
+        resource_ids = []
+        if resource_id:
+            resource_ids.append(resource_id)
+            if component is None and isinstance(result, dict) and result.get('id') is not None:
+                # resource_id may be the name of the resource
+                resource_ids.append(result['id'])
+        self.cache.invalidate(url=self._get_resource_url(resource_type=resource_type), resource_ids=resource_ids)
 
-    def _post_request(self, url, data):
+    def _post_request(self, url, data, timeout=None, deadline=None):
         """Execute a POST request against Foreman API
 
         Args:
@@ -190,14 +619,13 @@ class Foreman:
         Returns:
           Dict
         """
-        req = requests.post(url=url,
-                            data=json.dumps(data),
-                            headers=FOREMAN_REQUEST_HEADERS,
-                            auth=self.__auth,
-                            verify=False)
-        return self._handle_request(req)
+        return self._request('POST', url=url,
+                             data=json.dumps(data),
+                             headers=FOREMAN_REQUEST_HEADERS,
+                             timeout=timeout,
+                             deadline=deadline)
 
-    def _put_request(self, url, data):
+    def _put_request(self, url, data, timeout=None, deadline=None):
         """Execute a PUT request against Foreman API
 
         Args:
@@ -207,14 +635,13 @@ class Foreman:
         Returns:
           Dict
         """
-        req = requests.put(url=url,
-                           data=json.dumps(data),
-                           headers=FOREMAN_REQUEST_HEADERS,
-                           auth=self.__auth,
-                           verify=False)
-        return self._handle_request(req)
+        return self._request('PUT', url=url,
+                             data=json.dumps(data),
+                             headers=FOREMAN_REQUEST_HEADERS,
+                             timeout=timeout,
+                             deadline=deadline)
 
-    def _delete_request(self, url):
+    def _delete_request(self, url, timeout=None, deadline=None):
         """Execute a DELETE request against Foreman API
 
         Args:
@@ -223,31 +650,199 @@ class Foreman:
         Returns:
           Dict
         """
-        req = requests.delete(url=url,
-                              headers=FOREMAN_REQUEST_HEADERS,
-                              auth=self.__auth,
-                              verify=False)
-        return self._handle_request(req)
+        return self._request('DELETE', url=url,
+                             headers=FOREMAN_REQUEST_HEADERS,
+                             timeout=timeout,
+                             deadline=deadline)
 
-    def get_resources(self, resource_type, resource_id=None, component=None):
-        """ Return a list of all resources of the defined resource type
+    def _get_page(self, url, data, page, resource_type=None, timeout=None, deadline=None):
+        """Request one page of a resource listing
+
+        Args:
+          url (str): URL of the listing
+          data (dict): Paging and search parameters
+          page (int): Page to request
+          resource_type (str): Answer the request from the cache using the
+              TTL of this resource type
+          timeout (float or tuple): Timeout or (connect, read) timeouts
+          deadline (float): Clock time the request has to end
+        Returns:
+          Dict
+        """
+        page_data = dict(data)
+        page_data['page'] = page
+        if resource_type:
+            return self._get_cached_request(resource_type=resource_type, url=url, data=page_data,
+                                            timeout=timeout, deadline=deadline)
+        return self._get_request(url=url, data=page_data, timeout=timeout, deadline=deadline)
+
+    def _prefetch_pages(self, url, data, pages, workers, ordered=True, resource_type=None,
+                        timeout=None, deadline=None):
+        """Request pages concurrently and yield their results
+
+        At most workers requests are in flight and at most twice as many pages
+        are held in memory at any time.
+
+        Args:
+          url (str): URL of the listing
+          data (dict): Paging and search parameters
+          pages (iterable): Page numbers to request
+          workers (int): Number of concurrent requests
+          ordered (bool): Yield pages in page order instead of completion
+              order
+          resource_type (str): Answer the requests from the cache using the
+              TTL of this resource type
+          timeout (float or tuple): Timeout or (connect, read) timeouts
+          deadline (float): Clock time all requests have to end
+        Returns:
+          generator of list
+        """
+        pages = iter(pages)
+        pending = collections.deque()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        try:
+            for page in itertools.islice(pages, workers * 2):
+                pending.append(executor.submit(self._get_page, url, data, page, resource_type, timeout, deadline))
+            while pending:
+                if ordered:
+                    future = pending.popleft()
+                else:
+                    done, _ = concurrent.futures.wait(pending,
+                                                      return_when=concurrent.futures.FIRST_COMPLETED)
+                    future = done.pop()
+                    pending.remove(future)
+                results = future.result().get('results') or []
+                for page in itertools.islice(pages, 1):
+                    pending.append(executor.submit(self._get_page, url, data, page, resource_type, timeout, deadline))
+                yield results
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def iter_resources(self, resource_type, resource_id=None, component=None,
+                       search=None, page_size=FOREMAN_PAGE_SIZE, workers=None, ordered=True,
+                       cache=False, timeout=None, deadline=None, fields=None, records=False):
+        """ Iterate over all resources of the defined resource type
+
+        Resources are requested page by page, following the page, per_page
+        and subtotal information returned by Foreman, and yielded one by one.
+        Only one page is held in memory at a time.
+
+        With workers set, the remaining pages are requested concurrently once
+        the first page has returned the total number of resources. The number
+        of workers is capped by max_workers of the Foreman instance.
 
         Args:
            resource_type: Type of resources to get
            resource_id (str): Resource identified
            component (str): Component name to request
-           component_id (int): Component id to request
+           search (dict, str or SearchQuery): Search query to filter resources
+           page_size (int): Number of resources to request per page
+           workers (int): Number of pages to request concurrently
+           ordered (bool): Keep Foreman's order when requesting concurrently
+           cache (bool): Answer page requests from the response cache
+           timeout (float or tuple): Timeout or (connect, read) timeouts of
+               each request
+           deadline (float): Seconds all pages have to be received in,
+               counted from the first request
+           fields (list): Keep only these keys of each resource. If only id
+               and name are requested Foreman is asked for a thin listing.
+           records (bool): Yield read only records (see foreman.records)
+               instead of dicts
         Returns:
-           list of dict
+           generator of dict or Record
         """
+        deadline = _get_deadline(deadline)
+        project = get_projection(fields, record_class=get_record_class(resource_type) if records else None)
         url = self._get_resource_url(resource_type=resource_type,
                                      resource_id=resource_id,
                                      component=component)
-        request_result = self._get_request(url=url,
-                                           data={'page': '1', 'per_page': 99999})
-        return request_result.get('results')
+        data = {'per_page': page_size}
+        if search:
+            data['search'] = search_query(search)
+        if fields and FOREMAN_THIN_FIELDS.issuperset(fields):
+            data['thin'] = 'true'
+        cache_type = resource_type if cache else None
+        request_result = self._get_page(url=url, data=data, page=1, resource_type=cache_type,
+                                        timeout=timeout, deadline=deadline)
+        results = request_result.get('results')
+        if not isinstance(results, list):
+            # Some components return a single dict instead of a list
+            if results:
+                yield project(results)
+            return
+        for result in results:
+            yield project(result)
+        per_page = int(request_result.get('per_page') or page_size)
+        subtotal = request_result.get('subtotal', request_result.get('total'))
+        if not results or subtotal is None:
+            return
+        pages = range(2, int(math.ceil(int(subtotal) / float(per_page))) + 1)
+        workers = min(workers or 1, self.max_workers, len(pages))
+        if workers > 1:
+            page_results = self._prefetch_pages(url=url, data=data, pages=pages,
+                                                workers=workers, ordered=ordered,
+                                                resource_type=cache_type,
+                                                timeout=timeout, deadline=deadline)
+        else:
+            page_results = (self._get_page(url=url, data=data, page=page, resource_type=cache_type,
+                                           timeout=timeout, deadline=deadline).get('results')
+                            for page in pages)
+        for results in page_results:
+            if not results:
+                return
+            for result in results:
+                yield project(result)
+
+    def get_resources(self, resource_type, resource_id=None, component=None,
+                      search=None, page_size=FOREMAN_PAGE_SIZE, workers=None, ordered=True,
+                      cache=False, timeout=None, deadline=None, fields=None, lazy=False,
+                      records=False, columnar=False):
+        """ Return a list of all resources of the defined resource type
 
-    def get_resource(self, resource_type, resource_id, component=None, component_id=None):
+        Args:
+           resource_type: Type of resources to get
+           resource_id (str): Resource identified
+           component (str): Component name to request
+           search (dict, str or SearchQuery): Search query to filter resources
+           page_size (int): Number of resources to request per page
+           workers (int): Number of pages to request concurrently
+           ordered (bool): Keep Foreman's order when requesting concurrently
+           cache (bool): Answer page requests from the response cache
+           timeout (float or tuple): Timeout or (connect, read) timeouts of
+               each request
+           deadline (float): Seconds all pages have to be received in
+           fields (list): Keep only these keys of each resource
+           lazy (bool): Return a generator fetching page by page instead of a
+               list
+           records (bool): Return read only records (see foreman.records)
+               instead of dicts
+           columnar (bool): Return a RecordTable storing the resources column
+               by column, lazy and records are ignored
+        Returns:
+           list of dict or Record, RecordTable
+        """
+        resources = self.iter_resources(resource_type=resource_type,
+                                        resource_id=resource_id,
+                                        component=component,
+                                        search=search,
+                                        page_size=page_size,
+                                        workers=workers,
+                                        ordered=ordered,
+                                        cache=cache,
+                                        timeout=timeout,
+                                        deadline=deadline,
+                                        fields=fields,
+                                        records=records and not columnar)
+        if columnar:
+            return RecordTable(resources)
+        if lazy:
+            return resources
+        return list(resources)
+
+    def get_resource(self, resource_type, resource_id, component=None, component_id=None,
+                     timeout=None, deadline=None):
         """ Get information about a resource
 
         If data contains id the resource will be get directly from the API.
@@ -262,6 +857,8 @@ class Foreman:
            resource_id (str): Resource identified
            component (str): Component name to request
            component_id (int): Component id to request
+           timeout (float or tuple): Timeout or (connect, read) timeouts
+           deadline (float): Seconds the call has to end in, retries included
         Returns:
            dict
         """
@@ -269,10 +866,11 @@ class Foreman:
                                      resource_id=resource_id,
                                      component=component,
                                      component_id=component_id)
-        return self._get_request(url=url)
+        return self._get_cached_request(resource_type=resource_type, url=url,
+                                        timeout=timeout, deadline=_get_deadline(deadline))
 
     def create_resource(self, resource_type, resource, data,
-                        resource_id=None, component=None, additional_data=None):
+                        resource_id=None, component=None, additional_data=None, timeout=None, deadline=None):
         """ Create a resource by executing a post request to Foreman
 
         Execute a post request to create one <resource> of a <resource type>.
@@ -296,6 +894,8 @@ class Foreman:
 
         Args:
            data(dict): Hash containing parameter/value pairs
+           timeout (float or tuple): Timeout or (connect, read) timeouts
+           deadline (float): Seconds the call has to end in, retries included
         """
         url = self._get_resource_url(resource_type=resource_type,
                                      resource_id=resource_id,
@@ -305,44 +905,135 @@ class Foreman:
             for key in additional_data.keys():
                 resource_data[key] = additional_data[key]
         resource_data[resource] = data
-        return self._post_request(url=url, data=resource_data)
+        result = self._post_request(url=url, data=resource_data,
+                                    timeout=timeout, deadline=_get_deadline(deadline))
+        self._invalidate_cache(resource_type=resource_type, resource_id=resource_id, component=component)
+        return result
 
-    def update_resource(self, resource_type, resource_id, data, component=None, component_id=None):
+    def update_resource(self, resource_type, resource_id, data, component=None, component_id=None,
+                        timeout=None, deadline=None):
         url = self._get_resource_url(resource_type=resource_type, resource_id=resource_id,
                                      component=component, component_id=component_id)
-        return self._put_request(url=url, data=data)
+        result = self._put_request(url=url, data=data, timeout=timeout, deadline=_get_deadline(deadline))
+        self._invalidate_cache(resource_type=resource_type, resource_id=resource_id, component=component,
+                               result=result)
+        return result
 
-    def delete_resource(self, resource_type, resource_id, component=None, component_id=None):
+    def delete_resource(self, resource_type, resource_id, component=None, component_id=None,
+                        timeout=None, deadline=None):
         url = self._get_resource_url(resource_type=resource_type, resource_id=resource_id,
                                      component=component, component_id=component_id)
-        return self._delete_request(url=url)
+        result = self._delete_request(url=url, timeout=timeout, deadline=_get_deadline(deadline))
+        self._invalidate_cache(resource_type=resource_type, resource_id=resource_id, component=component,
+                               result=result)
+        return result
 
-    def search_resource(self, resource_type, data):
-        search_data = {'search': '', 'per_page': 1000 }
+    def iter_search(self, resource_type, query, page_size=FOREMAN_PAGE_SIZE, **kwargs):
+        """ Iterate over all resources matching a search query
 
-        for key, value in data.items():
-            if search_data['search']:
-                search_data['search'] += ' AND '
-            search_data['search'] += (key + ' == ')
+        Matches are requested page by page, see iter_resources for further
+        options.
 
-            if isinstance(value, int):
-                search_data['search'] += str(value)
-            elif isinstance(value, str):
-                search_data['search'] += ('"' + value + '"')
-            else:
-                TypeError("Type {0} of search key {1} not supported".format(type(value), key))
+        Args:
+           resource_type (str): Resource type
+           query (dict, str or SearchQuery): Query, a dict matches all of its
+               field/value pairs (see foreman.search.compile_term)
+           page_size (int): Number of resources to request per page
+        Returns:
+           generator of dict
+        """
+        return self.iter_resources(resource_type=resource_type,
+                                   search=SearchQuery.of(query),
+                                   page_size=page_size,
+                                   **kwargs)
+
+    def _get_search_one_result(self, url, request_result):
+        results = request_result.get('results')
+        if not results:
+            raise ForemanError(url=url, status_code=404, message='Not found')
+        if len(results) > 1:
+            # 300 Multiple Choices
+            raise ForemanError(url=url, status_code=300,
+                               message='Search matched {0} resources, expected one'.format(
+                                   request_result.get('subtotal', len(results))))
+        return results[0]
+
+    def search_one(self, resource_type, query, timeout=None, deadline=None):
+        """ Return the only resource matching a search query
 
+        Args:
+           resource_type (str): Resource type
+           query (dict, str or SearchQuery): Query
+           timeout (float or tuple): Timeout or (connect, read) timeouts
+           deadline (float): Seconds the call has to end in, retries included
+        Returns:
+           dict
+        Raises:
+           ForemanError: 404 if nothing matched, 300 if more than one resource
+               matched
+        """
         url = self._get_resource_url(resource_type=resource_type)
-        results = self._get_request(url=url, data=search_data)
-        result = results.get('results')
+        request_result = self._get_cached_request(resource_type=resource_type,
+                                                  url=url,
+                                                  data={'search': search_query(query), 'per_page': 2},
+                                                  timeout=timeout,
+                                                  deadline=_get_deadline(deadline))
+        return self._get_search_one_result(url=url, request_result=request_result)
+
+    def search_resource(self, resource_type, data, timeout=None, deadline=None, fields=None, records=False):
+        """ Search resources
+
+        All matches are returned, requested page by page. Use iter_search to
+        process large results without holding them in memory or search_one
+        to get exactly one resource.
+
+        Args:
+           resource_type (str): Resource type
+           data (dict, str or SearchQuery): Query, a dict matches all of its
+               field/value pairs (see foreman.search.compile_term)
+           timeout (float or tuple): Timeout or (connect, read) timeouts of
+               each request
+           deadline (float): Seconds all pages have to be received in
+           fields (list): Keep only these keys of each resource
+           records (bool): Return read only records instead of dicts
+        Returns:
+           dict if exactly one resource matched, list of dict otherwise
+        """
+        result = list(self.iter_search(resource_type=resource_type, query=data, cache=True,
+                                       timeout=timeout, deadline=deadline, fields=fields,
+                                       records=records))
 
         if len(result) == 1:
             return result[0]
 
         return result
 
-    def get_architectures(self):
-        return self.get_resources(resource_type=ARCHITECTURES)
+    def batch(self, operations, workers=None, rate=None, stop_on_error=False):
+        """ Execute many create, update and delete operations concurrently
+
+        Operations are consumed lazily and sent over the pooled connections
+        by up to workers threads. Failed operations are recorded in the
+        report; with stop_on_error no further operations are started after
+        the first failure.
+
+        Args:
+           operations (iterable): foreman.batch.BatchOperation objects
+           workers (int): Number of concurrent requests, capped by
+               max_workers
+           rate (float): Maximum number of requests started per second
+           stop_on_error (bool): Stop after the first failed operation
+        Returns:
+           foreman.batch.BatchReport with one result per operation
+        """
+        return run_concurrently(func=lambda operation: operation.execute(self),
+                                items=operations,
+                                workers=min(workers or self.max_workers, self.max_workers),
+                                rate=rate,
+                                stop_on_error=stop_on_error,
+                                errors=(ForemanError, requests.RequestException))
+
+    def get_architectures(self, **kwargs):
+        return self.get_resources(resource_type=ARCHITECTURES, **kwargs)
 
     def get_architecture(self, id):
         return self.get_resource(resource_type=ARCHITECTURES, resource_id=id)
@@ -356,8 +1047,8 @@ class Foreman:
     def delete_architecture(self, id):
         return self.delete_resource(resource_type=ARCHITECTURES, resource_id=id)
 
-    def get_auth_source_ldaps(self):
-        return self.get_resources(resource_type=AUTH_SOURCE_LDAPS)
+    def get_auth_source_ldaps(self, **kwargs):
+        return self.get_resources(resource_type=AUTH_SOURCE_LDAPS, **kwargs)
 
     def get_auth_source_ldap(self, id):
         return self.get_resource(resource_type=AUTH_SOURCE_LDAPS, resource_id=id)
@@ -374,8 +1065,8 @@ class Foreman:
     def update_auth_source_ldap(self, id, data):
         return self.update_resource(resource_type=AUTH_SOURCE_LDAPS, resource_id=id, data=data)
 
-    def get_common_parameters(self):
-        return self.get_resources(resource_type=COMMON_PARAMETERS)
+    def get_common_parameters(self, **kwargs):
+        return self.get_resources(resource_type=COMMON_PARAMETERS, **kwargs)
 
     def get_common_parameter(self, id):
         return self.get_resource(resource_type=COMMON_PARAMETERS, resource_id=id)
@@ -424,8 +1115,8 @@ class Foreman:
                                     resource_id=id,
                                     data={'vm_attrs': data})
 
-    def get_compute_profiles(self):
-        return self.get_resources(resource_type=COMPUTE_PROFILES)
+    def get_compute_profiles(self, **kwargs):
+        return self.get_resources(resource_type=COMPUTE_PROFILES, **kwargs)
 
     def get_compute_profile(self, id):
         return self.get_resource(resource_type=COMPUTE_PROFILES, resource_id=id)
@@ -441,8 +1132,8 @@ class Foreman:
     def delete_compute_profile(self, id):
         return self.delete_resource(resource_type=COMPUTE_PROFILES, resource_id=id)
 
-    def get_compute_resources(self):
-        return self.get_resources(resource_type=COMPUTE_RESOURCES)
+    def get_compute_resources(self, **kwargs):
+        return self.get_resources(resource_type=COMPUTE_RESOURCES, **kwargs)
 
     def get_compute_resource(self, id):
         return self.get_resource(resource_type=COMPUTE_RESOURCES, resource_id=id)
@@ -464,11 +1155,12 @@ class Foreman:
     def delete_compute_resource(self, id):
         return self.delete_resource(resource_type=COMPUTE_RESOURCES, resource_id=id)
 
-    def get_compute_resource_images(self, compute_resource_id):
+    def get_compute_resource_images(self, compute_resource_id, **kwargs):
         """Get images registered on a given compute resource"""
         return self.get_resources(resource_type=COMPUTE_RESOURCES,
                                   resource_id=compute_resource_id,
-                                  component=IMAGES)
+                                  component=IMAGES,
+                                  **kwargs)
 
     def create_compute_resource_image(self, compute_resource_id, data):
         """Add an image to a compute resource"""
@@ -493,8 +1185,8 @@ class Foreman:
                                     component=IMAGES,
                                     component_id=data['id'])
 
-    def get_config_templates(self):
-        return self.get_resources(resource_type=CONFIG_TEMPLATES)
+    def get_config_templates(self, **kwargs):
+        return self.get_resources(resource_type=CONFIG_TEMPLATES, **kwargs)
 
     def get_config_template(self, id):
         return self.get_resource(resource_type=CONFIG_TEMPLATES, resource_id=id)
@@ -513,8 +1205,8 @@ class Foreman:
     def delete_config_template(self, id):
         return self.delete_resource(resource_type=CONFIG_TEMPLATES, resource_id=id)
 
-    def get_domains(self):
-        return self.get_resources(resource_type=DOMAINS)
+    def get_domains(self, **kwargs):
+        return self.get_resources(resource_type=DOMAINS, **kwargs)
 
     def get_domain(self, id):
         return self.get_resource(resource_type=DOMAINS, resource_id=id)
@@ -531,8 +1223,8 @@ class Foreman:
     def delete_domain(self, id):
         return self.delete_resource(resource_type=DOMAINS, resource_id=id)
 
-    def get_environments(self):
-        return self.get_resources(resource_type=ENVIRONMENTS)
+    def get_environments(self, **kwargs):
+        return self.get_resources(resource_type=ENVIRONMENTS, **kwargs)
 
     def get_environment(self, id):
         return self.get_resource(resource_type=ENVIRONMENTS, resource_id=id)
@@ -546,8 +1238,9 @@ class Foreman:
     def delete_environment(self, id):
         return self.delete_resource(resource_type=ENVIRONMENTS, resource_id=id)
 
-    def get_external_usergroups(self, id):
-        return self.get_resources(resource_type=USERGROUPS, resource_id=id, component=EXTERNAL_USERGROUPS)
+    def get_external_usergroups(self, id, **kwargs):
+        return self.get_resources(resource_type=USERGROUPS, resource_id=id, component=EXTERNAL_USERGROUPS,
+                                  **kwargs)
 
     def create_external_usergroup(self, usergroup_id, data):
         return self.create_resource(resource_type=USERGROUPS,
@@ -562,14 +1255,14 @@ class Foreman:
                                     component=EXTERNAL_USERGROUPS,
                                     component_id=ext_group_id)
 
-    def get_filters(self):
-        return self.get_resources(resource_type=FILTERS)
+    def get_filters(self, **kwargs):
+        return self.get_resources(resource_type=FILTERS, **kwargs)
 
     def get_filter(self, id):
         return self.get_resource(resource_type=FILTERS, resource_id=id)
 
-    def get_filters(self):
-        return self.get_resources(resource_type=FILTERS)
+    def get_filters(self, **kwargs):
+        return self.get_resources(resource_type=FILTERS, **kwargs)
 
     def search_filter(self, data):
         return self.search_resource(resource_type=FILTERS, data=data)
@@ -580,8 +1273,8 @@ class Foreman:
     def delete_filter(self, id):
         return self.delete_resource(resource_type=FILTERS, resource_id=id)
 
-    def get_hosts(self):
-        return self.get_resources(resource_type=HOSTS)
+    def get_hosts(self, **kwargs):
+        return self.get_resources(resource_type=HOSTS, **kwargs)
 
     def get_host(self, id):
         return self.get_resource(resource_type=HOSTS, resource_id=id)
@@ -589,7 +1282,16 @@ class Foreman:
     def search_host(self, data):
         return self.search_resource(resource_type=HOSTS, data=data)
 
-    def create_host(self, data):
+    def create_host(self, data, resolver=None):
+        """ Create a host
+
+        Args:
+           data (dict): Attributes of the host
+           resolver (ReferenceResolver): Replace <reference>_name keys like
+               domain_name by the matching <reference>_id
+        """
+        if resolver is not None:
+            data = resolver.resolve(data)
         return self.create_resource(resource_type=HOSTS, resource=HOST, data=data)
 
     def update_host(self, id, data):
@@ -616,6 +1318,55 @@ class Foreman:
     def reboot_host(self, host_id):
         return self.set_host_power(host_id=host_id, action='reboot')
 
+    def _get_host_ids(self, host_ids=None, search=None):
+        if host_ids is not None:
+            return host_ids
+        query = search_query(search) if search is not None else ''
+        if not query.strip():
+            # An empty search matches every host
+            raise ValueError('host_ids or a non-empty search is required')
+        return (host.get('id') for host in self.iter_resources(resource_type=HOSTS, search=query))
+
+    def set_hosts_power(self, action, host_ids=None, search=None, workers=None, rate=None,
+                        stop_on_error=False):
+        """ Execute a power action on many hosts concurrently
+
+        Errors of single hosts do not stop the other hosts but are recorded
+        in the returned report.
+
+        Args:
+           action (str): Power action (start, stop, reboot, state, ...)
+           host_ids (list): Identifiers of the hosts
+           search (dict, str or SearchQuery): Search query selecting the hosts if no
+               host_ids are given
+           workers (int): Number of concurrent requests, capped by
+               max_workers
+           rate (float): Maximum number of requests started per second
+           stop_on_error (bool): Stop after the first failed host
+        Returns:
+           foreman.batch.BatchReport with one result per host id
+        Raises:
+           ValueError: Neither host_ids nor a non-empty search given
+        """
+        return run_concurrently(func=lambda host_id: self.set_host_power(host_id=host_id, action=action),
+                                items=self._get_host_ids(host_ids=host_ids, search=search),
+                                workers=min(workers or self.max_workers, self.max_workers),
+                                rate=rate,
+                                stop_on_error=stop_on_error,
+                                errors=(ForemanError, requests.RequestException))
+
+    def get_hosts_power(self, host_ids=None, search=None, **kwargs):
+        return self.set_hosts_power(action='state', host_ids=host_ids, search=search, **kwargs)
+
+    def poweron_hosts(self, host_ids=None, search=None, **kwargs):
+        return self.set_hosts_power(action='start', host_ids=host_ids, search=search, **kwargs)
+
+    def poweroff_hosts(self, host_ids=None, search=None, **kwargs):
+        return self.set_hosts_power(action='stop', host_ids=host_ids, search=search, **kwargs)
+
+    def reboot_hosts(self, host_ids=None, search=None, **kwargs):
+        return self.set_hosts_power(action='reboot', host_ids=host_ids, search=search, **kwargs)
+
     # def get_host_component(self, name, component, component_id=None):
     # return self.get_host(name=name, component=component, component_id=component_id)
 
@@ -651,8 +1402,8 @@ class Foreman:
                                     component=PARAMETERS,
                                     component_id=parameter_id)
 
-    def get_hostgroups(self):
-        return self.get_resources(resource_type=HOSTGROUPS)
+    def get_hostgroups(self, **kwargs):
+        return self.get_resources(resource_type=HOSTGROUPS, **kwargs)
 
     def get_hostgroup(self, id):
         return self.get_resource(resource_type=HOSTGROUPS, resource_id=id)
@@ -660,7 +1411,16 @@ class Foreman:
     def search_hostgroup(self, data):
         return self.search_resource(resource_type=HOSTGROUPS, data=data)
 
-    def create_hostgroup(self, data):
+    def create_hostgroup(self, data, resolver=None):
+        """ Create a hostgroup
+
+        Args:
+           data (dict): Attributes of the hostgroup
+           resolver (ReferenceResolver): Replace <reference>_name keys like
+               domain_name by the matching <reference>_id
+        """
+        if resolver is not None:
+            data = resolver.resolve(data)
         return self.create_resource(resource_type=HOSTGROUPS, resource=HOSTGROUP, data=data)
 
     def update_hostgroup(self, id, data):
@@ -695,8 +1455,8 @@ class Foreman:
                                     component=PARAMETERS,
                                     component_id=parameter_id)
 
-    def get_locations(self):
-        return self.get_resources(resource_type=LOCATIONS)
+    def get_locations(self, **kwargs):
+        return self.get_resources(resource_type=LOCATIONS, **kwargs)
 
     def get_location(self, id):
         return self.get_resource(resource_type=LOCATIONS, resource_id=id)
@@ -710,8 +1470,8 @@ class Foreman:
     def delete_location(self, id):
         return self.delete_resource(resource_type=LOCATIONS, resource_id=id)
 
-    def get_media(self):
-        return self.get_resources(resource_type=MEDIA)
+    def get_media(self, **kwargs):
+        return self.get_resources(resource_type=MEDIA, **kwargs)
 
     def get_medium(self, id):
         return self.get_resource(resource_type=MEDIA, resource_id=id)
@@ -728,8 +1488,8 @@ class Foreman:
     def update_medium(self, id, data):
         return self.update_resource(resource_type=MEDIA, resource_id=id, data=data)
 
-    def get_organizations(self):
-        return self.get_resources(resource_type=ORGANIZATIONS)
+    def get_organizations(self, **kwargs):
+        return self.get_resources(resource_type=ORGANIZATIONS, **kwargs)
 
     def get_organization(self, id):
         return self.get_resource(resource_type=ORGANIZATIONS, resource_id=id)
@@ -743,8 +1503,8 @@ class Foreman:
     def delete_organization(self, id):
         return self.delete_resource(resource_type=ORGANIZATIONS, resource_id=id)
 
-    def get_operatingsystems(self):
-        return self.get_resources(resource_type=OPERATINGSYSTEMS)
+    def get_operatingsystems(self, **kwargs):
+        return self.get_resources(resource_type=OPERATINGSYSTEMS, **kwargs)
 
     def get_operatingsystem(self, id):
         return self.get_resource(resource_type=OPERATINGSYSTEMS, resource_id=id)
@@ -761,8 +1521,9 @@ class Foreman:
     def delete_operatingsystem(self, id):
         return self.delete_resource(resource_type=OPERATINGSYSTEMS, resource_id=id)
 
-    def get_operatingsystem_default_templates(self, id):
-        return self.get_resources(resource_type=OPERATINGSYSTEMS, resource_id=id, component=OS_DEFAULT_TEMPLATES)
+    def get_operatingsystem_default_templates(self, id, **kwargs):
+        return self.get_resources(resource_type=OPERATINGSYSTEMS, resource_id=id, component=OS_DEFAULT_TEMPLATES,
+                                  **kwargs)
 
     def get_operatingsystem_default_template(self, id, template_id):
         return self.get_resource(resource_type=OPERATINGSYSTEMS, resource_id=id,
@@ -781,8 +1542,8 @@ class Foreman:
         return self.delete_resource(resource_type=OPERATINGSYSTEMS, resource_id=id,
                                     component=OS_DEFAULT_TEMPLATES, component_id=template_id)
 
-    def get_partition_tables(self):
-        return self.get_resources(resource_type=PARTITION_TABLES)
+    def get_partition_tables(self, **kwargs):
+        return self.get_resources(resource_type=PARTITION_TABLES, **kwargs)
 
     def get_partition_table(self, id):
         return self.get_resource(resource_type=PARTITION_TABLES, resource_id=id)
@@ -799,8 +1560,8 @@ class Foreman:
     def delete_partition_table(self, id):
         return self.delete_resource(resource_type=PARTITION_TABLES, resource_id=id)
 
-    def get_permissions(self):
-        return self.get_resources(resource_type=PERMISSIONS)
+    def get_permissions(self, **kwargs):
+        return self.get_resources(resource_type=PERMISSIONS, **kwargs)
 
     def get_permission(self, id):
         return self.get_resource(resource_type=PERMISSIONS, resource_id=id)
@@ -808,8 +1569,8 @@ class Foreman:
     def search_permission(self, data):
         return self.search_resource(resource_type=PERMISSIONS, data=data)
 
-    def get_realms(self):
-        return self.get_resources(resource_type=REALMS)
+    def get_realms(self, **kwargs):
+        return self.get_resources(resource_type=REALMS, **kwargs)
 
     def get_realm(self, id):
         return self.get_resource(resource_type=REALMS, resource_id=id)
@@ -826,8 +1587,8 @@ class Foreman:
     def update_realm(self, id, data):
         return self.update_resource(resource_type=REALMS, resource_id=id, data=data)
 
-    def get_roles(self):
-        return self.get_resources(resource_type=ROLES)
+    def get_roles(self, **kwargs):
+        return self.get_resources(resource_type=ROLES, **kwargs)
 
     def get_role(self, id):
         return self.get_resource(resource_type=ROLES, resource_id=id)
@@ -850,8 +1611,8 @@ class Foreman:
     def update_setting(self, id, data):
         return self.update_resource(resource_type=SETTINGS, resource_id=id, data=data)
 
-    def get_smart_proxies(self):
-        return self.get_resources(resource_type=SMART_PROXIES)
+    def get_smart_proxies(self, **kwargs):
+        return self.get_resources(resource_type=SMART_PROXIES, **kwargs)
 
     def get_smart_proxy(self, id):
         return self.get_resource(resource_type=SMART_PROXIES, resource_id=id)
@@ -868,8 +1629,8 @@ class Foreman:
     def delete_smart_proxy(self, id):
         return self.delete_resource(resource_type=SMART_PROXIES, resource_id=id)
 
-    def get_subnets(self):
-        return self.get_resources(resource_type=SUBNETS)
+    def get_subnets(self, **kwargs):
+        return self.get_resources(resource_type=SUBNETS, **kwargs)
 
     def get_subnet(self, id):
         return self.get_resource(resource_type=SUBNETS, resource_id=id)
@@ -886,11 +1647,11 @@ class Foreman:
     def delete_subnet(self, id):
         return self.delete_resource(resource_type=SUBNETS, resource_id=id)
 
-    def get_template_kinds(self):
-        return self.get_resources(resource_type=TEMPLATE_KINDS)
+    def get_template_kinds(self, **kwargs):
+        return self.get_resources(resource_type=TEMPLATE_KINDS, **kwargs)
 
-    def get_users(self):
-        return self.get_resources(resource_type=USERS)
+    def get_users(self, **kwargs):
+        return self.get_resources(resource_type=USERS, **kwargs)
 
     def get_user(self, id):
         return self.get_resource(resource_type=USERS, resource_id=id)
@@ -907,8 +1668,8 @@ class Foreman:
     def delete_user(self, id):
         return self.delete_resource(resource_type=USERS, resource_id=id)
 
-    def get_usergroups(self):
-        return self.get_resources(resource_type=USERGROUPS)
+    def get_usergroups(self, **kwargs):
+        return self.get_resources(resource_type=USERGROUPS, **kwargs)
 
     def get_usergroup(self, id):
         return self.get_resource(resource_type=USERGROUPS, resource_id=id)
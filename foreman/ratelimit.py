@@ -0,0 +1,194 @@
+"""
+Client side rate limiting of Foreman requests
+"""
+
+import threading
+import time
+
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class TokenBucket(object):
+    """TokenBucket Class
+
+    Thread safe token bucket. Tokens are refilled continuously at rate per
+    second up to burst tokens.
+    """
+
+    def __init__(self, rate, burst=None):
+        """Init
+
+        Args:
+          rate (float): Tokens added per second
+          burst (int): Maximum number of tokens, defaults to rate (at least 1)
+        """
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self._tokens = self.burst
+        self._updated = _clock()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return the seconds to wait until it is available
+
+        Returns:
+          float
+        """
+        with self._lock:
+            now = _clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """Wait for a token
+
+        Returns:
+          float: Seconds waited
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class Limit(object):
+    """Limit Class
+
+    Rate and concurrency limit for requests matching HTTP verbs and resource
+    types.
+    """
+
+    def __init__(self, rate=None, burst=None, max_in_flight=None, methods=None, resource_types=None):
+        """Init
+
+        Args:
+          rate (float): Maximum requests per second
+          burst (int): Requests which may be sent at once before rate applies
+          max_in_flight (int): Maximum number of concurrent requests
+          methods (list): HTTP verbs the limit applies to, all if None
+          resource_types (list): Resource types the limit applies to, all if
+              None
+        """
+        self.methods = frozenset(method.upper() for method in methods) if methods else None
+        self.resource_types = frozenset(resource_types) if resource_types else None
+        self.bucket = TokenBucket(rate=rate, burst=burst) if rate else None
+        self.semaphore = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+
+    def matches(self, method, resource_type):
+        return ((self.methods is None or method.upper() in self.methods) and
+                (self.resource_types is None or resource_type in self.resource_types))
+
+
+class Permit(object):
+    """Permission to send one request, release it once the response is read
+    """
+
+    def __init__(self, semaphores, waited):
+        self.semaphores = semaphores
+        self.waited = waited
+
+    def release(self):
+        while self.semaphores:
+            self.semaphores.pop().release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class RateLimiter(object):
+    """RateLimiter Class
+
+    Combine any number of limits. A request waits for every limit matching
+    its verb and resource type, e.g.
+
+    RateLimiter([Limit(rate=50, max_in_flight=8),
+                 Limit(rate=2, methods=['POST', 'PUT', 'DELETE'], resource_types=['hosts'])])
+
+    One limiter can be shared by several Foreman instances and threads.
+    """
+
+    def __init__(self, limits):
+        """Init
+
+        Args:
+          limits (list): Limit objects
+        """
+        self.limits = list(limits)
+        self.waited = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def acquire(self, method, resource_type=None):
+        """Wait until a request may be sent
+
+        Args:
+          method (str): HTTP verb
+          resource_type (str): Resource type of the request
+        Returns:
+          Permit
+        """
+        start = _clock()
+        semaphores = []
+        try:
+            for limit in self.get_limits(method, resource_type=resource_type):
+                if limit.semaphore is not None:
+                    limit.semaphore.acquire()
+                    semaphores.append(limit.semaphore)
+                if limit.bucket is not None:
+                    limit.bucket.acquire()
+        except BaseException:
+            Permit(semaphores=semaphores, waited=0.0).release()
+            raise
+        return self.get_permit(semaphores=semaphores, waited=_clock() - start)
+
+    def get_limits(self, method, resource_type=None):
+        """Return the limits a request has to pass
+
+        Args:
+          method (str): HTTP verb
+          resource_type (str): Resource type of the request
+        Returns:
+          list of Limit
+        """
+        return [limit for limit in self.limits if limit.matches(method, resource_type)]
+
+    def get_permit(self, semaphores, waited):
+        """Count the wait of a request which passed its limits
+
+        Used by acquire and by callers waiting for the limits on their own,
+        e.g. foreman.aio.AsyncForeman.
+
+        Args:
+          semaphores (list): Acquired semaphores of the limits
+          waited (float): Seconds the request waited
+        Returns:
+          Permit
+        """
+        self._local.last_wait = waited
+        if waited > 0.001:
+            with self._lock:
+                self.waited += waited
+                self.throttled += 1
+        return Permit(semaphores=semaphores, waited=waited)
+
+    @property
+    def last_wait(self):
+        """Seconds the last request of the current thread was throttled"""
+        return getattr(self._local, 'last_wait', 0.0)
+
+    def stats(self):
+        """Return the number of throttled requests and the total wait time
+
+        Returns:
+          dict
+        """
+        return {'throttled': self.throttled,
+                'waited': self.waited}
@@ -0,0 +1,629 @@
+"""
+Apply a desired state document to Foreman
+
+A desired state document maps resource types to the resources which have
+to exist, e.g. loaded from YAML:
+
+architectures:
+- name: x86_64
+operatingsystems:
+- name: CoreOS
+  architectures: [x86_64]
+hostgroups:
+- name: web
+  domain: example.com
+
+References to other resources are given by name (domain: example.com,
+domain_name: example.com or domain_names: [...]) and resolved to ids.
+Resource types are applied level by level along their dependencies, all
+resources of a level concurrently. Every resource type is listed once,
+only missing resources are created and only changed fields are updated.
+"""
+
+import requests
+
+from foreman.batch import BatchOperation, BatchResult, run_concurrently
+from foreman.foreman import (ForemanError, ARCHITECTURE, ARCHITECTURES, COMMON_PARAMETER, COMMON_PARAMETERS,
+                             COMPUTE_PROFILE, COMPUTE_PROFILES, COMPUTE_RESOURCE, COMPUTE_RESOURCES,
+                             CONFIG_TEMPLATE, CONFIG_TEMPLATES, DOMAIN, DOMAINS, ENVIRONMENT, ENVIRONMENTS, HOST,
+                             HOSTGROUP, HOSTGROUPS, HOSTS, LOCATION, LOCATIONS, MEDIA, MEDIUM, OPERATINGSYSTEM,
+                             OPERATINGSYSTEMS, ORGANIZATION, ORGANIZATIONS, PARTITION_TABLE, PARTITION_TABLES,
+                             REALM, REALMS, ROLE, ROLES, SMART_PROXIES, SMART_PROXY, SUBNET, SUBNETS, USER,
+                             USERGROUP, USERGROUPS, USERS)
+from foreman.resolver import FOREMAN_NAME_KEYS, FOREMAN_REFERENCES, ReferenceResolver
+
+# Key of the resource in create and update requests
+FOREMAN_RESOURCES = {
+    ARCHITECTURES: ARCHITECTURE,
+    COMMON_PARAMETERS: COMMON_PARAMETER,
+    COMPUTE_PROFILES: COMPUTE_PROFILE,
+    COMPUTE_RESOURCES: COMPUTE_RESOURCE,
+    CONFIG_TEMPLATES: CONFIG_TEMPLATE,
+    DOMAINS: DOMAIN,
+    ENVIRONMENTS: ENVIRONMENT,
+    HOSTGROUPS: HOSTGROUP,
+    HOSTS: HOST,
+    LOCATIONS: LOCATION,
+    MEDIA: MEDIUM,
+    OPERATINGSYSTEMS: OPERATINGSYSTEM,
+    ORGANIZATIONS: ORGANIZATION,
+    PARTITION_TABLES: PARTITION_TABLE,
+    REALMS: REALM,
+    ROLES: ROLE,
+    SMART_PROXIES: SMART_PROXY,
+    SUBNETS: SUBNET,
+    USERGROUPS: USERGROUP,
+    USERS: USER,
+}
+
+# Resource types which have to exist before resources of a type can be
+# created. References within a type (parent hostgroups) are ordered while
+# applying the type.
+FOREMAN_DEPENDENCIES = {
+    ARCHITECTURES: (),
+    COMMON_PARAMETERS: (),
+    COMPUTE_PROFILES: (),
+    COMPUTE_RESOURCES: (LOCATIONS, ORGANIZATIONS),
+    CONFIG_TEMPLATES: (LOCATIONS, ORGANIZATIONS),
+    DOMAINS: (LOCATIONS, ORGANIZATIONS, SMART_PROXIES),
+    ENVIRONMENTS: (LOCATIONS, ORGANIZATIONS),
+    HOSTGROUPS: (ARCHITECTURES, COMPUTE_PROFILES, DOMAINS, ENVIRONMENTS, LOCATIONS, MEDIA, OPERATINGSYSTEMS,
+                 ORGANIZATIONS, PARTITION_TABLES, REALMS, SMART_PROXIES, SUBNETS),
+    HOSTS: (ARCHITECTURES, COMPUTE_PROFILES, COMPUTE_RESOURCES, DOMAINS, ENVIRONMENTS, HOSTGROUPS, LOCATIONS,
+            MEDIA, OPERATINGSYSTEMS, ORGANIZATIONS, PARTITION_TABLES, REALMS, SMART_PROXIES, SUBNETS),
+    LOCATIONS: (),
+    MEDIA: (LOCATIONS, ORGANIZATIONS),
+    OPERATINGSYSTEMS: (ARCHITECTURES, MEDIA, PARTITION_TABLES),
+    ORGANIZATIONS: (),
+    PARTITION_TABLES: (LOCATIONS, ORGANIZATIONS),
+    REALMS: (LOCATIONS, ORGANIZATIONS, SMART_PROXIES),
+    ROLES: (),
+    SMART_PROXIES: (LOCATIONS, ORGANIZATIONS),
+    SUBNETS: (DOMAINS, LOCATIONS, ORGANIZATIONS, SMART_PROXIES),
+    USERGROUPS: (ROLES, USERS),
+    USERS: (LOCATIONS, ORGANIZATIONS, ROLES),
+}
+
+# Keys which refer to another resource by name when used without _name,
+# e.g. domain: example.com
+FOREMAN_NAME_REFERENCES = ('architecture', 'compute_profile', 'compute_resource', 'domain', 'environment',
+                           'hostgroup', 'location', 'medium', 'operatingsystem', 'organization', 'parent',
+                           'ptable', 'realm', 'subnet')
+
+# Resource types nested by parent_id, Foreman computes their title from
+# the names of their parents and their own name, e.g. base/web
+FOREMAN_NESTED_TYPES = (HOSTGROUPS, LOCATIONS, ORGANIZATIONS)
+
+# Reference prefix of associations to resource types, e.g. location for
+# location_ids and show responses with locations: [{id: 1, name: ...}]
+FOREMAN_ASSOCIATIONS = dict((reference_type, prefix) for prefix, reference_type in FOREMAN_REFERENCES.items()
+                            if prefix == FOREMAN_RESOURCES.get(reference_type))
+
+# Document keys used for resource types besides the resource type itself
+FOREMAN_DOCUMENT_KEYS = {
+    'medias': MEDIA,
+    'partition_tables': PARTITION_TABLES,
+}
+
+
+def get_natural_key(resource_type, resource):
+    """Return the value identifying a resource independent of its id
+
+    Titles are only meaningful as returned by Foreman, resources of a
+    desired state document are keyed by Reconciler.get_document_keys.
+
+    Args:
+      resource_type (str): Resource type
+      resource (dict): Resource as returned by Foreman
+    Returns:
+      Title, login or name of the resource
+    """
+    for key in reversed(FOREMAN_NAME_KEYS.get(resource_type, ('name',))):
+        if resource.get(key) is not None:
+            return resource[key]
+    return resource.get('name')
+
+
+def get_levels(resource_types, dependencies=None):
+    """Sort resource types into levels of independent types
+
+    Every type only depends on types of earlier levels. Dependencies on
+    types not in resource_types are ignored.
+
+    Args:
+      resource_types (iterable): Resource types to sort
+      dependencies (dict): Resource type to the types it depends on,
+          defaults to FOREMAN_DEPENDENCIES
+    Returns:
+      list of lists of resource types
+    Raises:
+      ValueError: If the dependencies are cyclic
+    """
+    if dependencies is None:
+        dependencies = FOREMAN_DEPENDENCIES
+    remaining = set(resource_types)
+    pending = dict((resource_type, set(dependencies.get(resource_type, ())) & remaining - set([resource_type]))
+                   for resource_type in remaining)
+    levels = []
+    while pending:
+        level = sorted(resource_type for resource_type, depends in pending.items() if not depends)
+        if not level:
+            raise ValueError('Cyclic dependencies between {0}'.format(', '.join(sorted(pending))))
+        levels.append(level)
+        for resource_type in level:
+            del pending[resource_type]
+        for depends in pending.values():
+            depends.difference_update(level)
+    return levels
+
+
+def normalize_resource(resource):
+    """Return a resource of a desired state document with references as
+    <reference>_name and <reference>_names keys
+
+    domain: example.com becomes domain_name: example.com and
+    architectures: [x86_64] becomes architecture_names: [x86_64].
+
+    Args:
+      resource (dict): Resource as written in the document
+    Returns:
+      dict
+    """
+    normalized = {}
+    for key, value in resource.items():
+        if key in FOREMAN_NAME_REFERENCES and not isinstance(value, (dict, list)):
+            normalized[key + '_name'] = value
+        elif key in FOREMAN_ASSOCIATIONS and isinstance(value, list):
+            normalized[FOREMAN_ASSOCIATIONS[key] + '_names'] = value
+        else:
+            normalized[key] = value
+    return normalized
+
+
+def get_field(resource, key):
+    """Return the value of a field of a resource returned by Foreman
+
+    Show responses contain associations as lists of resources, the ids of
+    locations: [{id: 1, name: ...}] are returned for location_ids.
+
+    Args:
+      resource (dict): Resource as returned by Foreman
+      key (str): Field as sent in create and update requests
+    Returns:
+      (found, value), found is False if Foreman did not return the field
+    """
+    if key in resource:
+        return True, resource[key]
+    prefix, _, suffix = key.rpartition('_')
+    reference_type = FOREMAN_REFERENCES.get(prefix)
+    if (suffix == 'ids' and FOREMAN_ASSOCIATIONS.get(reference_type) == prefix and
+            isinstance(resource.get(reference_type), list)):
+        return True, [item['id'] for item in resource[reference_type] if isinstance(item, dict) and 'id' in item]
+    return False, None
+
+
+def _get_field_key(key):
+    """Return the field a normalized document key is sent as, domain_name
+    as domain_id and location_names as location_ids"""
+    prefix, _, suffix = key.rpartition('_')
+    if prefix in FOREMAN_REFERENCES and suffix in ('name', 'names'):
+        return '{0}_{1}'.format(prefix, 'id' if suffix == 'name' else 'ids')
+    return key
+
+
+def _equal(current, desired):
+    if isinstance(desired, list) and isinstance(current, list):
+        return sorted(map(str, current)) == sorted(map(str, desired))
+    if isinstance(desired, (list, dict)) or isinstance(current, (list, dict)):
+        return current == desired
+    if isinstance(desired, bool) or isinstance(current, bool):
+        return str(current).lower() == str(desired).lower()
+    return current == desired or (current is not None and desired is not None and str(current) == str(desired))
+
+
+class Change(object):
+    """A create or update needed to reach the desired state
+    """
+    __slots__ = ('action', 'resource_type', 'key', 'data', 'resource_id', 'fields')
+
+    def __init__(self, action, resource_type, key, data, resource_id=None, fields=None):
+        """Init
+
+        Args:
+          action (str): BatchOperation.CREATE or BatchOperation.UPDATE
+          resource_type (str): Resource type
+          key: Natural key of the resource, see Reconciler.get_document_keys
+          data (dict): Fields to send
+          resource_id (int): Id of the resource to update
+          fields (dict): Changed fields of updates, field to (current,
+              desired)
+        """
+        self.action = action
+        self.resource_type = resource_type
+        self.key = key
+        self.data = data
+        self.resource_id = resource_id
+        self.fields = fields or {}
+
+    def get_operation(self):
+        if self.action == BatchOperation.CREATE:
+            return BatchOperation.create(resource_type=self.resource_type,
+                                         resource=FOREMAN_RESOURCES[self.resource_type],
+                                         data=self.data)
+        return BatchOperation.update(resource_type=self.resource_type, resource_id=self.resource_id,
+                                     data={FOREMAN_RESOURCES[self.resource_type]: self.data})
+
+    def __repr__(self):
+        return 'Change({0} {1} {2!r})'.format(self.action, self.resource_type, self.key)
+
+
+class ReconcileReport(object):
+    """ReconcileReport Class
+
+    Outcome of every resource of a desired state document. The item of a
+    result is (resource type, natural key), its result the Change made or
+    None if the resource was up to date.
+    """
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.results = []
+        self.stopped = False
+
+    @property
+    def changes(self):
+        return [result.result for result in self.results if result.ok and result.result is not None]
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def ok(self):
+        return not self.stopped and not self.failed
+
+    def to_dict(self):
+        """Return the number of creates, updates and unchanged resources per
+        resource type and all errors
+
+        Returns:
+          dict
+        """
+        summary = {'resources': {}, 'errors': [], 'stopped': self.stopped, 'dry_run': self.dry_run}
+        for result in self.results:
+            resource_type, key = result.item
+            counts = summary['resources'].setdefault(resource_type, {BatchOperation.CREATE: 0,
+                                                                      BatchOperation.UPDATE: 0,
+                                                                      'unchanged': 0,
+                                                                      'failed': 0})
+            if not result.ok:
+                counts['failed'] += 1
+                summary['errors'].append({'resource_type': resource_type,
+                                          'name': key,
+                                          'error': getattr(result.error, 'message', None) or str(result.error)})
+            elif result.result is None:
+                counts['unchanged'] += 1
+            else:
+                counts[result.result.action] += 1
+        return summary
+
+
+class Reconciler(object):
+    """Reconciler Class
+
+    reconciler = Reconciler(foreman, workers=8)
+    report = reconciler.apply(yaml.safe_load(open('site.yaml')))
+
+    Fields Foreman does not return (e.g. passwords) can not be compared and
+    are only sent when a resource is created.
+    """
+
+    def __init__(self, foreman, workers=None, stop_on_error=True, dependencies=None):
+        """Init
+
+        Args:
+          foreman (Foreman): Foreman to apply documents to
+          workers (int): Number of concurrent requests, capped by
+              max_workers of foreman
+          stop_on_error (bool): Do not apply further levels after a level
+              had errors, they would likely fail on missing references
+          dependencies (dict): Resource type to the types it depends on,
+              defaults to FOREMAN_DEPENDENCIES
+        """
+        self.foreman = foreman
+        self.workers = min(workers or foreman.max_workers, foreman.max_workers)
+        self.stop_on_error = stop_on_error
+        self.dependencies = dependencies or FOREMAN_DEPENDENCIES
+        self.resolver = ReferenceResolver(foreman)
+        self._existing = {}
+        self._full = {}
+
+    @staticmethod
+    def load_document(document):
+        """Return a desired state document keyed by resource type with
+        normalized resources
+
+        Args:
+          document (dict): Document, keys like medias are accepted for media
+        Returns:
+          dict
+        Raises:
+          ValueError: On unknown resource types
+        """
+        desired = {}
+        for key, resources in document.items():
+            resource_type = FOREMAN_DOCUMENT_KEYS.get(key, key)
+            if resource_type not in FOREMAN_RESOURCES:
+                raise ValueError('Resource type {0} can not be reconciled'.format(key))
+            desired.setdefault(resource_type, []).extend(normalize_resource(resource)
+                                                         for resource in resources or ())
+        return desired
+
+    def get_dependencies(self, desired):
+        """Return the dependencies of FOREMAN_DEPENDENCIES extended by the
+        references used in a document
+
+        Args:
+          desired (dict): Document as returned by load_document
+        Returns:
+          dict
+        """
+        dependencies = dict((resource_type, set(depends)) for resource_type, depends in self.dependencies.items())
+        for resource_type, resources in desired.items():
+            depends = dependencies.setdefault(resource_type, set())
+            for resource in resources:
+                for key in resource:
+                    prefix, _, suffix = key.rpartition('_')
+                    if suffix in ('name', 'names') and prefix in FOREMAN_REFERENCES and prefix != 'parent':
+                        depends.add(FOREMAN_REFERENCES[prefix])
+        return dependencies
+
+    def _run(self, func, items, stop_on_error=False):
+        return run_concurrently(func, items, workers=self.workers, stop_on_error=stop_on_error,
+                                errors=(ForemanError, requests.RequestException, ValueError))
+
+    @staticmethod
+    def _get_existing_key(resource_type, resource):
+        if resource_type in FOREMAN_NESTED_TYPES:
+            return resource.get('title') or resource.get('name')
+        return resource.get(FOREMAN_NAME_KEYS.get(resource_type, ('name',))[0])
+
+    def _list_type(self, resource_type):
+        resources = self.foreman.get_resources(resource_type=resource_type)
+        self.resolver.load_type(resource_type, resources)
+        index = {}
+        for resource in resources:
+            index.setdefault(self._get_existing_key(resource_type, resource), []).append(resource)
+        self._existing[resource_type] = index
+
+    def _get_existing(self, resource_type, key):
+        """Return the existing resource with a natural key or None
+
+        Raises:
+          ValueError: If several resources have the key
+        """
+        resources = self._existing[resource_type].get(key) or []
+        if len(resources) > 1:
+            raise ValueError('{0} {1!r} matches {2} resources'.format(resource_type, key, len(resources)))
+        return resources[0] if resources else None
+
+    def _get_parent_title(self, resource_type, parent, get_document_key):
+        """Return the title of the parent a document refers to by name or
+        title, the parent is searched in the document first"""
+        if '/' in parent:
+            return parent
+        document_key = get_document_key(parent)
+        if document_key is not None:
+            return document_key
+        if self._existing.get(resource_type, {}).get(parent):
+            return parent
+        titles = set(self._get_existing_key(resource_type, resource)
+                     for resources in self._existing.get(resource_type, {}).values()
+                     for resource in resources if resource.get('name') == parent)
+        if len(titles) > 1:
+            raise ValueError('{0} parent {1!r} is ambiguous, use its title'.format(resource_type, parent))
+        return titles.pop() if titles else parent
+
+    def get_document_keys(self, resource_type, resources):
+        """Return the natural key of every resource of a document
+
+        Resources of nested types (hostgroups, locations, organizations)
+        are keyed by the title Foreman will compute for them, the title of
+        their parent and their name (base/web for web with parent base).
+        A title given in the document is ignored, as Foreman ignores it.
+        Other resources are keyed by name, users by login.
+
+        Args:
+          resource_type (str): Resource type
+          resources (list): Normalized resources of the document
+        Returns:
+          list of (key, resource), parent_name of nested resources is
+          replaced by the title of the parent
+        Raises:
+          ValueError: On cyclic or ambiguous parents
+        """
+        if resource_type not in FOREMAN_NESTED_TYPES:
+            field = FOREMAN_NAME_KEYS.get(resource_type, ('name',))[0]
+            return [(resource.get(field), resource) for resource in resources]
+        by_name = {}
+        for resource in resources:
+            by_name.setdefault(resource.get('name'), []).append(resource)
+        keys = {}
+        visiting = set()
+
+        def get_key(resource):
+            if id(resource) in keys:
+                return keys[id(resource)]
+            if id(resource) in visiting:
+                raise ValueError('Cyclic parents of {0} {1}'.format(resource_type, resource.get('name')))
+            visiting.add(id(resource))
+            parent = resource.get('parent_name')
+            if parent is None and resource.get('parent_id') is not None:
+                parents = [current for existing in self._existing.get(resource_type, {}).values()
+                           for current in existing if current['id'] == resource['parent_id']]
+                parent = self._get_existing_key(resource_type, parents[0]) if parents else None
+            if parent is None:
+                key = resource.get('name')
+            else:
+                key = '{0}/{1}'.format(self._get_parent_title(resource_type, parent, get_document_key),
+                                       resource.get('name'))
+            keys[id(resource)] = key
+            return key
+
+        def get_document_key(name):
+            matches = by_name.get(name) or []
+            if len(matches) > 1:
+                raise ValueError('{0} parent {1!r} is ambiguous, use its title'.format(resource_type, name))
+            return get_key(matches[0]) if matches else None
+
+        keyed = []
+        for resource in resources:
+            key = get_key(resource)
+            resource = dict((field, value) for field, value in resource.items() if field != 'title')
+            if '/' in key:
+                resource['parent_name'] = key.rsplit('/', 1)[0]
+                resource.pop('parent_id', None)
+            keyed.append((key, resource))
+        return keyed
+
+    def load_full_resources(self, items):
+        """Fetch the full resources of existing resources whose documents
+        have fields listings do not contain, e.g. location_ids or template
+
+        The resources are fetched in one concurrent batch and compared by
+        plan_resource instead of the listed resources.
+
+        Args:
+          items (list): (resource type, natural key, normalized resource)
+        """
+        missing = []
+        for resource_type, key, resource in items:
+            try:
+                current = self._get_existing(resource_type, key)
+            except ValueError:
+                # Reported by plan_resource
+                continue
+            if current is None or current.get('id') is None or (resource_type, current['id']) in self._full:
+                continue
+            if any(_get_field_key(field) not in current for field in resource):
+                missing.append((resource_type, current['id']))
+        results = self._run(lambda item: self.foreman.get_resource(resource_type=item[0], resource_id=item[1]),
+                            sorted(set(missing)))
+        for result in results:
+            if result.ok:
+                self._full[result.item] = result.result
+
+    def _get_changed_fields(self, resource_type, current, data):
+        if current.get('id') is not None and any(key not in current for key in data):
+            # Listings only contain some fields, compare the others with the
+            # full resource
+            if (resource_type, current['id']) not in self._full:
+                self._full[(resource_type, current['id'])] = self.foreman.get_resource(resource_type=resource_type,
+                                                                                      resource_id=current['id'])
+            current = dict(self._full[(resource_type, current['id'])], **current)
+        fields = {}
+        for key, value in data.items():
+            found, current_value = get_field(current, key)
+            if found and not _equal(current_value, value):
+                fields[key] = (current_value, value)
+        return fields
+
+    def plan_resource(self, resource_type, resource, dry_run=False, key=None):
+        """Return the change needed to make a resource match the document
+
+        Args:
+          resource_type (str): Resource type
+          resource (dict): Normalized resource of the document
+          dry_run (bool): Keep references to resources which do not exist
+              yet instead of failing
+          key: Natural key of the resource, see get_document_keys
+        Returns:
+          Change or None if the resource is up to date
+        Raises:
+          ValueError: If several existing resources have the key
+        """
+        if key is None:
+            (key, resource), = self.get_document_keys(resource_type, [resource])
+        try:
+            data = self.resolver.resolve(resource, resource_type=resource_type)
+        except ForemanError as e:
+            if not dry_run or e.status_code != 404:
+                raise
+            data = resource
+        current = self._get_existing(resource_type, key)
+        if current is None:
+            return Change(action=BatchOperation.CREATE, resource_type=resource_type, key=key, data=data)
+        fields = self._get_changed_fields(resource_type, current, data)
+        if not fields:
+            return None
+        return Change(action=BatchOperation.UPDATE, resource_type=resource_type, key=key,
+                      data=dict((field, data[field]) for field in fields),
+                      resource_id=current['id'], fields=fields)
+
+    def _apply_resource(self, item, dry_run):
+        resource_type, key, resource = item
+        change = self.plan_resource(resource_type, resource, dry_run=dry_run, key=key)
+        if change is None or dry_run:
+            return change
+        result = change.get_operation().execute(self.foreman)
+        if change.action == BatchOperation.CREATE and isinstance(result, dict) and 'id' in result:
+            self.resolver.add(resource_type, result)
+            self._existing[resource_type][change.key] = [result]
+        return change
+
+    @staticmethod
+    def _get_waves(keyed):
+        """Split keyed resources of a type so parents come before their
+        children"""
+        waves = []
+        while keyed:
+            keys = set(key for key, _ in keyed)
+            wave = [(key, resource) for key, resource in keyed if resource.get('parent_name') not in keys]
+            if not wave:
+                raise ValueError('Cyclic parents between {0}'.format(', '.join(sorted(map(str, keys)))))
+            waves.append(wave)
+            keyed = [(key, resource) for key, resource in keyed if resource.get('parent_name') in keys]
+        return waves
+
+    def _get_level_waves(self, level, desired):
+        """Return the waves of all types of a level, the n-th waves of all
+        types are independent and merged"""
+        merged = []
+        for resource_type in level:
+            keyed = self.get_document_keys(resource_type, desired[resource_type])
+            for i, wave in enumerate(self._get_waves(keyed)):
+                if i == len(merged):
+                    merged.append([])
+                merged[i].extend((resource_type, key, resource) for key, resource in wave)
+        return merged
+
+    def apply(self, document, dry_run=False):
+        """Create and update resources to match a desired state document
+
+        Args:
+          document (dict): Resource type to list of resources
+          dry_run (bool): Only compute the changes, send no writes
+        Returns:
+          ReconcileReport
+        """
+        desired = self.load_document(document)
+        levels = get_levels(desired, dependencies=self.get_dependencies(desired))
+        report = ReconcileReport(dry_run=dry_run)
+        self._full = {}
+
+        listing = self._run(self._list_type, sorted(desired))
+        for result in listing.failed:
+            raise result.error
+
+        for i, level in enumerate(levels):
+            waves = self._get_level_waves(level, desired)
+            self.load_full_resources([item for wave in waves for item in wave])
+            for wave in waves:
+                results = self._run(lambda item: self._apply_resource(item, dry_run=dry_run), wave)
+                report.results.extend(BatchResult(item=(resource_type, key), result=result.result,
+                                                  error=result.error)
+                                      for (resource_type, key, _), result in zip(wave, results))
+            if self.stop_on_error and report.failed:
+                report.stopped = i < len(levels) - 1
+                break
+        return report
@@ -0,0 +1,239 @@
+"""
+Compact result objects
+
+Records hold one resource as a tuple of values in a slotted object. The
+keys are stored once per distinct set of keys (a shape) and shared by all
+records of that shape, so a listing of thousands of resources keeps one
+copy of its keys. RecordTable holds a whole listing column by column. Both
+can be read like the dicts returned by default.
+"""
+
+import array
+import sys
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+try:
+    intern = sys.intern
+except AttributeError:
+    pass
+
+_MISSING = object()
+
+
+def _fits_array(value):
+    return isinstance(value, int) and not isinstance(value, bool) and -2 ** 63 <= value < 2 ** 63
+
+
+class _Shape(object):
+    """Keys of a record and the position of every key in its values"""
+    __slots__ = ('keys', 'index')
+
+    def __init__(self, keys):
+        self.keys = tuple(intern(str(key)) for key in keys)
+        self.index = dict((key, position) for position, key in enumerate(self.keys))
+
+
+class Record(Mapping):
+    """Record Class
+
+    Base class of the record classes of all resource types, see
+    get_record_class. Records are read only mappings, fields can also be
+    read as attributes (host.name). Use to_dict() to get a plain, modifiable
+    dict.
+    """
+    __slots__ = ('_shape', '_values')
+
+    RESOURCE_TYPE = None
+    _shapes = {}
+
+    def __init__(self, data):
+        """Init
+
+        Args:
+          data (dict): Resource as returned by Foreman
+        """
+        keys = tuple(data)
+        shape = self._shapes.get(keys)
+        if shape is None:
+            shape = self._shapes.setdefault(keys, _Shape(keys))
+        self._shape = shape
+        self._values = tuple(data.values())
+
+    def __getitem__(self, key):
+        position = self._shape.index.get(key)
+        if position is None:
+            raise KeyError(key)
+        return self._values[position]
+
+    def __getattr__(self, key):
+        if key.startswith('_'):
+            raise AttributeError(key)
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __iter__(self):
+        return iter(self._shape.keys)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._shape.index
+
+    def __reduce__(self):
+        return _make_record, (self.RESOURCE_TYPE, self.to_dict())
+
+    def to_dict(self):
+        return dict(zip(self._shape.keys, self._values))
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, self.to_dict())
+
+
+_record_classes = {}
+
+
+def get_record_class(resource_type):
+    """Return the record class of a resource type
+
+    Every resource type gets its own subclass of Record (e.g. HostsRecord
+    for hosts) with its own shapes.
+
+    Args:
+      resource_type (str): Resource type (e.g. 'hosts')
+    Returns:
+      type
+    """
+    cls = _record_classes.get(resource_type)
+    if cls is None:
+        name = ''.join(part.capitalize() for part in resource_type.split('_')) + 'Record'
+        cls = type(str(name), (Record,), {'__slots__': (),
+                                          '__module__': __name__,
+                                          'RESOURCE_TYPE': resource_type,
+                                          '_shapes': {}})
+        cls = _record_classes.setdefault(resource_type, cls)
+    return cls
+
+
+def _make_record(resource_type, data):
+    return get_record_class(resource_type)(data)
+
+
+class RecordTable(object):
+    """RecordTable Class
+
+    Resources of a listing stored column by column. Integer columns are kept
+    in arrays; a column falls back to a list once it holds another type.
+    Indexing and iterating returns read only mapping views of the rows.
+    """
+
+    def __init__(self, resources=()):
+        """Init
+
+        Args:
+          resources (iterable): dicts to add
+        """
+        self._columns = {}
+        self._length = 0
+        self.extend(resources)
+
+    def append(self, resource):
+        """Add a resource
+
+        Args:
+          resource (dict): Resource to add
+        """
+        columns = self._columns
+        for key, value in resource.items():
+            column = columns.get(key)
+            if column is None:
+                if self._length == 0 and _fits_array(value):
+                    column = array.array('q')
+                else:
+                    column = [_MISSING] * self._length
+                columns[intern(str(key))] = column
+            elif isinstance(column, array.array) and not _fits_array(value):
+                column = columns[key] = list(column)
+            column.append(value)
+        self._length += 1
+        for key, column in list(columns.items()):
+            if len(column) < self._length:
+                if isinstance(column, array.array):
+                    column = columns[key] = list(column)
+                column.append(_MISSING)
+
+    def extend(self, resources):
+        for resource in resources:
+            self.append(resource)
+
+    @property
+    def fields(self):
+        return list(self._columns)
+
+    def column(self, key):
+        """Return all values of a field, None where a resource lacks it
+
+        Args:
+          key (str): Field name
+        Returns:
+          list
+        """
+        return [None if value is _MISSING else value for value in self._columns[key]]
+
+    def get_value(self, row, key):
+        value = self._columns[key][row]
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(self._length))]
+        if row < 0:
+            row += self._length
+        if not 0 <= row < self._length:
+            raise IndexError(row)
+        return RowView(self, row)
+
+    def __iter__(self):
+        for row in range(self._length):
+            yield RowView(self, row)
+
+
+class RowView(Mapping):
+    """Read only mapping view of one row of a RecordTable
+    """
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key):
+        try:
+            return self._table.get_value(self._row, key)
+        except KeyError:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key, column in self._table._columns.items():
+            if column[self._row] is not _MISSING:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return 'RowView({0!r})'.format(self.to_dict())
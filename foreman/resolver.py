@@ -0,0 +1,247 @@
+"""
+Resolve names of referenced resources to ids
+
+Hosts and hostgroups reference hostgroups, domains, subnets and other small
+collections by id. A ReferenceResolver lists each collection once and
+answers name to id lookups from memory, searching Foreman only for names it
+does not know yet.
+"""
+
+import threading
+
+from foreman.batch import run_concurrently
+from foreman.foreman import (ForemanError, ARCHITECTURES, COMPUTE_PROFILES, COMPUTE_RESOURCES, CONFIG_TEMPLATES,
+                             DOMAINS, ENVIRONMENTS, HOSTGROUPS, LOCATIONS, MEDIA, OPERATINGSYSTEMS, ORGANIZATIONS,
+                             PARTITION_TABLES, REALMS, ROLES, SMART_PROXIES, SUBNETS, TEMPLATE_KINDS, USERGROUPS,
+                             USERS)
+
+# Reference prefix as used in <prefix>_id/<prefix>_name keys of resources
+# and the resource type it refers to
+FOREMAN_REFERENCES = {
+    'architecture': ARCHITECTURES,
+    'compute_profile': COMPUTE_PROFILES,
+    'compute_resource': COMPUTE_RESOURCES,
+    'config_template': CONFIG_TEMPLATES,
+    'dhcp': SMART_PROXIES,
+    'dns': SMART_PROXIES,
+    'domain': DOMAINS,
+    'environment': ENVIRONMENTS,
+    'hostgroup': HOSTGROUPS,
+    'location': LOCATIONS,
+    'medium': MEDIA,
+    'operatingsystem': OPERATINGSYSTEMS,
+    'organization': ORGANIZATIONS,
+    'parent': HOSTGROUPS,
+    'provisioning_template': CONFIG_TEMPLATES,
+    'ptable': PARTITION_TABLES,
+    'puppet_ca_proxy': SMART_PROXIES,
+    'puppet_proxy': SMART_PROXIES,
+    'realm': REALMS,
+    'role': ROLES,
+    'smart_proxy': SMART_PROXIES,
+    'subnet': SUBNETS,
+    'template_kind': TEMPLATE_KINDS,
+    'tftp': SMART_PROXIES,
+    'user': USERS,
+    'usergroup': USERGROUPS,
+}
+
+# Keys besides name a resource can be referred to by
+FOREMAN_NAME_KEYS = {
+    HOSTGROUPS: ('name', 'title'),
+    LOCATIONS: ('name', 'title'),
+    OPERATINGSYSTEMS: ('name', 'title'),
+    ORGANIZATIONS: ('name', 'title'),
+    USERS: ('login',),
+}
+
+
+class ReferenceResolver(object):
+    """ReferenceResolver Class
+
+    resolver = ReferenceResolver(foreman)
+    resolver.load(workers=4)
+    foreman.create_host({'name': 'web01', 'hostgroup_name': 'web', 'domain_name': 'example.com'},
+                        resolver=resolver)
+
+    Collections not loaded up front are listed on first use. A name missing
+    from a loaded collection is searched once, so resources created by
+    someone else since the listing are found.
+    """
+
+    def __init__(self, foreman, references=None):
+        """Init
+
+        Args:
+          foreman (Foreman): Foreman to request resources from
+          references (dict): Reference prefix to resource type, defaults to
+              FOREMAN_REFERENCES
+        """
+        self.foreman = foreman
+        self.references = references or FOREMAN_REFERENCES
+        self._by_id = {}
+        # Titles are unique, names of nested resources (web in base/web and
+        # in other/web) are not
+        self._by_title = {}
+        self._by_name = {}
+        self._loaded = set()
+        self._lock = threading.Lock()
+
+    def _add(self, resource_type, resource):
+        self._by_id.setdefault(resource_type, {})[resource['id']] = resource
+        titles = self._by_title.setdefault(resource_type, {})
+        names = self._by_name.setdefault(resource_type, {})
+        for key in FOREMAN_NAME_KEYS.get(resource_type, ('name',)):
+            if resource.get(key) is None:
+                continue
+            if key == 'title':
+                titles[resource[key]] = resource['id']
+            else:
+                names.setdefault(resource[key], set()).add(resource['id'])
+
+    def add(self, resource_type, resource):
+        """Index a resource, e.g. one just created
+
+        Args:
+          resource_type (str): Resource type
+          resource (dict): Resource with id and name
+        """
+        with self._lock:
+            self._add(resource_type, resource)
+
+    def load_type(self, resource_type, resources=None):
+        """List all resources of a type and index them
+
+        Args:
+          resource_type (str): Resource type
+          resources (list): Already listed resources of the type, listed
+              from Foreman if None
+        """
+        if resources is None:
+            resources = self.foreman.get_resources(resource_type=resource_type)
+        with self._lock:
+            self._by_id[resource_type] = {}
+            self._by_title[resource_type] = {}
+            self._by_name[resource_type] = {}
+            for resource in resources:
+                self._add(resource_type, resource)
+            self._loaded.add(resource_type)
+
+    def load(self, resource_types=None, workers=1):
+        """Load several resource types
+
+        Args:
+          resource_types (list): Resource types, defaults to all referenced
+              types
+          workers (int): Number of types to list concurrently
+        """
+        resource_types = sorted(set(resource_types or self.references.values()))
+        report = run_concurrently(self.load_type, resource_types, workers=workers)
+        for result in report.failed:
+            raise result.error
+
+    def _ensure_loaded(self, resource_type):
+        if resource_type not in self._loaded:
+            self.load_type(resource_type)
+
+    def get_id(self, resource_type, name):
+        """Return the id of the resource with a name
+
+        For types having titles (hostgroups, locations, ...) a resource
+        whose title is name wins over resources only named so.
+
+        Args:
+          resource_type (str): Resource type
+          name (str): Name, or title for types having titles
+        Returns:
+          int
+        Raises:
+          ForemanError: 404 if no resource has this name, 300 if several
+              resources have this name and none has it as title
+        """
+        self._ensure_loaded(resource_type)
+        resource_id = self._by_title[resource_type].get(name)
+        if resource_id is not None:
+            return resource_id
+        resource_ids = self._by_name[resource_type].get(name)
+        if not resource_ids:
+            return self._search_id(resource_type, name)
+        if len(resource_ids) > 1:
+            raise ForemanError(url=self.foreman._get_resource_url(resource_type=resource_type), status_code=300,
+                               message='{0} {1!r} is ambiguous, use the title'.format(resource_type, name))
+        return next(iter(resource_ids))
+
+    def _search_id(self, resource_type, name):
+        keys = FOREMAN_NAME_KEYS.get(resource_type, ('name',))
+        if 'title' in keys:
+            try:
+                resource = self.foreman.search_one(resource_type=resource_type, query={'title': name})
+            except ForemanError as e:
+                if e.status_code != 404:
+                    raise
+            else:
+                self.add(resource_type, resource)
+                return resource['id']
+        resource = self.foreman.search_one(resource_type=resource_type, query={keys[0]: name})
+        self.add(resource_type, resource)
+        return resource['id']
+
+    def get(self, resource_type, resource_id):
+        """Return the resource with an id
+
+        Args:
+          resource_type (str): Resource type
+          resource_id (int): Id
+        Returns:
+          dict
+        """
+        self._ensure_loaded(resource_type)
+        resource = self._by_id[resource_type].get(resource_id)
+        if resource is None:
+            resource = self.foreman.get_resource(resource_type=resource_type, resource_id=resource_id)
+            self.add(resource_type, resource)
+        return resource
+
+    def resolve(self, data, resource_type=None):
+        """Return a copy of data with references by name replaced by ids
+
+        <reference>_name keys are replaced by <reference>_id and lists in
+        <reference>_names keys by <reference>_ids. Ids already given are
+        kept as they are.
+
+        Args:
+          data (dict): Attributes of a host, hostgroup or other resource
+          resource_type (str): Resource type of data, parent_name refers to
+              a resource of this type. Defaults to hostgroups.
+        Returns:
+          dict
+        """
+        resolved = dict(data)
+        for prefix, reference_type in self.references.items():
+            if prefix == 'parent' and resource_type is not None:
+                reference_type = resource_type
+            name = resolved.pop(prefix + '_name', None)
+            if name is not None and resolved.get(prefix + '_id') is None:
+                resolved[prefix + '_id'] = self._get_reference_id(prefix, reference_type, name)
+            names = resolved.pop(prefix + '_names', None)
+            if names is not None and resolved.get(prefix + '_ids') is None:
+                resolved[prefix + '_ids'] = [self._get_reference_id(prefix, reference_type, name)
+                                             for name in names]
+        return resolved
+
+    def _get_reference_id(self, prefix, resource_type, name):
+        try:
+            return self.get_id(resource_type, name)
+        except ForemanError as e:
+            if e.status_code != 404:
+                raise
+            raise ForemanError(url=e.url, status_code=404,
+                               message='{0} {1!r} not found'.format(prefix, name))
+
+    def clear(self):
+        """Forget all loaded resources"""
+        with self._lock:
+            self._by_id.clear()
+            self._by_title.clear()
+            self._by_name.clear()
+            self._loaded.clear()
@@ -0,0 +1,436 @@
+"""
+Restore an export into a Foreman instance
+
+Resources of an export (see foreman.export) are created in dependency order
+(see foreman.reconcile.get_levels), all resource types of a level and all
+resources of a type concurrently. Ids change when resources are created, a
+mapping table of old to new ids is kept in a SQLite checkpoint file and
+used to rewrite references (<reference>_id and <reference>_ids keys and the
+associations of show responses, e.g. locations: [{id: 1, name: ...}]).
+Resources of types which can not be created, like template kinds, are
+mapped to the existing resources with the same name. An interrupted
+restore started again with the same checkpoint skips everything already
+restored.
+"""
+
+import os
+import sqlite3
+import threading
+
+import requests
+
+from foreman.batch import run_concurrently
+from foreman.export import FOREMAN_EXPORT_COMPONENTS, get_file_name, read_manifest, read_ndjson
+from foreman.foreman import (ForemanError, FOREMAN_MAX_WORKERS, HOSTGROUPS, LOCATIONS, ORGANIZATIONS,
+                             OS_DEFAULT_TEMPLATE, OS_DEFAULT_TEMPLATES, PARAMETER, PARAMETERS, TEMPLATE_KINDS)
+from foreman.reconcile import FOREMAN_ASSOCIATIONS, FOREMAN_RESOURCES, get_levels, get_natural_key
+from foreman.resolver import FOREMAN_NAME_KEYS, FOREMAN_REFERENCES
+
+# Components which can be restored and the key of their create requests
+FOREMAN_RESTORE_COMPONENTS = {
+    OS_DEFAULT_TEMPLATES: OS_DEFAULT_TEMPLATE,
+    PARAMETERS: PARAMETER,
+}
+
+# Keys computed by Foreman which are not sent when creating a resource
+FOREMAN_RESTORE_IGNORED_KEYS = frozenset(['id', 'created_at', 'updated_at', 'ancestry'])
+FOREMAN_RESTORE_TITLE_TYPES = (HOSTGROUPS, LOCATIONS, ORGANIZATIONS)
+
+# Resource types which can not be created, exported resources are mapped to
+# the existing resources with the same name
+FOREMAN_RESTORE_ADOPTED_TYPES = (TEMPLATE_KINDS,)
+
+# Number of id mappings written to the checkpoint per transaction
+FOREMAN_CHECKPOINT_BATCH = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ids (
+    resource_type TEXT NOT NULL,
+    old_id INTEGER NOT NULL,
+    new_id INTEGER NOT NULL,
+    PRIMARY KEY (resource_type, old_id)
+);
+CREATE TABLE IF NOT EXISTS components (
+    resource_type TEXT NOT NULL,
+    component TEXT NOT NULL,
+    parent_id INTEGER NOT NULL,
+    old_id INTEGER NOT NULL,
+    new_id INTEGER,
+    PRIMARY KEY (resource_type, component, parent_id, old_id)
+);
+"""
+
+
+class Checkpoint(object):
+    """Checkpoint Class
+
+    Mapping of old to new ids, stored in SQLite. Mappings of resources are
+    buffered and written every FOREMAN_CHECKPOINT_BATCH mappings and on
+    flush(), resources created but lost with the buffer are found again by
+    name when the restore is resumed. Components can not be found again,
+    their mappings are written right away.
+    """
+
+    def __init__(self, path=':memory:'):
+        """Init
+
+        Args:
+          path (str): SQLite database file
+        """
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._ids = {}
+        self._components = set()
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def _load(self, resource_type):
+        ids = self._ids.get(resource_type)
+        if ids is None:
+            rows = self._db.execute('SELECT old_id, new_id FROM ids WHERE resource_type = ?', (resource_type,))
+            ids = self._ids[resource_type] = dict(rows.fetchall())
+        return ids
+
+    def get(self, resource_type, old_id):
+        """Return the new id of a resource or None if not restored yet"""
+        with self._lock:
+            return self._load(resource_type).get(old_id)
+
+    def get_ids(self, resource_type):
+        """Return a copy of the mapping of a resource type"""
+        with self._lock:
+            return dict(self._load(resource_type))
+
+    def set(self, resource_type, old_id, new_id):
+        with self._lock:
+            self._load(resource_type)[old_id] = new_id
+            self._pending.append((resource_type, old_id, new_id))
+            if len(self._pending) >= FOREMAN_CHECKPOINT_BATCH:
+                self._flush()
+
+    def has_component(self, resource_type, component, parent_id, old_id):
+        with self._lock:
+            if not self._components:
+                rows = self._db.execute('SELECT resource_type, component, parent_id, old_id FROM components')
+                self._components.update(rows.fetchall())
+                self._components.add(None)
+            return (resource_type, component, parent_id, old_id) in self._components
+
+    def set_component(self, resource_type, component, parent_id, old_id, new_id):
+        with self._lock:
+            with self._db:
+                self._db.execute('INSERT OR REPLACE INTO components '
+                                 '(resource_type, component, parent_id, old_id, new_id) VALUES (?, ?, ?, ?, ?)',
+                                 (resource_type, component, parent_id, old_id, new_id))
+            self._components.add((resource_type, component, parent_id, old_id))
+
+    def _flush(self):
+        with self._db:
+            self._db.executemany('INSERT OR REPLACE INTO ids (resource_type, old_id, new_id) VALUES (?, ?, ?)',
+                                 self._pending)
+        del self._pending[:]
+
+    def flush(self):
+        """Write all buffered mappings"""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+
+class RestoreReport(object):
+    """RestoreReport Class
+
+    Number of created, adopted (already existing with the same name),
+    skipped (restored before) and failed resources per file and the errors.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def count(self, file_name, outcome):
+        with self._lock:
+            counts = self.counts.setdefault(file_name, {'created': 0, 'adopted': 0, 'skipped': 0, 'failed': 0})
+            counts[outcome] += 1
+
+    def add_error(self, file_name, name, error):
+        self.count(file_name, 'failed')
+        with self._lock:
+            self.errors.append({'file': file_name,
+                                'name': name,
+                                'error': getattr(error, 'message', None) or str(error)})
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def to_dict(self):
+        return {'files': self.counts, 'errors': self.errors}
+
+
+class Restorer(object):
+    """Restorer Class
+
+    with Foreman('new-foreman.example.com', 443, 'admin', 'p4ssw0rd', max_workers=8) as foreman:
+        restorer = Restorer(foreman, '/var/backups/foreman/2016-01-01', checkpoint='/tmp/restore.db',
+                            defaults={'users': {'password': 'changeme'}})
+        report = restorer.run()
+
+    Resources which already exist with the same name (e.g. the default
+    architectures) are not created again but mapped to the existing ones.
+    Fields Foreman does not export, like passwords, can be given per
+    resource type with defaults. Be careful with hosts: creating a managed
+    host may provision it.
+    """
+
+    def __init__(self, foreman, directory, checkpoint=None, resource_types=None, components=None,
+                 workers=FOREMAN_MAX_WORKERS, defaults=None):
+        """Init
+
+        Args:
+          foreman (Foreman): Foreman to restore into
+          directory (str): Export directory
+          checkpoint (str): SQLite file to keep the id mapping in, needed to
+              resume an interrupted restore
+          resource_types (list): Resource types to restore, defaults to all
+              exported types which can be created
+          components (dict): Resource type to components to restore,
+              defaults to the exported parameters and os_default_templates
+          workers (int): Number of concurrent requests, capped by
+              max_workers of foreman
+          defaults (dict): Resource type to fields added to every created
+              resource of the type
+        """
+        self.foreman = foreman
+        self.directory = directory
+        self.manifest = read_manifest(directory)
+        self.checkpoint = Checkpoint(checkpoint or ':memory:')
+        exported = set(info['resource_type'] for info in self.manifest['files'].values()
+                       if not info.get('component'))
+        self.resource_types = [resource_type for resource_type in (resource_types or sorted(exported))
+                               if resource_type in FOREMAN_RESOURCES and resource_type in exported]
+        if components is None:
+            components = dict((resource_type, [component for component in components
+                                               if component in FOREMAN_RESTORE_COMPONENTS])
+                              for resource_type, components in FOREMAN_EXPORT_COMPONENTS.items())
+        self.components = components
+        self.workers = min(workers or foreman.max_workers, foreman.max_workers)
+        self.defaults = defaults or {}
+
+    def _get_path(self, resource_type, component=None):
+        file_name = get_file_name(resource_type, component)
+        if file_name not in self.manifest['files']:
+            return None
+        return os.path.join(self.directory, file_name)
+
+    def _map_id(self, resource_type, old_id):
+        if old_id is None:
+            return None
+        return self.checkpoint.get(resource_type, old_id)
+
+    def get_data(self, resource_type, resource):
+        """Return the fields to create an exported resource with
+
+        References are rewritten to the new ids, references to resources
+        not restored are dropped.
+
+        Args:
+          resource_type (str): Resource type of the resource
+          resource (dict): Exported resource
+        Returns:
+          dict
+        """
+        data = dict(self.defaults.get(resource_type, {}))
+        for key, value in resource.items():
+            if key in FOREMAN_RESTORE_IGNORED_KEYS:
+                continue
+            if key == 'title' and resource_type in FOREMAN_RESTORE_TITLE_TYPES:
+                continue
+            prefix, _, suffix = key.rpartition('_')
+            if suffix in ('id', 'ids', 'name') and prefix in FOREMAN_REFERENCES:
+                reference_type = resource_type if prefix == 'parent' else FOREMAN_REFERENCES[prefix]
+                if suffix == 'id':
+                    new_id = self._map_id(reference_type, value)
+                    if new_id is not None:
+                        data[key] = new_id
+                elif suffix == 'ids':
+                    data[key] = [new_id for new_id in (self._map_id(reference_type, old_id)
+                                                       for old_id in value or ()) if new_id is not None]
+                continue
+            if key in FOREMAN_ASSOCIATIONS and isinstance(value, list):
+                # Associations in show responses, e.g. locations: [{id: 1, name: ...}]
+                data[FOREMAN_ASSOCIATIONS[key] + '_ids'] = [new_id for new_id in
+                                                            (self._map_id(key, item.get('id')) for item in value
+                                                             if isinstance(item, dict)) if new_id is not None]
+                continue
+            if isinstance(value, dict) or (isinstance(value, list) and any(isinstance(item, dict)
+                                                                          for item in value)):
+                continue
+            data[key] = value
+        return data
+
+    def _list_existing(self, resource_type):
+        existing = {}
+        keys = FOREMAN_NAME_KEYS.get(resource_type, ('name',))
+        for resource in self.foreman.iter_resources(resource_type=resource_type, fields=('id',) + keys):
+            existing.setdefault(get_natural_key(resource_type, resource), resource['id'])
+        return existing
+
+    def _restore_resource(self, resource_type, resource, existing, report):
+        file_name = get_file_name(resource_type)
+        key = get_natural_key(resource_type, resource)
+        if self.checkpoint.get(resource_type, resource['id']) is not None:
+            report.count(file_name, 'skipped')
+            return
+        if key is not None and key in existing:
+            self.checkpoint.set(resource_type, resource['id'], existing[key])
+            report.count(file_name, 'adopted')
+            return
+        try:
+            result = self.foreman.create_resource(resource_type=resource_type,
+                                                  resource=FOREMAN_RESOURCES[resource_type],
+                                                  data=self.get_data(resource_type, resource))
+        except (ForemanError, requests.RequestException) as e:
+            report.add_error(file_name, key, e)
+            return
+        self.checkpoint.set(resource_type, resource['id'], result['id'])
+        report.count(file_name, 'created')
+
+    def adopt_type(self, resource_type, report):
+        """Map all exported resources of a type which can not be created to
+        the existing resources with the same name
+
+        Args:
+          resource_type (str): Resource type, e.g. template_kinds
+          report (RestoreReport): Report to count in
+        """
+        path = self._get_path(resource_type)
+        if path is None:
+            return
+        file_name = get_file_name(resource_type)
+        existing = self._list_existing(resource_type)
+        for resource in read_ndjson(path):
+            key = get_natural_key(resource_type, resource)
+            if key in existing:
+                self.checkpoint.set(resource_type, resource['id'], existing[key])
+                report.count(file_name, 'adopted')
+            else:
+                report.add_error(file_name, key, '{0} {1} does not exist'.format(resource_type, key))
+
+    def restore_type(self, resource_type, report):
+        """Create all exported resources of a type
+
+        Resources whose parent (parent_id of the same type) is not restored
+        yet are held back and created in further waves.
+
+        Args:
+          resource_type (str): Resource type
+          report (RestoreReport): Report to count in
+        """
+        path = self._get_path(resource_type)
+        if path is None:
+            return
+        existing = self._list_existing(resource_type)
+        deferred = []
+
+        def ready(resource):
+            parent_id = resource.get('parent_id')
+            if parent_id is not None and self.checkpoint.get(resource_type, parent_id) is None:
+                deferred.append(resource)
+                return False
+            return True
+
+        def restore(resource):
+            self._restore_resource(resource_type, resource, existing, report)
+
+        resources = (resource for resource in read_ndjson(path) if ready(resource))
+        while True:
+            result = run_concurrently(restore, resources, workers=self.workers, keep_results=False)
+            # Errors not expected from Foreman, e.g. a resource missing a
+            # key, fail the resource instead of vanishing in the result
+            for failed in result.failed:
+                report.add_error(get_file_name(resource_type), get_natural_key(resource_type, failed.item),
+                                 failed.error)
+            waiting, deferred = deferred, []
+            resources = [resource for resource in waiting if ready(resource)]
+            if not resources:
+                break
+        for resource in deferred:
+            report.add_error(get_file_name(resource_type), get_natural_key(resource_type, resource),
+                             'Parent {0} not restored'.format(resource['parent_id']))
+
+    def _restore_component(self, resource_type, component, item, report):
+        file_name = get_file_name(resource_type, component)
+        resource = item['resource']
+        parent_id = self.checkpoint.get(resource_type, item['parent_id'])
+        if parent_id is None:
+            report.add_error(file_name, resource.get('name'), '{0} {1} not restored'.format(resource_type,
+                                                                                          item['parent_name']))
+            return
+        if self.checkpoint.has_component(resource_type, component, item['parent_id'], resource['id']):
+            report.count(file_name, 'skipped')
+            return
+        try:
+            result = self.foreman.create_resource(resource_type=resource_type,
+                                                  resource_id=parent_id,
+                                                  component=component,
+                                                  resource=FOREMAN_RESTORE_COMPONENTS[component],
+                                                  data=self.get_data(component, resource))
+        except (ForemanError, requests.RequestException) as e:
+            report.add_error(file_name, resource.get('name'), e)
+            return
+        self.checkpoint.set_component(resource_type, component, item['parent_id'], resource['id'],
+                                      result.get('id') if isinstance(result, dict) else None)
+        report.count(file_name, 'created')
+
+    def restore_component(self, resource_type, component, report):
+        """Create all exported components of a resource type
+
+        Args:
+          resource_type (str): Resource type
+          component (str): Component, e.g. parameters
+          report (RestoreReport): Report to count in
+        """
+        path = self._get_path(resource_type, component)
+        if path is None:
+            return
+        result = run_concurrently(lambda item: self._restore_component(resource_type, component, item, report),
+                                  read_ndjson(path), workers=self.workers, keep_results=False)
+        for failed in result.failed:
+            report.add_error(get_file_name(resource_type, component), failed.item.get('resource', {}).get('name'),
+                             failed.error)
+
+    def run(self):
+        """Restore all resource types level by level, then their components
+
+        Returns:
+          RestoreReport
+        """
+        report = RestoreReport()
+        try:
+            for resource_type in FOREMAN_RESTORE_ADOPTED_TYPES:
+                try:
+                    self.adopt_type(resource_type, report)
+                except (ForemanError, requests.RequestException) as e:
+                    report.add_error(get_file_name(resource_type), None, e)
+            for level in get_levels(self.resource_types):
+                # Types of a level are independent and restored side by side
+                result = run_concurrently(lambda resource_type: self.restore_type(resource_type, report), level,
+                                          workers=len(level), errors=(ForemanError, requests.RequestException))
+                for failed in result.failed:
+                    report.add_error(get_file_name(failed.item), None, failed.error)
+                self.checkpoint.flush()
+            for resource_type in self.resource_types:
+                for component in self.components.get(resource_type, ()):
+                    try:
+                        self.restore_component(resource_type, component, report)
+                    except (ForemanError, requests.RequestException) as e:
+                        report.add_error(get_file_name(resource_type, component), None, e)
+        finally:
+            self.checkpoint.flush()
+        return report
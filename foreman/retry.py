@@ -0,0 +1,198 @@
+"""
+Retry policy for transient Foreman failures
+"""
+
+import email.utils
+import random
+import time
+
+import requests
+from requests.packages.urllib3.exceptions import ConnectTimeoutError
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+try:
+    import asyncio
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+FOREMAN_RETRY_TOTAL = 3
+FOREMAN_RETRY_STATUSES = (429, 502, 503, 504)
+FOREMAN_RETRY_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+# URL path endings of requests which act on a host instead of setting state
+# (hosts/:id/power, hosts/:id/boot). Sending them twice reboots twice, they
+# are only retried like POST whatever their method is.
+FOREMAN_RETRY_ACTION_PATHS = ('/power', '/boot')
+
+# Errors raised while connecting, the request never reached Foreman and can
+# be retried whatever its method is. requests raises a ConnectionError for
+# refused connections too, see is_connect_error.
+CONNECT_EXCEPTIONS = (requests.exceptions.ConnectTimeout,)
+RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+if aiohttp is not None:
+    CONNECT_EXCEPTIONS += (aiohttp.ClientConnectorError,)
+    if hasattr(aiohttp, 'ConnectionTimeoutError'):
+        CONNECT_EXCEPTIONS += (aiohttp.ConnectionTimeoutError,)
+    RETRY_EXCEPTIONS += (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+
+def is_connect_error(exception):
+    """Return if an error was raised before the request was sent
+
+    Refused connections, failed name lookups and connect timeouts are
+    treated alike for requests and aiohttp.
+
+    Args:
+      exception (Exception): Error raised while sending a request
+    Returns:
+      bool
+    """
+    if isinstance(exception, CONNECT_EXCEPTIONS):
+        return True
+    if isinstance(exception, requests.exceptions.ConnectionError) and exception.args:
+        # ConnectionError wraps the MaxRetryError of urllib3, its reason is
+        # a NewConnectionError (a ConnectTimeoutError) if no connection
+        # could be established
+        reason = getattr(exception.args[0], 'reason', exception.args[0])
+        return isinstance(reason, ConnectTimeoutError)
+    return False
+
+
+class RetryPolicy(object):
+    """RetryPolicy Class
+
+    Decide if and when a failed request is sent again. Delays grow
+    exponentially with random jitter ("full jitter") and a Retry-After
+    header sent by Foreman or a proxy takes precedence.
+
+    Only idempotent methods are retried after the request may have reached
+    Foreman, action requests like power are not even if sent as PUT; errors
+    while connecting are retried for every request.
+    """
+
+    def __init__(self, total=FOREMAN_RETRY_TOTAL, statuses=FOREMAN_RETRY_STATUSES, exceptions=None,
+                 methods=FOREMAN_RETRY_METHODS, backoff_factor=0.5, max_backoff=30, jitter=True,
+                 deadline=None, respect_retry_after=True, action_paths=FOREMAN_RETRY_ACTION_PATHS):
+        """Init
+
+        Args:
+          total (int): Maximum number of retries of one request
+          statuses (tuple): HTTP status codes to retry
+          exceptions (tuple): Exception types to retry, defaults to
+              connection errors and timeouts
+          methods (tuple): HTTP verbs which are safe to retry
+          backoff_factor (float): Delay before the first retry in seconds,
+              doubled with every further retry
+          max_backoff (float): Upper limit of a single delay in seconds
+          jitter (bool): Randomize delays between 0 and the backoff
+          deadline (float): Seconds after the first attempt after which no
+              more retries are started
+          respect_retry_after (bool): Wait as long as a Retry-After header
+              asks for
+          action_paths (tuple): URL path endings of requests never retried
+              after they may have reached Foreman
+        """
+        self.total = total
+        self.statuses = frozenset(statuses)
+        self.exceptions = exceptions or RETRY_EXCEPTIONS
+        self.methods = frozenset(method.upper() for method in methods)
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.deadline = deadline
+        self.respect_retry_after = respect_retry_after
+        self.action_paths = tuple(action_paths or ())
+
+    def get_backoff(self, attempt):
+        """Return the delay before retry number attempt + 1
+
+        Args:
+          attempt (int): Number of retries done so far
+        Returns:
+          float
+        """
+        backoff = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        if self.jitter:
+            return random.uniform(0, backoff)
+        return backoff
+
+    @staticmethod
+    def parse_retry_after(value):
+        """Return the seconds to wait requested by a Retry-After header
+
+        Args:
+          value (str): Header value, either seconds or an HTTP date
+        Returns:
+          float or None
+        """
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        date = email.utils.parsedate_tz(value)
+        if date is None:
+            return None
+        return max(0.0, email.utils.mktime_tz(date) - time.time())
+
+    def is_idempotent(self, method, url=None):
+        """Return if a request may be sent to Foreman more than once
+
+        Args:
+          method (str): HTTP verb
+          url (str): URL of the request
+        Returns:
+          bool
+        """
+        if method.upper() not in self.methods:
+            return False
+        path = urlparse(url).path.rstrip('/') if url else ''
+        return not path.endswith(self.action_paths)
+
+    def is_retryable(self, method, status_code=None, exception=None, url=None):
+        """Return if a request failing like this may be retried
+
+        Args:
+          method (str): HTTP verb
+          status_code (int): Status code of the response
+          exception (Exception): Error raised while sending the request
+          url (str): URL of the request
+        Returns:
+          bool
+        """
+        if exception is not None:
+            if is_connect_error(exception):
+                return True
+            return isinstance(exception, self.exceptions) and self.is_idempotent(method, url=url)
+        return status_code in self.statuses and self.is_idempotent(method, url=url)
+
+    def get_delay(self, method, attempt, elapsed, status_code=None, exception=None, retry_after=None, url=None):
+        """Return the seconds to wait before retrying or None to give up
+
+        Args:
+          method (str): HTTP verb
+          attempt (int): Number of retries done so far
+          elapsed (float): Seconds since the first attempt
+          status_code (int): Status code of the failed response
+          exception (Exception): Error raised while sending the request
+          retry_after (str): Retry-After header of the failed response
+          url (str): URL of the request
+        Returns:
+          float or None
+        """
+        if attempt >= self.total or not self.is_retryable(method, status_code=status_code, exception=exception,
+                                                          url=url):
+            return None
+        delay = self.get_backoff(attempt)
+        if self.respect_retry_after:
+            requested = self.parse_retry_after(retry_after)
+            if requested is not None:
+                delay = requested
+        if self.deadline is not None and elapsed + delay > self.deadline:
+            return None
+        return delay
@@ -0,0 +1,175 @@
+"""
+Build Foreman search queries
+
+Foreman filters listings with a scoped_search query passed in the search
+parameter, e.g. 'name == "web01" AND hostgroup_id > 3'.
+"""
+
+import re
+import threading
+
+FOREMAN_SEARCH_CACHE_SIZE = 256
+
+SEARCH_OPERATORS = ('==', '=', '!=', '~', '!~', '>', '>=', '<', '<=', '^', '!^', 'IN', 'NOT IN')
+
+_SEARCH_KEY = re.compile(r'^[A-Za-z_][\w.]*$')
+
+try:
+    string_types = (str, unicode)
+except NameError:
+    string_types = (str,)
+
+
+def quote_value(value):
+    """Return a value as literal of a search query
+
+    Strings are double quoted with backslashes and quotes escaped.
+
+    Args:
+      value: Value to quote
+    Returns:
+      str
+    """
+    if isinstance(value, bool):
+        return ('false', 'true')[value]
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, string_types):
+        return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    raise TypeError("Type {0} of search value {1!r} not supported".format(type(value), value))
+
+
+def compile_term(key, value):
+    """Compile one condition of a search query
+
+    Args:
+      key (str): Field to search
+      value: Value to compare with. A tuple (operator, value) selects the
+          operator, a list or set searches with IN and None matches unset
+          fields.
+    Returns:
+      str
+    """
+    if not isinstance(key, string_types) or not _SEARCH_KEY.match(key):
+        raise ValueError("Invalid search key {0!r}".format(key))
+    if value is None:
+        return 'null? ' + key
+    if isinstance(value, (list, set, frozenset)):
+        value = ('IN', value)
+    if isinstance(value, tuple):
+        operator, value = value
+        operator = operator.upper()
+        if operator not in SEARCH_OPERATORS:
+            raise ValueError("Search operator {0} not supported".format(operator))
+        if operator in ('IN', 'NOT IN', '^', '!^'):
+            values = sorted(value) if isinstance(value, (set, frozenset)) else value
+            return '{0} {1} ({2})'.format(key, operator, ', '.join(quote_value(item) for item in values))
+        return '{0} {1} {2}'.format(key, operator, quote_value(value))
+    return '{0} == {1}'.format(key, quote_value(value))
+
+
+class SearchQuery(object):
+    """SearchQuery Class
+
+    Compiled Foreman search query. The query is compiled once and can be
+    reused for any number of requests. Queries are combined with & (AND) and
+    | (OR).
+
+    SearchQuery({'name': 'web01'})
+    SearchQuery({'hostgroup_id': ('IN', [1, 2]), 'name': ('~', 'web')})
+    SearchQuery.any({'name': 'web01'}, {'name': 'web02'})
+    """
+    __slots__ = ('text',)
+
+    def __init__(self, data=None, text=None):
+        """Init
+
+        Args:
+          data (dict): Field/value pairs which all have to match, see
+              compile_term
+          text (str): Already compiled query
+        """
+        if text is None:
+            text = ' AND '.join(compile_term(key, data[key]) for key in sorted(data or {}))
+        self.text = text
+
+    @classmethod
+    def all(cls, *queries):
+        return cls._join(' AND ', queries)
+
+    @classmethod
+    def any(cls, *queries):
+        return cls._join(' OR ', queries)
+
+    @classmethod
+    def _join(cls, operator, queries):
+        texts = [text for text in (str(cls.of(query)) for query in queries) if text]
+        if len(texts) == 1:
+            return cls(text=texts[0])
+        return cls(text=operator.join('(' + text + ')' for text in texts))
+
+    @classmethod
+    def of(cls, query):
+        """Return query as SearchQuery
+
+        Args:
+          query (dict, str or SearchQuery): Query to convert
+        Returns:
+          SearchQuery
+        """
+        if isinstance(query, cls):
+            return query
+        if query is None or isinstance(query, string_types):
+            return cls(text=query or '')
+        return cls(data=query)
+
+    def __and__(self, other):
+        return self.all(self, other)
+
+    def __or__(self, other):
+        return self.any(self, other)
+
+    def __eq__(self, other):
+        return isinstance(other, SearchQuery) and self.text == other.text
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.text)
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return 'SearchQuery({0!r})'.format(self.text)
+
+
+_search_cache = {}
+_search_cache_lock = threading.Lock()
+
+
+def search_query(data):
+    """Return the compiled search query of data
+
+    Queries of dicts with hashable values are compiled once and reused.
+
+    Args:
+      data (dict, str or SearchQuery): Query to compile
+    Returns:
+      str
+    """
+    if not isinstance(data, dict):
+        return str(SearchQuery.of(data))
+    try:
+        key = frozenset((key, type(value), value) for key, value in data.items())
+        text = _search_cache.get(key)
+    except TypeError:
+        return str(SearchQuery.of(data))
+    if text is None:
+        text = str(SearchQuery.of(data))
+        with _search_cache_lock:
+            if len(_search_cache) >= FOREMAN_SEARCH_CACHE_SIZE:
+                _search_cache.clear()
+            _search_cache[key] = text
+    return text
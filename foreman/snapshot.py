@@ -0,0 +1,229 @@
+"""
+Local snapshot of Foreman resources
+
+A Snapshot keeps resource listings in a SQLite database, indexed by id and
+name. The first sync of a resource type downloads the full listing, later
+syncs only request resources updated since the newest updated_at stored and
+a thin listing of ids to find deleted resources.
+"""
+
+import json
+import sqlite3
+import threading
+
+from foreman.foreman import ForemanError, COMMON_PARAMETERS, FOREMAN_PAGE_SIZE, HOSTGROUPS, HOSTS
+
+FOREMAN_SNAPSHOT_TYPES = (HOSTS, HOSTGROUPS, COMMON_PARAMETERS)
+# Number of ids per search when fetching resources missed by a delta sync
+FOREMAN_SNAPSHOT_ID_CHUNK = 100
+# Status codes Foreman answers a search it can not run with, e.g. on a
+# resource type without a searchable updated_at
+FOREMAN_SNAPSHOT_SEARCH_REJECTED = (400, 422)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    resource_type TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    name TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (resource_type, id)
+);
+CREATE INDEX IF NOT EXISTS resources_name ON resources (resource_type, name);
+CREATE TABLE IF NOT EXISTS syncs (
+    resource_type TEXT PRIMARY KEY,
+    updated_at TEXT,
+    count INTEGER NOT NULL
+);
+"""
+
+
+class Snapshot(object):
+    """Snapshot Class
+
+    with Snapshot('/var/cache/foreman.db') as snapshot:
+        snapshot.sync(foreman, 'hosts')
+        host = snapshot.get_by_name('hosts', 'web01.example.com')
+
+    Foreman only searches updated_at to the second, resources updated in the
+    same second as the newest stored one are requested again on the next
+    sync.
+    """
+
+    def __init__(self, path=':memory:'):
+        """Init
+
+        Args:
+          path (str): SQLite database file, in memory by default
+        """
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def _query(self, sql, *args):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def _store(self, resource_type, resources, replace=False):
+        rows = ((resource_type, resource['id'], resource.get('name'), resource.get('updated_at'),
+                 json.dumps(resource)) for resource in resources)
+        with self._lock, self._db:
+            if replace:
+                self._db.execute('DELETE FROM resources WHERE resource_type = ?', (resource_type,))
+            self._db.executemany('INSERT OR REPLACE INTO resources (resource_type, id, name, updated_at, data) '
+                                 'VALUES (?, ?, ?, ?, ?)', rows)
+
+    def _delete(self, resource_type, resource_ids):
+        with self._lock, self._db:
+            self._db.executemany('DELETE FROM resources WHERE resource_type = ? AND id = ?',
+                                 ((resource_type, resource_id) for resource_id in resource_ids))
+
+    def _finish_sync(self, resource_type):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO syncs (resource_type, updated_at, count) '
+                             'SELECT ?, MAX(updated_at), COUNT(*) FROM resources WHERE resource_type = ?',
+                             (resource_type, resource_type))
+
+    def get_sync(self, resource_type):
+        """Return the state of the last sync of a resource type
+
+        Args:
+          resource_type (str): Resource type
+        Returns:
+          dict with updated_at and count or None if never synced
+        """
+        rows = self._query('SELECT updated_at, count FROM syncs WHERE resource_type = ?', resource_type)
+        if not rows:
+            return None
+        return {'updated_at': rows[0][0], 'count': rows[0][1]}
+
+    def sync(self, foreman, resource_type, full=False, page_size=FOREMAN_PAGE_SIZE, workers=None):
+        """Bring the stored resources of a type up to date
+
+        Args:
+          foreman (Foreman): Foreman to sync from
+          resource_type (str): Resource type
+          full (bool): Download the full listing even if synced before
+          page_size (int): Number of resources to request per page
+          workers (int): Number of pages to request concurrently
+        Returns:
+          dict with the number of resources fetched and deleted and if a
+          full sync was done
+        """
+        sync = self.get_sync(resource_type)
+        if full or sync is None or sync['updated_at'] is None:
+            return self._sync_full(foreman, resource_type, page_size=page_size, workers=workers)
+        try:
+            changed = list(foreman.iter_search(resource_type=resource_type,
+                                               query={'updated_at': ('>=', sync['updated_at'])},
+                                               page_size=page_size, workers=workers))
+        except ForemanError as e:
+            # Outages and auth failures are raised instead of turning into
+            # a full download
+            if e.status_code not in FOREMAN_SNAPSHOT_SEARCH_REJECTED:
+                raise
+            # updated_at can not be searched for this resource type
+            return self._sync_full(foreman, resource_type, page_size=page_size, workers=workers)
+        self._store(resource_type, changed)
+
+        current_ids = set(resource['id'] for resource in
+                          foreman.iter_resources(resource_type=resource_type, fields=['id', 'name'],
+                                                 page_size=page_size, workers=workers))
+        stored_ids = set(row[0] for row in
+                         self._query('SELECT id FROM resources WHERE resource_type = ?', resource_type))
+        deleted = stored_ids - current_ids
+        self._delete(resource_type, deleted)
+
+        # Resources created with an updated_at older than the last sync, e.g.
+        # by a clock running late, are fetched by id
+        missing = sorted(current_ids - stored_ids)
+        for i in range(0, len(missing), FOREMAN_SNAPSHOT_ID_CHUNK):
+            resources = list(foreman.iter_search(resource_type=resource_type,
+                                                 query={'id': missing[i:i + FOREMAN_SNAPSHOT_ID_CHUNK]},
+                                                 page_size=page_size))
+            changed.extend(resources)
+            self._store(resource_type, resources)
+
+        self._finish_sync(resource_type)
+        return {'fetched': len(changed), 'deleted': len(deleted), 'full': False}
+
+    def _sync_full(self, foreman, resource_type, page_size, workers):
+        resources = list(foreman.iter_resources(resource_type=resource_type, page_size=page_size, workers=workers))
+        self._store(resource_type, resources, replace=True)
+        self._finish_sync(resource_type)
+        return {'fetched': len(resources), 'deleted': 0, 'full': True}
+
+    def sync_all(self, foreman, resource_types=FOREMAN_SNAPSHOT_TYPES, **kwargs):
+        """Sync several resource types, see sync
+
+        Args:
+          foreman (Foreman): Foreman to sync from
+          resource_types (list): Resource types to sync
+        Returns:
+          dict of resource type to the result of sync
+        """
+        return dict((resource_type, self.sync(foreman, resource_type, **kwargs)) for resource_type in resource_types)
+
+    def get(self, resource_type, resource_id):
+        """Return a stored resource by id
+
+        Args:
+          resource_type (str): Resource type
+          resource_id (int): Id of the resource
+        Returns:
+          dict or None
+        """
+        rows = self._query('SELECT data FROM resources WHERE resource_type = ? AND id = ?',
+                           resource_type, resource_id)
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_by_name(self, resource_type, name):
+        """Return a stored resource by name
+
+        Args:
+          resource_type (str): Resource type
+          name (str): Name of the resource
+        Returns:
+          dict or None
+        """
+        rows = self._query('SELECT data FROM resources WHERE resource_type = ? AND name = ? ORDER BY id LIMIT 1',
+                           resource_type, name)
+        return json.loads(rows[0][0]) if rows else None
+
+    def iter_resources(self, resource_type, order_by='id'):
+        """Iterate over the stored resources of a type
+
+        Args:
+          resource_type (str): Resource type
+          order_by (str): id or name
+        Returns:
+          generator of dict
+        """
+        if order_by not in ('id', 'name'):
+            raise ValueError("Snapshot resources can be ordered by id or name, not {0}".format(order_by))
+        with self._lock:
+            cursor = self._db.execute('SELECT data FROM resources WHERE resource_type = ? '
+                                      'ORDER BY {0}, id'.format(order_by), (resource_type,))
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(FOREMAN_PAGE_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                yield json.loads(row[0])
+
+    def get_resources(self, resource_type, order_by='id'):
+        return list(self.iter_resources(resource_type=resource_type, order_by=order_by))
+
+    def __len__(self):
+        return self._query('SELECT COUNT(*) FROM resources')[0][0]
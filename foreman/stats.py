@@ -0,0 +1,154 @@
+"""
+Request instrumentation
+
+Observers registered on a Foreman instance are told about every request.
+RequestStats is an observer keeping latency percentiles and transfer sizes
+per endpoint.
+"""
+
+import collections
+import threading
+
+FOREMAN_STATS_SAMPLES = 1000
+
+
+class RequestEvent(object):
+    """A request sent to Foreman
+
+    before_request gets the event with url, method, resource_type and
+    url_template set, after_request gets the completed event.
+    """
+    __slots__ = ('method', 'url', 'resource_type', 'url_template', 'status_code', 'latency',
+                 'request_bytes', 'response_bytes', 'retries', 'throttled', 'error')
+
+    def __init__(self, method, url, resource_type, url_template, request_bytes=0):
+        self.method = method
+        self.url = url
+        self.resource_type = resource_type
+        self.url_template = url_template
+        self.request_bytes = request_bytes
+        self.status_code = None
+        self.latency = None
+        self.response_bytes = 0
+        self.retries = 0
+        self.throttled = 0.0
+        self.error = None
+
+    def __repr__(self):
+        return 'RequestEvent({0} {1} {2} {3:.3f}s)'.format(self.method, self.url_template,
+                                                           self.status_code, self.latency or 0.0)
+
+
+class RequestObserver(object):
+    """Base class of request observers, override the hooks you need
+    """
+
+    def before_request(self, event):
+        pass
+
+    def after_request(self, event):
+        pass
+
+
+def percentile(samples, p):
+    """Return the p-th percentile of samples (nearest rank)
+
+    Args:
+      samples (list): Sorted values
+      p (float): Percentile between 0 and 100
+    Returns:
+      float
+    """
+    if not samples:
+        return None
+    rank = int(round(p / 100.0 * (len(samples) - 1)))
+    return samples[min(max(rank, 0), len(samples) - 1)]
+
+
+class _EndpointStats(object):
+    __slots__ = ('count', 'errors', 'retries', 'request_bytes', 'response_bytes', 'throttled', 'latencies')
+
+    def __init__(self, samples):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.throttled = 0.0
+        self.latencies = collections.deque(maxlen=samples)
+
+
+class RequestStats(RequestObserver):
+    """RequestStats Class
+
+    In memory statistics per HTTP verb and URL template (e.g.
+    'GET hosts/:id'). Percentiles are computed from the latest samples of
+    every endpoint.
+    """
+
+    def __init__(self, samples=FOREMAN_STATS_SAMPLES):
+        """Init
+
+        Args:
+          samples (int): Latencies kept per endpoint
+        """
+        self.samples = samples
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def after_request(self, event):
+        key = (event.method, event.url_template)
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = _EndpointStats(self.samples)
+            stats.count += 1
+            if event.error is not None or (event.status_code or 0) >= 400:
+                stats.errors += 1
+            stats.retries += event.retries
+            stats.request_bytes += event.request_bytes
+            stats.response_bytes += event.response_bytes
+            stats.throttled += event.throttled
+            stats.latencies.append(event.latency)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """Return the statistics of all endpoints
+
+        Args:
+          percentiles (tuple): Latency percentiles to compute
+        Returns:
+          dict of endpoint name ('GET hosts/:id') to dict
+        """
+        with self._lock:
+            endpoints = [(key, stats, sorted(stats.latencies)) for key, stats in self._endpoints.items()]
+        summary = {}
+        for (method, url_template), stats, latencies in endpoints:
+            endpoint = {'count': stats.count,
+                        'errors': stats.errors,
+                        'retries': stats.retries,
+                        'request_bytes': stats.request_bytes,
+                        'response_bytes': stats.response_bytes,
+                        'throttled': stats.throttled,
+                        'max': latencies[-1] if latencies else None}
+            for p in percentiles:
+                endpoint['p{0}'.format(p)] = percentile(latencies, p)
+            summary['{0} {1}'.format(method, url_template)] = endpoint
+        return summary
+
+    def slowest(self, count=10, p=90):
+        """Return the endpoints with the highest latency percentile
+
+        Args:
+          count (int): Number of endpoints
+          p (float): Percentile to compare
+        Returns:
+          list of (endpoint name, latency)
+        """
+        key = 'p{0}'.format(p)
+        summary = self.summary(percentiles=(p,))
+        return sorted(((name, stats[key]) for name, stats in summary.items()),
+                      key=lambda item: item[1], reverse=True)[:count]
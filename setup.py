@@ -32,4 +32,8 @@ setup(name='python-foreman',
       url='https://github.com/Nosmoht/python-foreman',
       packages=['foreman'],
       install_requires=requirements(),
+      extras_require={
+        'async': ['aiohttp >= 3.0'],
+        'fast': ['orjson'],
+      },
       )
@@ -0,0 +1,39 @@
+import json
+
+import requests
+import requests.adapters
+
+from foreman.foreman import Foreman
+
+
+class StubAdapter(requests.adapters.BaseAdapter):
+    """Answer the requests of a Foreman instead of sending them
+
+    handler is called with the prepared request and returns (status code,
+    body, headers) or raises, e.g. requests.ConnectionError.
+    """
+
+    def __init__(self, handler):
+        requests.adapters.BaseAdapter.__init__(self)
+        self.handler = handler
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        status_code, body, headers = self.handler(request)
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(body).encode('utf-8') if body is not None else b''
+        response.headers.update(headers or {})
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def get_foreman(handler, **kwargs):
+    """Return a Foreman whose requests are answered by handler and its adapter"""
+    adapter = StubAdapter(handler)
+    return Foreman('foreman.example.com', 443, 'admin', 'secret', adapter=adapter, **kwargs), adapter
@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+
+from benchmarks.fake_foreman import FakeForeman
+from foreman.cache import ResponseCache
+from foreman.foreman import HOSTGROUP, HOSTGROUPS, HOSTS
+from foreman.ratelimit import Limit, RateLimiter
+
+try:
+    from foreman.aio import AsyncForeman, aiohttp
+except SyntaxError:
+    aiohttp = None
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class AsyncForemanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeForeman(counts={HOSTS: 95}).start()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.server.stop()
+
+    def run_with(self, func, **kwargs):
+        foreman = AsyncForeman('127.0.0.1', self.server.port, 'admin', 'secret', ssl=False, **kwargs)
+        try:
+            return self.loop.run_until_complete(func(foreman))
+        finally:
+            self.loop.run_until_complete(foreman.close())
+
+    def test_prefetch(self):
+        hosts = self.run_with(lambda foreman: foreman.get_resources(resource_type=HOSTS, page_size=10,
+                                                                    workers=2))
+        self.assertEqual([host['id'] for host in hosts], list(range(1, 96)))
+
+    def test_cache(self):
+        cache = ResponseCache()
+
+        async def lookups(foreman):
+            await foreman.get_resource(resource_type=HOSTGROUPS, resource_id=1)
+            await foreman.get_resource(resource_type=HOSTGROUPS, resource_id=1)
+            await foreman.update_resource(resource_type=HOSTGROUPS, resource_id=1,
+                                          data={HOSTGROUP: {'description': 'web'}})
+            return await foreman.get_resource(resource_type=HOSTGROUPS, resource_id=1)
+
+        hostgroup = self.run_with(lookups, cache=cache)
+        self.assertEqual(hostgroup['description'], 'web')
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter([Limit(max_in_flight=1)])
+        hosts = self.run_with(lambda foreman: foreman.get_resources(resource_type=HOSTS, page_size=10,
+                                                                    workers=4),
+                              rate_limiter=limiter, max_workers=4)
+        self.assertEqual(len(hosts), 95)
+        self.assertTrue(limiter.get_limits('GET')[0].semaphore.acquire(False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import threading
+import time
+import unittest
+
+from foreman.cache import ResponseCache
+from foreman.foreman import HOSTS
+
+from stubs import get_foreman
+
+HOST = {'id': 5, 'name': 'web01.example.com'}
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def test_lru(self):
+        cache = ResponseCache(maxsize=2)
+        for name in ('a', 'b'):
+            cache.set(cache.key(name), resource_type=HOSTS, value={'name': name})
+        cache.get(cache.key('a'))
+        cache.set(cache.key('c'), resource_type=HOSTS, value={'name': 'c'})
+        self.assertEqual(cache.get(cache.key('b')), None)
+        self.assertEqual(cache.get(cache.key('a')), {'name': 'a'})
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self):
+        cache = ResponseCache(ttl=60, ttls={'domains': 0})
+        cache.set(cache.key('hosts/1'), resource_type=HOSTS, value=HOST)
+        cache.set(cache.key('domains/1'), resource_type='domains', value={'id': 1})
+        self.assertEqual(cache.get(cache.key('domains/1')), None)
+        cache.get_entry(cache.key('hosts/1')).expires = time.time() - 1
+        self.assertEqual(cache.get(cache.key('hosts/1')), None)
+        self.assertEqual(len(cache), 0)
+
+    def test_values_are_copied(self):
+        cache = ResponseCache()
+        value = {'name': 'a'}
+        cache.set(cache.key('a'), resource_type=HOSTS, value=value)
+        value['name'] = 'b'
+        cache.get(cache.key('a'))['name'] = 'c'
+        self.assertEqual(cache.get(cache.key('a')), {'name': 'a'})
+
+    def test_counters_under_threads(self):
+        cache = ResponseCache()
+        cache.set(cache.key('a'), resource_type=HOSTS, value={})
+
+        def lookup():
+            for _ in range(1000):
+                cache.get(cache.key('a'))
+                cache.get(cache.key('b'))
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.stats()['hits'], 8000)
+        self.assertEqual(cache.stats()['misses'], 8000)
+
+
+class ForemanCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.foreman, self.adapter = get_foreman(self.handle, cache=ResponseCache())
+
+    @staticmethod
+    def handle(request):
+        if '/hosts/6' in request.url:
+            return 200, {'id': 6, 'name': 'web02.example.com'}, {}
+        return 200, HOST, {}
+
+    def tearDown(self):
+        self.foreman.close()
+
+    def test_read_through(self):
+        self.foreman.get_resource(resource_type=HOSTS, resource_id=5)
+        self.assertEqual(self.foreman.get_resource(resource_type=HOSTS, resource_id=5), HOST)
+        self.assertEqual(len(self.adapter.requests), 1)
+        self.assertEqual(self.foreman.cache.stats()['hits'], 1)
+        self.assertEqual(self.foreman.cache.stats()['misses'], 1)
+
+    def test_update_by_id_invalidates_name(self):
+        self.foreman.get_resource(resource_type=HOSTS, resource_id='web01.example.com')
+        self.foreman.get_resource(resource_type=HOSTS, resource_id='web01.example.com', component='parameters')
+        self.foreman.get_resource(resource_type=HOSTS, resource_id=6)
+        self.foreman.update_resource(resource_type=HOSTS, resource_id=5, data={'host': {'comment': 'x'}})
+        self.assertEqual(len(self.foreman.cache), 1)
+
+    def test_update_by_name_invalidates_id(self):
+        self.foreman.get_resource(resource_type=HOSTS, resource_id=5)
+        self.foreman.update_resource(resource_type=HOSTS, resource_id='web01.example.com',
+                                     data={'host': {'comment': 'x'}})
+        self.assertEqual(len(self.foreman.cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
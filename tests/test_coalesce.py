@@ -0,0 +1,98 @@
+import ast
+import os
+import threading
+import time
+import unittest
+
+import foreman
+from foreman.coalesce import CoalesceTimeout, SingleFlight
+from foreman.foreman import HOSTS
+
+from stubs import get_foreman
+
+# Modules imported by foreman.foreman, they have to stay importable on
+# Python 2
+PYTHON2_MODULES = ('batch.py', 'cache.py', 'coalesce.py', 'foreman.py', 'ratelimit.py', 'records.py', 'retry.py',
+                   'search.py', 'stats.py')
+
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.calls = []
+        self.results = []
+
+    def slow(self, result=None, error=None):
+        def func():
+            self.calls.append(1)
+            time.sleep(0.05)
+            if error is not None:
+                raise error
+            return result
+        return func
+
+    def test_shared_result(self):
+        func = self.slow(result={'id': 1})
+        run_threads(lambda: self.results.append(self.flight.do('key', func)), 5)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.flight.shared, 4)
+        self.assertEqual(self.results, [{'id': 1}] * 5)
+        self.assertEqual(len(set(id(result) for result in self.results)), 5)
+        self.assertEqual(len(self.flight), 0)
+
+    def test_shared_error(self):
+        func = self.slow(error=ValueError('boom'))
+
+        def call():
+            try:
+                self.flight.do('key', func)
+            except ValueError as e:
+                self.results.append(e)
+
+        run_threads(call, 3)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(self.results), 3)
+
+    def test_timeout(self):
+        func = self.slow(result=1)
+        leader = threading.Thread(target=lambda: self.flight.do('key', func))
+        leader.start()
+        time.sleep(0.01)
+        self.assertRaises(CoalesceTimeout, self.flight.do, 'key', func, timeout=0.001)
+        leader.join()
+
+    def test_foreman_coalesces_gets(self):
+        def handle(request):
+            time.sleep(0.05)
+            return 200, {'id': 1}, {}
+
+        client, adapter = get_foreman(handle, coalesce=True)
+        with client:
+            run_threads(lambda: self.results.append(client.get_resource(resource_type=HOSTS, resource_id=1)), 4)
+        self.assertEqual(len(adapter.requests), 1)
+        self.assertEqual(self.results, [{'id': 1}] * 4)
+
+
+class Python2ModulesTest(unittest.TestCase):
+
+    def test_no_async_syntax(self):
+        directory = os.path.dirname(foreman.__file__)
+        for name in PYTHON2_MODULES:
+            with open(os.path.join(directory, name)) as f:
+                tree = ast.parse(f.read())
+            nodes = [node for node in ast.walk(tree)
+                     if isinstance(node, (ast.AsyncFunctionDef, ast.AsyncFor, ast.AsyncWith, ast.Await))]
+            self.assertEqual(nodes, [], name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from foreman.diff import CHANGED, Differ
+from foreman.foreman import ForemanError, CONFIG_TEMPLATES, HOSTGROUPS
+
+
+class StubForeman(object):
+    url = 'https://foreman.example.com/api/v2'
+    max_workers = 2
+
+    def __init__(self, resources):
+        self.resources = resources
+
+    def iter_resources(self, resource_type, **kwargs):
+        # Listings contain no template and no parameters
+        return iter([dict((key, value) for key, value in resource.items() if key in ('id', 'name', 'title'))
+                     for resource in self.resources[resource_type]])
+
+    def get_resource(self, resource_type, resource_id):
+        for resource in self.resources[resource_type]:
+            if resource['id'] == resource_id:
+                return resource
+        raise ForemanError(url=self.url, status_code=404, message='Not found')
+
+
+def get_foreman(template, value):
+    return StubForeman({
+        CONFIG_TEMPLATES: [{'id': 1, 'name': 'PXELinux', 'template': template}],
+        HOSTGROUPS: [{'id': 1, 'name': 'web', 'title': 'web',
+                      'parameters': [{'id': 1, 'name': 'ntp', 'value': value}]}],
+    })
+
+
+class DifferTest(unittest.TestCase):
+
+    def test_full_resources_are_compared(self):
+        old = get_foreman('DEFAULT linux', 'ntp1')
+        new = get_foreman('DEFAULT local', 'ntp2')
+        with Differ(old, new) as differ:
+            changes = differ.diff(resource_types=[CONFIG_TEMPLATES, HOSTGROUPS])
+        template, hostgroup = changes
+        self.assertEqual((template.action, template.key), (CHANGED, 'PXELinux'))
+        self.assertEqual(template.fields, {'template': ('DEFAULT linux', 'DEFAULT local')})
+        self.assertEqual(hostgroup.fields, {'parameters': ([{'name': 'ntp', 'value': 'ntp1'}],
+                                                           [{'name': 'ntp', 'value': 'ntp2'}])})
+
+    def test_listings_only(self):
+        old = get_foreman('DEFAULT linux', 'ntp1')
+        new = get_foreman('DEFAULT local', 'ntp2')
+        with Differ(old, new, full_types=()) as differ:
+            self.assertEqual(len(differ.diff(resource_types=[CONFIG_TEMPLATES, HOSTGROUPS])), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from foreman.export import Exporter, get_file_name, read_ndjson
+from foreman.foreman import ForemanError, CONFIG_TEMPLATES, DOMAINS, PARAMETERS, SETTINGS
+
+LISTINGS = {
+    CONFIG_TEMPLATES: [{'id': 1, 'name': 'PXELinux'}, {'id': 2, 'name': 'Kickstart'}],
+    DOMAINS: [{'id': 1, 'name': 'example.com'}, {'id': 2, 'name': 'example.org'}],
+    SETTINGS: [{'id': 1, 'name': 'foreman_url', 'value': 'https://foreman.example.com'}],
+}
+
+# Show responses, listings contain no template
+DETAILS = {
+    (CONFIG_TEMPLATES, 1): {'id': 1, 'name': 'PXELinux', 'template': 'DEFAULT linux',
+                            'locations': [{'id': 1, 'name': 'Cloud'}]},
+    (DOMAINS, 1): {'id': 1, 'name': 'example.com', 'fullname': 'Example'},
+    (DOMAINS, 2): {'id': 2, 'name': 'example.org', 'fullname': 'Example'},
+}
+
+
+class StubForeman(object):
+    url = 'https://foreman.example.com/api/v2'
+
+    def __init__(self):
+        self.listed = []
+        self.shown = []
+
+    def iter_resources(self, resource_type, resource_id=None, component=None, **kwargs):
+        self.listed.append((resource_type, resource_id, component))
+        if component is None:
+            return iter(LISTINGS[resource_type])
+        if resource_id == 2:
+            raise ForemanError(url=self.url, status_code=500, message='boom')
+        return iter([{'id': 1, 'name': 'ntp', 'value': resource_id}])
+
+    def get_resource(self, resource_type, resource_id):
+        self.shown.append((resource_type, resource_id))
+        if (resource_type, resource_id) not in DETAILS:
+            raise ForemanError(url=self.url, status_code=404, message='Not found')
+        return DETAILS[(resource_type, resource_id)]
+
+
+class ExporterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.foreman = StubForeman()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, resource_type, component=None):
+        return list(read_ndjson(os.path.join(self.directory, get_file_name(resource_type, component))))
+
+    def test_full_resources(self):
+        manifest = Exporter(self.foreman, self.directory, resource_types=[CONFIG_TEMPLATES, SETTINGS],
+                            workers=2).run()
+        self.assertEqual(manifest['errors'], {})
+        templates = sorted(self.read(CONFIG_TEMPLATES), key=lambda template: template['id'])
+        self.assertEqual(templates, [DETAILS[(CONFIG_TEMPLATES, 1)], LISTINGS[CONFIG_TEMPLATES][1]])
+        self.assertEqual(self.read(SETTINGS), LISTINGS[SETTINGS])
+        self.assertEqual(sorted(self.foreman.shown), [(CONFIG_TEMPLATES, 1), (CONFIG_TEMPLATES, 2)])
+
+    def test_components_of_exported_parents(self):
+        manifest = Exporter(self.foreman, self.directory, resource_types=[DOMAINS], workers=2).run()
+        self.assertEqual(manifest['errors'], {})
+        self.assertEqual(self.foreman.listed.count((DOMAINS, None, None)), 1)
+        info = manifest['files'][get_file_name(DOMAINS, PARAMETERS)]
+        self.assertEqual(info['count'], 1)
+        self.assertEqual([(error['parent_id'], error['parent_name'], error['error']) for error in info['errors']],
+                         [(2, 'example.org', 'boom')])
+        parameter, = self.read(DOMAINS, PARAMETERS)
+        self.assertEqual((parameter['parent_id'], parameter['parent_name']), (1, 'example.com'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+
+from benchmarks.fake_foreman import FakeForeman
+
+
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeForeman(counts={'hosts': 3, 'domains': 1})
+
+    def search(self, search):
+        return [resource['id'] for resource in self.server.list('hosts', {'search': search})['results']]
+
+    def test_equals(self):
+        self.assertEqual(self.search('id == 2'), [2])
+        self.assertEqual(self.search('id == "2"'), [2])
+        self.assertEqual(self.search('name == host00003.domain00001.example.com'), [3])
+        self.assertEqual(self.search('id == 7'), [])
+
+    def test_in(self):
+        self.assertEqual(self.search('id IN (1, 3)'), [1, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
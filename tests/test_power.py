@@ -0,0 +1,35 @@
+import unittest
+
+from foreman.foreman import Foreman
+
+
+class SetHostsPowerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.foreman = Foreman('127.0.0.1', 3000, 'admin', 'secret', ssl=False)
+        self.sent = []
+        self.foreman.iter_resources = lambda resource_type, search=None, **kwargs: iter([{'id': 1}, {'id': 2}])
+        self.foreman.set_host_power = lambda host_id, action: self.sent.append((host_id, action))
+
+    def tearDown(self):
+        self.foreman.close()
+
+    def test_without_hosts_or_search(self):
+        self.assertRaises(ValueError, self.foreman.reboot_hosts)
+        self.assertRaises(ValueError, self.foreman.reboot_hosts, search={})
+        self.assertRaises(ValueError, self.foreman.reboot_hosts, search='')
+        self.assertEqual(self.sent, [])
+
+    def test_host_ids(self):
+        report = self.foreman.reboot_hosts(host_ids=[3, 4])
+        self.assertTrue(report.ok)
+        self.assertEqual(sorted(self.sent), [(3, 'reboot'), (4, 'reboot')])
+
+    def test_search(self):
+        report = self.foreman.poweron_hosts(search={'hostgroup': 'web'})
+        self.assertTrue(report.ok)
+        self.assertEqual(sorted(self.sent), [(1, 'start'), (2, 'start')])
+
+
+if __name__ == '__main__':
+    unittest.main()
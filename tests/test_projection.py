@@ -0,0 +1,44 @@
+import unittest
+
+from foreman.foreman import HOSTS, get_projection
+
+from stubs import get_foreman
+
+HOSTS_PAGE = {'results': [{'id': 1, 'name': 'web01', 'ip': '10.0.0.1'},
+                          {'id': 2, 'name': 'web02', 'ip': '10.0.0.2'}],
+              'subtotal': 2, 'per_page': 10}
+
+
+class ProjectionTest(unittest.TestCase):
+
+    def test_get_projection(self):
+        resource = {'id': 1, 'name': 'web01', 'ip': '10.0.0.1'}
+        self.assertTrue(get_projection(None)(resource) is resource)
+        self.assertEqual(get_projection(['name', 'mac'])(resource), {'name': 'web01'})
+
+    def get_hosts(self, **kwargs):
+        foreman, adapter = get_foreman(lambda request: (200, HOSTS_PAGE, {}))
+        with foreman:
+            hosts = foreman.get_resources(resource_type=HOSTS, page_size=10, **kwargs)
+        request, = adapter.requests
+        return hosts, request.url
+
+    def test_thin_listing(self):
+        hosts, url = self.get_hosts(fields=['id', 'name'])
+        self.assertEqual(hosts, [{'id': 1, 'name': 'web01'}, {'id': 2, 'name': 'web02'}])
+        self.assertIn('thin=true', url)
+
+    def test_fields_beyond_thin(self):
+        hosts, url = self.get_hosts(fields=['name', 'ip'])
+        self.assertEqual(hosts[0], {'name': 'web01', 'ip': '10.0.0.1'})
+        self.assertNotIn('thin', url)
+
+    def test_search_fields(self):
+        foreman, _ = get_foreman(lambda request: (200, HOSTS_PAGE, {}))
+        with foreman:
+            hosts = foreman.search_resource(resource_type=HOSTS, data={'name': ('~', 'web')}, fields=['ip'])
+        self.assertEqual(hosts, [{'ip': '10.0.0.1'}, {'ip': '10.0.0.2'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
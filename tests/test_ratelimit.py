@@ -0,0 +1,71 @@
+import threading
+import time
+import unittest
+
+from foreman.foreman import HOSTS
+from foreman.ratelimit import Limit, RateLimiter, TokenBucket
+
+from stubs import get_foreman
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, delta=0.01)
+        self.assertAlmostEqual(bucket.reserve(), 0.2, delta=0.01)
+
+    def test_refill(self):
+        bucket = TokenBucket(rate=100, burst=1)
+        bucket.reserve()
+        time.sleep(0.02)
+        self.assertEqual(bucket.reserve(), 0.0)
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def test_matching_limits(self):
+        writes = Limit(rate=1, methods=['put'], resource_types=[HOSTS])
+        limiter = RateLimiter([Limit(max_in_flight=2), writes])
+        self.assertEqual(len(limiter.get_limits('GET', HOSTS)), 1)
+        self.assertEqual(len(limiter.get_limits('PUT', HOSTS)), 2)
+        self.assertEqual(len(limiter.get_limits('PUT', 'domains')), 1)
+
+    def test_max_in_flight(self):
+        limiter = RateLimiter([Limit(max_in_flight=2)])
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+
+        def request():
+            with limiter.acquire('GET'):
+                with lock:
+                    in_flight.append(1)
+                    peak.append(len(in_flight))
+                time.sleep(0.01)
+                with lock:
+                    in_flight.pop()
+
+        threads = [threading.Thread(target=request) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(peak), 2)
+        self.assertTrue(limiter.stats()['throttled'] > 0)
+
+    def test_foreman_requests_pass_the_limiter(self):
+        limiter = RateLimiter([Limit(rate=50, burst=1)])
+        foreman, adapter = get_foreman(lambda request: (200, {'id': 1}, {}), rate_limiter=limiter)
+        start = time.time()
+        with foreman:
+            for _ in range(3):
+                foreman.get_resource(resource_type=HOSTS, resource_id=1)
+        self.assertTrue(time.time() - start >= 0.035)
+        self.assertEqual(limiter.stats()['throttled'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+
+from foreman.batch import BatchOperation
+from foreman.foreman import ForemanError, HOSTGROUPS, LOCATIONS
+from foreman.reconcile import Reconciler
+
+RESOURCES = {
+    HOSTGROUPS: [
+        {'id': 1, 'name': 'web', 'title': 'web', 'parent_id': None},
+        {'id': 2, 'name': 'base', 'title': 'base', 'parent_id': None},
+        {'id': 3, 'name': 'db', 'title': 'base/db', 'parent_id': 2},
+        {'id': 4, 'name': 'db', 'title': 'other/db', 'parent_id': 5},
+        {'id': 5, 'name': 'other', 'title': 'other', 'parent_id': None},
+    ],
+    LOCATIONS: [
+        {'id': 1, 'name': 'Cloud', 'title': 'Cloud'},
+        {'id': 2, 'name': 'Edge', 'title': 'Edge'},
+    ],
+}
+
+# Show responses, listings contain no associations
+DETAILS = {
+    (HOSTGROUPS, 1): {'id': 1, 'name': 'web', 'title': 'web', 'parent_id': None,
+                      'locations': [{'id': 1, 'name': 'Cloud', 'title': 'Cloud'}]},
+    (HOSTGROUPS, 2): {'id': 2, 'name': 'base', 'title': 'base', 'parent_id': None, 'locations': []},
+}
+
+
+class StubForeman(object):
+    url = 'http://foreman.example.com/api/v2'
+    max_workers = 1
+
+    def __init__(self, resources):
+        self.resources = resources
+        self.created = []
+        self.shown = []
+
+    def _get_resource_url(self, resource_type):
+        return '{0}/{1}'.format(self.url, resource_type)
+
+    def get_resources(self, resource_type):
+        return list(self.resources.get(resource_type, ()))
+
+    def get_resource(self, resource_type, resource_id):
+        self.shown.append((resource_type, resource_id))
+        if (resource_type, resource_id) in DETAILS:
+            return DETAILS[(resource_type, resource_id)]
+        return [resource for resource in self.resources[resource_type] if resource['id'] == resource_id][0]
+
+    def search_one(self, resource_type, query):
+        raise ForemanError(url=self._get_resource_url(resource_type), status_code=404, message='Not found')
+
+    def create_resource(self, resource_type, resource, data, **kwargs):
+        self.created.append((resource_type, data))
+        return dict(data, id=100 + len(self.created), title=data['name'])
+
+
+class ReconcilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.foreman = StubForeman(RESOURCES)
+        self.reconciler = Reconciler(self.foreman)
+
+    def test_child_is_not_matched_by_name(self):
+        report = self.reconciler.apply({HOSTGROUPS: [{'name': 'web', 'parent': 'base'}]}, dry_run=True)
+        self.assertTrue(report.ok)
+        change, = report.changes
+        self.assertEqual(change.action, BatchOperation.CREATE)
+        self.assertEqual(change.key, 'base/web')
+        self.assertEqual(change.data['parent_id'], 2)
+
+    def test_parent_in_document(self):
+        report = self.reconciler.apply({HOSTGROUPS: [{'name': 'app', 'parent': 'new'}, {'name': 'new'}]})
+        self.assertTrue(report.ok)
+        self.assertEqual(sorted(change.key for change in report.changes), ['new', 'new/app'])
+        self.assertEqual(self.foreman.created, [(HOSTGROUPS, {'name': 'new'}),
+                                                (HOSTGROUPS, {'name': 'app', 'parent_id': 101})])
+
+    def test_title_of_document_is_not_a_key(self):
+        report = self.reconciler.apply({LOCATIONS: [{'name': 'Cloud', 'title': 'Cloud provider'}]}, dry_run=True)
+        self.assertTrue(report.ok)
+        self.assertEqual(report.changes, [])
+
+    def test_ambiguous_parent(self):
+        self.assertRaises(ValueError, self.reconciler.apply, {HOSTGROUPS: [{'name': 'app', 'parent': 'db'}]},
+                          dry_run=True)
+        report = self.reconciler.apply({HOSTGROUPS: [{'name': 'app', 'parent': 'other/db'}]}, dry_run=True)
+        self.assertTrue(report.ok)
+        self.assertEqual(report.changes[0].key, 'other/db/app')
+
+    def test_ambiguous_key(self):
+        self.foreman.resources = {HOSTGROUPS: RESOURCES[HOSTGROUPS] + [{'id': 6, 'name': 'web', 'title': 'web'}]}
+        report = self.reconciler.apply({HOSTGROUPS: [{'name': 'web'}]}, dry_run=True)
+        self.assertFalse(report.ok)
+        self.assertTrue(isinstance(report.failed[0].error, ValueError))
+
+    def test_associations_are_compared_with_show_responses(self):
+        report = self.reconciler.apply({HOSTGROUPS: [{'name': 'web', 'locations': ['Cloud']},
+                                                     {'name': 'base', 'locations': ['Cloud', 'Edge']}]},
+                                       dry_run=True)
+        self.assertTrue(report.ok)
+        change, = report.changes
+        self.assertEqual(change.key, 'base')
+        self.assertEqual(change.data, {'location_ids': [1, 2]})
+        self.assertEqual(change.fields['location_ids'], ([], [1, 2]))
+        self.assertEqual(sorted(self.foreman.shown), [(HOSTGROUPS, 1), (HOSTGROUPS, 2)])
+
+    def test_listed_fields_need_no_show_requests(self):
+        report = self.reconciler.apply({HOSTGROUPS: [{'name': 'web'}, {'name': 'db', 'parent': 'base'}]},
+                                       dry_run=True)
+        self.assertTrue(report.ok)
+        self.assertEqual(report.changes, [])
+        self.assertEqual(self.foreman.shown, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
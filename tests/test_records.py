@@ -0,0 +1,75 @@
+import copy
+import pickle
+import unittest
+
+from foreman.foreman import HOSTS
+from foreman.records import RecordTable, get_record_class
+
+from stubs import get_foreman
+
+HOSTS_PAGE = {'results': [{'id': 1, 'name': 'web01', 'comment': None},
+                          {'id': 2, 'name': 'web02', 'comment': 'db'}],
+              'subtotal': 2, 'per_page': 10}
+
+
+class RecordTest(unittest.TestCase):
+
+    def test_mapping(self):
+        host = get_record_class(HOSTS)({'id': 1, 'name': 'web01'})
+        self.assertEqual(host['name'], 'web01')
+        self.assertEqual(host.name, 'web01')
+        self.assertEqual(dict(host), {'id': 1, 'name': 'web01'})
+        self.assertEqual(host, {'id': 1, 'name': 'web01'})
+        self.assertEqual(host.get('ip'), None)
+        self.assertRaises(AttributeError, getattr, host, 'ip')
+        def set_name():
+            host['name'] = 'web02'
+
+        self.assertRaises(TypeError, set_name)
+        self.assertRaises(AttributeError, setattr, host, 'name', 'web02')
+        self.assertFalse(hasattr(host, '__dict__'))
+
+    def test_shapes_are_shared(self):
+        cls = get_record_class(HOSTS)
+        self.assertTrue(cls is get_record_class(HOSTS))
+        self.assertEqual(cls.__name__, 'HostsRecord')
+        first, second = cls({'id': 1, 'name': 'a'}), cls({'id': 2, 'name': 'b'})
+        self.assertTrue(first._shape is second._shape)
+        self.assertFalse(first._shape is get_record_class('domains')({'id': 1, 'name': 'a'})._shape)
+
+    def test_pickle(self):
+        host = get_record_class(HOSTS)({'id': 1, 'name': 'web01'})
+        self.assertEqual(pickle.loads(pickle.dumps(host)), host)
+        self.assertEqual(copy.deepcopy(host).to_dict(), {'id': 1, 'name': 'web01'})
+
+    def test_listing(self):
+        foreman, _ = get_foreman(lambda request: (200, HOSTS_PAGE, {}))
+        with foreman:
+            hosts = foreman.get_resources(resource_type=HOSTS, records=True)
+        self.assertEqual([host.name for host in hosts], ['web01', 'web02'])
+        self.assertEqual(type(hosts[0]).__name__, 'HostsRecord')
+
+
+class RecordTableTest(unittest.TestCase):
+
+    def test_columns(self):
+        table = RecordTable([{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b', 'ip': '10.0.0.2'}, {'id': 'x'}])
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.column('id'), [1, 2, 'x'])
+        self.assertEqual(table.column('ip'), [None, '10.0.0.2', None])
+        self.assertEqual(table[0].to_dict(), {'id': 1, 'name': 'a'})
+        self.assertEqual(table[-1].to_dict(), {'id': 'x'})
+        self.assertRaises(KeyError, table[0].__getitem__, 'ip')
+        self.assertRaises(IndexError, table.__getitem__, 3)
+        self.assertEqual([row['id'] for row in table[1:]], [2, 'x'])
+
+    def test_listing(self):
+        foreman, _ = get_foreman(lambda request: (200, HOSTS_PAGE, {}))
+        with foreman:
+            table = foreman.get_resources(resource_type=HOSTS, columnar=True)
+        self.assertEqual(table.column('name'), ['web01', 'web02'])
+        self.assertEqual([dict(row) for row in table], HOSTS_PAGE['results'])
+
+
+if __name__ == '__main__':
+    unittest.main()
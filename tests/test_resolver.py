@@ -0,0 +1,61 @@
+import unittest
+
+from foreman.foreman import ForemanError
+from foreman.resolver import ReferenceResolver
+
+HOSTGROUPS = [
+    {'id': 1, 'name': 'web', 'title': 'web'},
+    {'id': 2, 'name': 'base', 'title': 'base'},
+    {'id': 3, 'name': 'web', 'title': 'base/web'},
+    {'id': 4, 'name': 'db', 'title': 'base/db'},
+    {'id': 5, 'name': 'db', 'title': 'other/db'},
+]
+
+
+class StubForeman(object):
+    url = 'http://foreman.example.com/api/v2'
+
+    def __init__(self, resources):
+        self.resources = resources
+
+    def _get_resource_url(self, resource_type):
+        return '{0}/{1}'.format(self.url, resource_type)
+
+    def get_resources(self, resource_type):
+        return list(self.resources)
+
+    def search_one(self, resource_type, query):
+        (key, value), = query.items()
+        matches = [resource for resource in self.resources if resource.get(key) == value]
+        if len(matches) != 1:
+            raise ForemanError(url=self._get_resource_url(resource_type), status_code=404 if not matches else 300,
+                               message='{0} matches'.format(len(matches)))
+        return matches[0]
+
+
+class ReferenceResolverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.resolver = ReferenceResolver(StubForeman(HOSTGROUPS))
+
+    def test_title_wins_over_name(self):
+        self.assertEqual(self.resolver.get_id('hostgroups', 'web'), 1)
+        self.assertEqual(self.resolver.get_id('hostgroups', 'base/web'), 3)
+
+    def test_ambiguous_name(self):
+        with self.assertRaises(ForemanError) as context:
+            self.resolver.get_id('hostgroups', 'db')
+        self.assertEqual(context.exception.status_code, 300)
+        self.assertEqual(self.resolver.get_id('hostgroups', 'other/db'), 5)
+
+    def test_unique_name(self):
+        self.resolver.foreman.resources = HOSTGROUPS[1:]
+        self.assertEqual(self.resolver.get_id('hostgroups', 'web'), 3)
+
+    def test_resolve(self):
+        data = self.resolver.resolve({'name': 'app', 'parent_name': 'base/web'}, resource_type='hostgroups')
+        self.assertEqual(data, {'name': 'app', 'parent_id': 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from foreman.export import FOREMAN_EXPORT_MANIFEST, Exporter, get_file_name
+from foreman.foreman import ARCHITECTURES, CONFIG_TEMPLATES, DOMAINS, LOCATIONS, PARAMETERS, TEMPLATE_KINDS
+from foreman.restore import Checkpoint, Restorer
+
+EXPORT = {
+    (ARCHITECTURES, None): [{'id': 1, 'name': 'x86_64'}, {'name': 'i386'}],
+    (DOMAINS, None): [{'id': 1, 'name': 'example.com'}],
+    (DOMAINS, PARAMETERS): [{'parent_id': 1, 'parent_name': 'example.com', 'resource': {'id': 1, 'name': 'ntp'}},
+                            {'parent_name': 'example.com', 'resource': {'id': 2, 'name': 'dns'}}],
+}
+
+
+class StubForeman(object):
+    max_workers = 2
+
+    def __init__(self):
+        self.created = []
+
+    def iter_resources(self, resource_type, **kwargs):
+        return iter(())
+
+    def create_resource(self, resource_type, resource, data, **kwargs):
+        self.created.append((resource_type, data['name']))
+        return {'id': len(self.created)}
+
+
+class RestorerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        manifest = {'files': {}}
+        for (resource_type, component), resources in EXPORT.items():
+            file_name = get_file_name(resource_type, component)
+            with gzip.open(os.path.join(self.directory, file_name), 'wb') as ndjson:
+                for resource in resources:
+                    ndjson.write((json.dumps(resource) + '\n').encode('utf-8'))
+            manifest['files'][file_name] = {'resource_type': resource_type, 'component': component}
+        with open(os.path.join(self.directory, FOREMAN_EXPORT_MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+        self.foreman = StubForeman()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_unexpected_errors_are_reported(self):
+        report = Restorer(self.foreman, self.directory).run()
+        self.assertFalse(report.ok)
+        self.assertEqual(sorted(self.foreman.created), [(ARCHITECTURES, 'x86_64'), (DOMAINS, 'example.com'),
+                                                        (DOMAINS, 'ntp')])
+        self.assertEqual(report.counts[get_file_name(ARCHITECTURES)]['failed'], 1)
+        self.assertEqual(report.counts[get_file_name(DOMAINS, PARAMETERS)]['failed'], 1)
+        self.assertEqual(sorted(error['name'] for error in report.errors), ['dns', 'i386'])
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'restore.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_components_survive_a_crash(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.set(DOMAINS, 1, 5)
+        checkpoint.set_component(DOMAINS, PARAMETERS, 1, 2, 9)
+        # Not flushed or closed, as after a crash
+        resumed = Checkpoint(self.path)
+        self.assertTrue(resumed.has_component(DOMAINS, PARAMETERS, 1, 2))
+        self.assertFalse(resumed.has_component(DOMAINS, PARAMETERS, 1, 3))
+        self.assertEqual(resumed.get(DOMAINS, 1), None)
+        checkpoint.close()
+        resumed.close()
+
+
+class SourceForeman(object):
+    url = 'https://old-foreman.example.com/api/v2'
+
+    listings = {
+        CONFIG_TEMPLATES: [{'id': 3, 'name': 'PXELinux', 'template_kind_id': 1, 'template_kind_name': 'PXELinux'}],
+        LOCATIONS: [{'id': 2, 'name': 'Cloud', 'title': 'Cloud'}],
+        TEMPLATE_KINDS: [{'id': 1, 'name': 'PXELinux'}],
+    }
+    details = {
+        (CONFIG_TEMPLATES, 3): {'id': 3, 'name': 'PXELinux', 'template': 'DEFAULT linux', 'snippet': False,
+                                'template_kind_id': 1, 'template_kind_name': 'PXELinux',
+                                'locations': [{'id': 2, 'name': 'Cloud', 'title': 'Cloud'}]},
+        (LOCATIONS, 2): {'id': 2, 'name': 'Cloud', 'title': 'Cloud', 'parent_id': None},
+    }
+
+    def iter_resources(self, resource_type, **kwargs):
+        return iter(self.listings[resource_type])
+
+    def get_resource(self, resource_type, resource_id):
+        return self.details[(resource_type, resource_id)]
+
+
+class TargetForeman(StubForeman):
+
+    def iter_resources(self, resource_type, **kwargs):
+        if resource_type == TEMPLATE_KINDS:
+            return iter([{'id': 7, 'name': 'PXELinux'}])
+        return iter(())
+
+    def create_resource(self, resource_type, resource, data, **kwargs):
+        self.created.append((resource_type, data))
+        return {'id': 10 + len(self.created)}
+
+
+class ExportRestoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_config_template(self):
+        Exporter(SourceForeman(), self.directory, resource_types=[CONFIG_TEMPLATES, LOCATIONS, TEMPLATE_KINDS],
+                 workers=2).run()
+        foreman = TargetForeman()
+        report = Restorer(foreman, self.directory).run()
+        self.assertTrue(report.ok, report.errors)
+        self.assertEqual(report.counts[get_file_name(TEMPLATE_KINDS)]['adopted'], 1)
+        self.assertEqual(foreman.created, [(LOCATIONS, {'name': 'Cloud'}),
+                                           (CONFIG_TEMPLATES, {'name': 'PXELinux', 'template': 'DEFAULT linux',
+                                                               'snippet': False, 'template_kind_id': 7,
+                                                               'location_ids': [11]})])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import unittest
+
+import requests
+
+from foreman.retry import RetryPolicy, is_connect_error
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+URL = 'https://foreman.example.com/api/v2/hosts/1'
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(jitter=False)
+
+    def test_put_retried_after_read_timeout(self):
+        delay = self.policy.get_delay('PUT', attempt=0, elapsed=0, exception=requests.exceptions.ReadTimeout(),
+                                      url=URL)
+        self.assertEqual(delay, 0.5)
+
+    def test_power_not_retried_after_reaching_foreman(self):
+        for exception in (requests.exceptions.ReadTimeout(), requests.exceptions.ConnectionError()):
+            self.assertIsNone(self.policy.get_delay('PUT', attempt=0, elapsed=0, exception=exception,
+                                                    url=URL + '/power'))
+        self.assertIsNone(self.policy.get_delay('PUT', attempt=0, elapsed=0, status_code=502, url=URL + '/power'))
+
+    def test_power_retried_on_connect_errors(self):
+        delay = self.policy.get_delay('PUT', attempt=0, elapsed=0, exception=requests.exceptions.ConnectTimeout(),
+                                      url=URL + '/power')
+        self.assertEqual(delay, 0.5)
+
+
+class ConnectErrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(jitter=False)
+
+    def test_refused_connection(self):
+        try:
+            requests.post('http://127.0.0.1:1/api/v2/hosts', timeout=5)
+        except requests.exceptions.ConnectionError as e:
+            error = e
+        self.assertTrue(is_connect_error(error))
+        self.assertEqual(self.policy.get_delay('POST', attempt=0, elapsed=0, exception=error, url=URL), 0.5)
+
+    def test_reset_connection(self):
+        error = requests.exceptions.ConnectionError(OSError(104, 'Connection reset by peer'))
+        self.assertFalse(is_connect_error(error))
+        self.assertIsNone(self.policy.get_delay('POST', attempt=0, elapsed=0, exception=error, url=URL))
+
+    @unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+    def test_refused_connection_aiohttp(self):
+        async def post():
+            async with aiohttp.ClientSession() as session:
+                await session.post('http://127.0.0.1:1/api/v2/hosts')
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(post())
+        except aiohttp.ClientError as e:
+            error = e
+        finally:
+            loop.close()
+        self.assertTrue(is_connect_error(error))
+        self.assertEqual(self.policy.get_delay('POST', attempt=0, elapsed=0, exception=error, url=URL), 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
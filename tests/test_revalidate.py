@@ -0,0 +1,53 @@
+import unittest
+
+from foreman.cache import ResponseCache
+from foreman.foreman import DOMAINS
+
+from stubs import get_foreman
+
+DOMAIN = {'id': 1, 'name': 'example.com'}
+
+
+class RevalidateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.modified = False
+        self.foreman, self.adapter = get_foreman(self.handle, cache=ResponseCache(ttls={DOMAINS: 0}))
+
+    def tearDown(self):
+        self.foreman.close()
+
+    def handle(self, request):
+        if self.modified:
+            return 200, dict(DOMAIN, fullname='Example'), {'ETag': '"2"'}
+        if request.headers.get('If-None-Match') == '"1"':
+            return 304, None, {'ETag': '"1"'}
+        return 200, DOMAIN, {'ETag': '"1"', 'Last-Modified': 'Fri, 01 Jan 2016 00:00:00 GMT'}
+
+    def get_domain(self):
+        return self.foreman.get_resource(resource_type=DOMAINS, resource_id=1)
+
+    def test_not_modified(self):
+        self.get_domain()
+        self.assertEqual(self.get_domain(), DOMAIN)
+        first, second = self.adapter.requests
+        self.assertNotIn('If-None-Match', first.headers)
+        self.assertEqual(second.headers['If-None-Match'], '"1"')
+        self.assertEqual(second.headers['If-Modified-Since'], 'Fri, 01 Jan 2016 00:00:00 GMT')
+        self.assertEqual(self.foreman.cache.stats()['revalidations'], 1)
+
+    def test_modified(self):
+        self.get_domain()
+        self.modified = True
+        self.assertEqual(self.get_domain()['fullname'], 'Example')
+        self.assertEqual(self.foreman.cache.stats()['revalidations'], 0)
+        self.assertEqual(self.foreman.cache.get_entry(self.foreman.cache.key(self.adapter.requests[0].url)).etag,
+                         '"2"')
+
+    def test_without_validators_nothing_is_kept(self):
+        self.foreman.cache.set(self.foreman.cache.key('x'), resource_type=DOMAINS, value=DOMAIN)
+        self.assertEqual(len(self.foreman.cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from foreman.foreman import HOSTS
+from foreman.search import SearchQuery, compile_term, quote_value, search_query
+
+from stubs import get_foreman
+
+
+class SearchTest(unittest.TestCase):
+
+    def test_quote_value(self):
+        self.assertEqual(quote_value('web01'), '"web01"')
+        self.assertEqual(quote_value('a "b" c\\d'), '"a \\"b\\" c\\\\d"')
+        self.assertEqual(quote_value(5), '5')
+        self.assertEqual(quote_value(True), 'true')
+        self.assertRaises(TypeError, quote_value, object())
+
+    def test_compile_term(self):
+        self.assertEqual(compile_term('name', 'web01'), 'name == "web01"')
+        self.assertEqual(compile_term('hostgroup_id', [2, 1]), 'hostgroup_id IN (2, 1)')
+        self.assertEqual(compile_term('hostgroup_id', set([2, 1])), 'hostgroup_id IN (1, 2)')
+        self.assertEqual(compile_term('name', ('not in', ['a', 'b'])), 'name NOT IN ("a", "b")')
+        self.assertEqual(compile_term('name', ('~', 'web')), 'name ~ "web"')
+        self.assertEqual(compile_term('comment', None), 'null? comment')
+        self.assertEqual(compile_term('facts.os', 'Linux'), 'facts.os == "Linux"')
+
+    def test_invalid_terms(self):
+        self.assertRaises(ValueError, compile_term, 'name or 1', 'x')
+        self.assertRaises(ValueError, compile_term, 'name', ('LIKE', 'x'))
+
+    def test_query(self):
+        self.assertEqual(search_query({'name': 'web01', 'build': False}), 'build == false AND name == "web01"')
+        self.assertEqual(search_query('name = web01'), 'name = web01')
+        self.assertEqual(search_query({'tags': ['a']}), 'tags IN ("a")')
+        query = SearchQuery({'name': 'a'}) | SearchQuery({'name': 'b'})
+        self.assertEqual(str(query & 'enabled = true'), '((name == "a") OR (name == "b")) AND (enabled = true)')
+        self.assertEqual(str(SearchQuery.all({}, 'x = 1')), 'x = 1')
+
+
+class GetRequestTest(unittest.TestCase):
+
+    def test_search_in_query_string(self):
+        foreman, adapter = get_foreman(lambda request: (200, {'results': [], 'subtotal': 0}, {}))
+        with foreman:
+            foreman.get_resources(resource_type=HOSTS, search={'name': 'web 01'}, page_size=10)
+        request, = adapter.requests
+        self.assertEqual(request.method, 'GET')
+        self.assertEqual(request.body, None)
+        self.assertIn('search=name+%3D%3D+%22web+01%22', request.url)
+        self.assertIn('per_page=10', request.url)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from foreman.foreman import ForemanError, HOSTS
+from foreman.search import search_query
+from foreman.snapshot import Snapshot
+
+
+class StubForeman(object):
+    url = 'http://foreman.example.com/api/v2'
+
+    def __init__(self, resources):
+        self.resources = resources
+        self.searches = []
+        self.search_error = None
+
+    def iter_resources(self, resource_type, fields=None, **kwargs):
+        for resource in self.resources:
+            yield dict((key, resource[key]) for key in fields) if fields else dict(resource)
+
+    def iter_search(self, resource_type, query, **kwargs):
+        self.searches.append(search_query(query))
+        if self.search_error is not None:
+            raise ForemanError(url=self.url, status_code=self.search_error, message='Search failed')
+        (key, value), = query.items()
+        if key == 'id':
+            return iter([dict(resource) for resource in self.resources if resource['id'] in value])
+        return iter([dict(resource) for resource in self.resources if resource['updated_at'] >= value[1]])
+
+
+def host(host_id, updated_at):
+    return {'id': host_id, 'name': 'host{0}'.format(host_id), 'updated_at': updated_at}
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.foreman = StubForeman([host(1, '2016-01-01T10:00:00Z'), host(2, '2016-01-02T10:00:00Z')])
+        self.snapshot = Snapshot()
+        self.assertEqual(self.snapshot.sync(self.foreman, HOSTS), {'fetched': 2, 'deleted': 0, 'full': True})
+
+    def tearDown(self):
+        self.snapshot.close()
+
+    def test_delta_sync(self):
+        self.foreman.resources = [host(2, '2016-01-03T10:00:00Z'), host(3, '2016-01-03T11:00:00Z'),
+                                  host(4, '2016-01-01T09:00:00Z')]
+        self.foreman.resources[0]['name'] = 'renamed'
+        result = self.snapshot.sync(self.foreman, HOSTS)
+        self.assertEqual(result, {'fetched': 3, 'deleted': 1, 'full': False})
+        self.assertEqual(self.foreman.searches, ['updated_at >= "2016-01-02T10:00:00Z"', 'id IN (4)'])
+        self.assertEqual([resource['id'] for resource in self.snapshot.iter_resources(HOSTS)], [2, 3, 4])
+        self.assertEqual(self.snapshot.get_by_name(HOSTS, 'renamed')['id'], 2)
+        self.assertEqual(self.snapshot.get(HOSTS, 1), None)
+        self.assertEqual(self.snapshot.get_sync(HOSTS), {'updated_at': '2016-01-03T11:00:00Z', 'count': 3})
+
+    def test_rejected_search_syncs_full(self):
+        self.foreman.search_error = 422
+        self.assertEqual(self.snapshot.sync(self.foreman, HOSTS)['full'], True)
+
+    def test_errors_are_raised(self):
+        for status_code in (401, 403, 429, 500, 503):
+            self.foreman.search_error = status_code
+            self.assertRaises(ForemanError, self.snapshot.sync, self.foreman, HOSTS)
+        self.assertEqual(len(self.snapshot), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
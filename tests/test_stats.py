@@ -0,0 +1,90 @@
+import unittest
+
+import requests
+
+from foreman.foreman import ForemanError, HOSTS
+from foreman.retry import RetryPolicy
+from foreman.stats import RequestObserver, RequestStats, percentile
+
+from stubs import get_foreman
+
+
+class EventRecorder(RequestObserver):
+
+    def __init__(self):
+        self.before = []
+        self.after = []
+
+    def before_request(self, event):
+        self.before.append((event.method, event.url_template))
+
+    def after_request(self, event):
+        self.after.append(event)
+
+
+class PercentileTest(unittest.TestCase):
+
+    def test_nearest_rank(self):
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 0), 1)
+        self.assertEqual(percentile(samples, 50), 51)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile(samples, 100), 100)
+        self.assertEqual(percentile([3], 90), 3)
+        self.assertEqual(percentile([], 50), None)
+
+
+class RequestStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.responses = []
+        self.recorder = EventRecorder()
+        self.stats = RequestStats(samples=2)
+        self.foreman, _ = get_foreman(self.handle, observers=[self.recorder, self.stats],
+                                      retry=RetryPolicy(backoff_factor=0, jitter=False))
+
+    def tearDown(self):
+        self.foreman.close()
+
+    def handle(self, request):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def test_events(self):
+        self.responses = [(503, None, {}), (200, {'id': 1}, {}), (404, None, {})]
+        self.foreman.get_resource(resource_type=HOSTS, resource_id=1)
+        self.assertRaises(ForemanError, self.foreman.get_resource, resource_type=HOSTS, resource_id=2,
+                          component='parameters')
+        self.assertEqual(self.recorder.before, [('GET', 'hosts/:id'), ('GET', 'hosts/:id/parameters')])
+        first, second = self.recorder.after
+        self.assertEqual((first.status_code, first.retries, first.response_bytes), (200, 1, len(b'{"id": 1}')))
+        self.assertEqual(second.status_code, 404)
+        self.assertTrue(first.latency >= 0)
+
+    def test_errors_are_reported(self):
+        self.responses = [requests.exceptions.ReadTimeout()] * 4
+        self.assertRaises(ForemanError, self.foreman.get_resource, resource_type=HOSTS, resource_id=1)
+        event, = self.recorder.after
+        self.assertEqual(event.retries, 3)
+        self.assertTrue(isinstance(event.error, ForemanError))
+
+    def test_summary(self):
+        self.responses = [(200, {'id': 1}, {})] * 3 + [(500, {'error': {'message': 'boom'}}, {})]
+        for _ in range(3):
+            self.foreman.get_resource(resource_type=HOSTS, resource_id=1)
+        self.assertRaises(ForemanError, self.foreman.get_resources, resource_type=HOSTS)
+        summary = self.stats.summary()
+        self.assertEqual(summary['GET hosts/:id']['count'], 3)
+        self.assertEqual(summary['GET hosts/:id']['errors'], 0)
+        self.assertEqual(summary['GET hosts']['errors'], 1)
+        slowest = self.stats.slowest(count=5)
+        self.assertEqual(sorted(name for name, _ in slowest), ['GET hosts', 'GET hosts/:id'])
+        self.assertTrue(slowest[0][1] >= slowest[1][1])
+        self.stats.reset()
+        self.assertEqual(self.stats.summary(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()